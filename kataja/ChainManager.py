@@ -84,14 +84,7 @@ class ChainManager:
                     self.forest.drawing.replace_node(trace, original)
 
     def _multidomination_to_traces(self):
-        def _find_paths_up(n, depth):
-            pars = n.get_parents()
-            if pars:
-                for par in pars:
-                    _find_paths_up(par, depth + 1)
-            else:
-                paths_up.append(depth)
-
+        topology = self.forest.topology_index
         parents = defaultdict(list)
         originals = {}
 
@@ -101,9 +94,8 @@ class ChainManager:
             if node.index:
                 originals[node.index] = node
                 for parent in node.get_parents():
-                    paths_up = []
-                    _find_paths_up(parent, 0)
-                    parents[node.index].append((max(paths_up), parent))
+                    # longest path from parent to top, memoized in topology index
+                    parents[node.index].append((topology.max_depth(parent), parent))
                 # we leave open case [A A], it will get random order, but who cares
                 parents[node.index].sort()
         # replace all but highest instance with traces
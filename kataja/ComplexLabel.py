@@ -81,7 +81,6 @@ class ComplexLabel(SimpleLabel):
                 self.setHtml(html)
                 self.editable_doc.blockSignals(False)
 
-            ctrl.qdocument_parser.process(self.editable_doc)
             self._previous_values = (self.cn_shape, self.editable_html, is_card)
 
         self.resize_label()
@@ -113,6 +112,7 @@ class ComplexLabel(SimpleLabel):
         return self.card_size[0] if self.is_card() else -1
 
     def resize_label(self):
+        self._pixmap_key = None
         self.prepareGeometryChange()
 
         # ------------------- Width -------------------
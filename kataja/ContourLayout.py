@@ -0,0 +1,345 @@
+# -*- coding: UTF-8 -*-
+# ############################################################################
+#
+# *** Kataja - Biolinguistic Visualization tool ***
+#
+# Copyright 2013 Jukka Purma
+#
+# This file is part of Kataja.
+#
+# Kataja is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Kataja is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kataja.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ############################################################################
+""" Contour-based tree layout in the manner of Reingold & Tilford and Walker.
+
+Grid-based visualizations put nodes into a Grid and merge the grids of subtrees cell by cell. Here
+each laid out subtree is described only by its outlines: for each row, the leftmost and the
+rightmost occupied column. Siblings are pushed apart by comparing the right outline of the left
+siblings to the left outline of the next sibling, and merged outlines reuse the longer outline, so
+the work per merge is proportional to the shallower subtree. Moving a subtree only changes the
+offsets of its outlines. Node positions are stored relative to parent and resolved in one pass from
+top at the end.
+
+Units are grid units like in Grid: columns of edge_width and rows of edge_height. Sizes of nodes
+are given by a function returning (left, top, width, height) in these units, the same tuple that
+grid-based visualizations compute from future_children_bounding_rect.
+"""
+
+
+class Outline:
+    """ One side of a subtree's contour: for each row the outermost occupied column. Rows and
+    columns are stored in outline's own frame, so that moving the outline is just a change of dx and
+    dy.
+    """
+    __slots__ = ('cols', 'outer', 'dx', 'dy', 'top', 'bottom')
+
+    def __init__(self, outer):
+        self.cols = {}
+        self.outer = outer  # min for left outline, max for right outline
+        self.dx = 0
+        self.dy = 0
+        self.top = 0
+        self.bottom = -1
+
+    def __len__(self):
+        return self.bottom - self.top + 1
+
+    def rows(self):
+        return range(self.top + self.dy, self.bottom + self.dy + 1)
+
+    def get(self, row):
+        col = self.cols.get(row - self.dy)
+        if col is None:
+            return None
+        return col + self.dx
+
+    def put(self, row, col):
+        row -= self.dy
+        col -= self.dx
+        old = self.cols.get(row)
+        self.cols[row] = col if old is None else self.outer(old, col)
+        if self.bottom < self.top:
+            self.top = self.bottom = row
+        elif row < self.top:
+            self.top = row
+        elif row > self.bottom:
+            self.bottom = row
+
+    def shift(self, dx, dy):
+        self.dx += dx
+        self.dy += dy
+
+    def merged(self, other):
+        """ Combine two outlines that are in the same frame. The longer outline is reused and
+        rows of the shorter are written into it.
+        :param other: Outline
+        :return: Outline
+        """
+        if len(other) > len(self):
+            big, small = other, self
+        else:
+            big, small = self, other
+        for row in small.rows():
+            col = small.get(row)
+            if col is not None:
+                big.put(row, col)
+        return big
+
+
+class Contour:
+    """ Left and right outlines of a laid out subtree """
+    __slots__ = ('left', 'right')
+
+    def __init__(self):
+        self.left = Outline(min)
+        self.right = Outline(max)
+
+    def shift(self, dx, dy=0):
+        self.left.shift(dx, dy)
+        self.right.shift(dx, dy)
+
+    def add_box(self, left, right, top, bottom):
+        for row in range(top, bottom + 1):
+            self.left.put(row, left)
+            self.right.put(row, right)
+
+    def add_point(self, col, row):
+        self.left.put(row, col)
+        self.right.put(row, col)
+
+    def merge(self, other):
+        self.left = self.left.merged(other.left)
+        self.right = self.right.merged(other.right)
+
+    def separation(self, other, padding=1):
+        """ How much other contour has to be moved right so that it is at least padding columns
+        clear of this contour on every row they share. None if they don't share rows.
+        :param other: Contour
+        :param padding: int
+        :return: int or None
+        """
+        right = self.right
+        left = other.left
+        if len(left) < len(right):
+            rows = left.rows()
+        else:
+            rows = right.rows()
+        needed = None
+        for row in rows:
+            a = right.get(row)
+            if a is None:
+                continue
+            b = left.get(row)
+            if b is None:
+                continue
+            d = a - b + padding
+            if needed is None or d > needed:
+                needed = d
+        return needed
+
+    def overlaps(self, other):
+        """ Do the row spans of the two contours intersect anywhere """
+        a_left, a_right = self.left, self.right
+        b_left, b_right = other.left, other.right
+        rows = b_left.rows() if len(b_left) < len(a_left) else a_left.rows()
+        for row in rows:
+            a1 = a_left.get(row)
+            b1 = b_left.get(row)
+            if a1 is None or b1 is None:
+                continue
+            if b1 <= a_right.get(row) and a1 <= b_right.get(row):
+                return True
+        return False
+
+    def bounds(self):
+        """ :return: min_col, max_col, min_row, max_row """
+        left, right = self.left, self.right
+        min_col = min(left.cols.values()) + left.dx
+        max_col = max(right.cols.values()) + right.dx
+        min_row = min(left.top + left.dy, right.top + right.dy)
+        max_row = max(left.bottom + left.dy, right.bottom + right.dy)
+        return min_col, max_col, min_row, max_row
+
+
+class ContourLayout:
+    """ Lays out a tree with subtrees side by side, as close as their contours allow, and parents
+    above their children. Result is much like latex qtree, or BalancedGridBasedTree with Grid, but
+    computed in linear time.
+
+    :param size: function(node) -> (left, top, width, height) in grid units. top is the negative
+    offset of the node's anchor row from the top of the node.
+    :param children: function(node) -> children that may be drawn below node
+    :param accept: function(node, parent) -> if node should be drawn under this parent
+    :param place_parent: function(node, children, cols) -> column for node, when children are in
+    given columns. Default is the middle of the children.
+    :param padding: minimum distance in columns between neighbouring subtrees
+    """
+
+    def __init__(self, size, children, accept=None, place_parent=None, padding=1):
+        self.size = size
+        self.children = children
+        self.accept = accept
+        self.place_parent = place_parent or self.middle_of_children
+        self.padding = padding
+        self.offsets = {}
+        self.positions = {}
+        self._sizes = {}
+        self.width = 0
+        self.height = 0
+
+    @staticmethod
+    def middle_of_children(node, children, cols):
+        if len(cols) == 1:
+            return cols[0]
+        return sum(cols) // len(cols)
+
+    def layout(self, tree_top, done=None):
+        """ Compute positions for tree_top and nodes below it. Nodes already in done are skipped
+        and nodes that are drawn are added to it.
+        :param tree_top: Node
+        :param done: set of nodes
+        :return: dict node -> (column, row), columns and rows start from 0
+        """
+        if done is None:
+            done = set()
+        contours = {}
+        child_lists = {}
+        placed_under = {}
+        self.offsets = {}
+        self._sizes = {}
+        # iterative post-order traversal, so that deep trees don't hit the recursion limit
+        stack = [(tree_top, None, False)]
+        while stack:
+            node, parent, expanded = stack.pop()
+            if expanded:
+                children = [child for child in child_lists.pop(node) if
+                            placed_under.get(child) is node]
+                contours[node] = self.arrange(node, children, contours)
+                continue
+            if node in done or (self.accept and not self.accept(node, parent)):
+                continue
+            done.add(node)
+            placed_under[node] = parent
+            stack.append((node, parent, True))
+            children = child_lists[node] = self.children(node)
+            for child in reversed(children):
+                stack.append((child, node, False))
+        self.positions = {}
+        if tree_top not in contours:
+            self.width = self.height = 0
+            return self.positions
+        min_col, max_col, min_row, max_row = contours[tree_top].bounds()
+        self.width = max_col - min_col + 1
+        self.height = max_row - min_row + 1
+        # resolve relative offsets from top to bottom
+        positions = self.positions
+        positions[tree_top] = (-min_col, -min_row)
+        stack = [tree_top]
+        while stack:
+            node = stack.pop()
+            x, y = positions[node]
+            for child, (dx, dy) in self.offsets.get(node, ()):
+                positions[child] = (x + dx, y + dy)
+                stack.append(child)
+        return positions
+
+    def get_size(self, node):
+        size = self._sizes.get(node)
+        if size is None:
+            size = self._sizes[node] = self.size(node)
+        return size
+
+    def node_box(self, node):
+        """ :return: contour of node alone, anchor at (0, 0), and the row where its children
+        start """
+        left, top, width, height = self.get_size(node)
+        contour = Contour()
+        contour.add_box(left, left + width, top, top + height)
+        return contour, top + height + 1
+
+    def arrange(self, node, children, contours):
+        """ Put children side by side, node above them and return the contour of the whole.
+        Offsets of children are relative to node's anchor.
+        """
+        contour, children_top = self.node_box(node)
+        if not children:
+            return contour
+        combined = None
+        cols = []
+        rows = []
+        for child in children:
+            child_contour = contours.pop(child)
+            row = children_top - self.get_size(child)[1]
+            child_contour.shift(0, row)
+            if combined is None:
+                col = 0
+                combined = child_contour
+            else:
+                col = combined.separation(child_contour, self.padding) or 0
+                child_contour.shift(col, 0)
+                combined.merge(child_contour)
+            cols.append(col)
+            rows.append(row)
+        x = self.place_parent(node, children, cols)
+        combined.shift(-x, 0)
+        combined.merge(contour)
+        self.offsets[node] = [(child, (col - x, row)) for child, col, row in
+                              zip(children, cols, rows)]
+        return combined
+
+
+class StaggeredContourLayout(ContourLayout):
+    """ Layout where node stays in its place and children go down and right from it, left
+    child first. If a child's subtree doesn't fit, it is moved diagonally down and right until it
+    does. Edges are part of the contours, so that subtrees don't cover them. This is what
+    LeftFirstTree does with Grid.
+
+    :param step: columns and rows between node and its child
+    :param max_tries: how many diagonal steps are tried before giving up
+    """
+
+    def __init__(self, size, children, accept=None, step=2, max_tries=10):
+        super().__init__(size, children, accept=accept)
+        self.step = step
+        self.max_tries = max_tries
+
+    def node_box(self, node):
+        contour = Contour()
+        contour.add_point(0, 0)
+        return contour, self.step
+
+    def arrange(self, node, children, contours):
+        combined, ny = self.node_box(node)
+        step = self.step
+        nx = (len(children) // 2) * -step
+        offsets = []
+        for child in children:
+            child_contour = contours.pop(child)
+            child_contour.shift(nx, ny)
+            count = 0
+            while combined.overlaps(child_contour) and count < self.max_tries:
+                child_contour.shift(step, step)
+                nx += step
+                ny += step
+                count += 1
+            combined.merge(child_contour)
+            for row in range(1, ny):
+                combined.add_point(nx * row // ny, row)
+            offsets.append((child, (nx, ny)))
+            if len(children) > 2:
+                nx += step
+            elif len(children) == 2:
+                nx += step * 2
+        self.offsets[node] = offsets
+        return combined
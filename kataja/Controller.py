@@ -26,6 +26,7 @@ import sys
 from collections import abc
 
 import kataja
+from kataja.OrderedSet import OrderedSet
 from kataja.parser.HTMLToINode import HTMLToINode
 # flags = (gc.DEBUG_COLLECTABLE |
 # gc.DEBUG_UNCOLLECTABLE |
@@ -64,7 +65,8 @@ class Controller:
         self.main = None
         self.prefs = prefs
         self.structure = None
-        self.selected = []
+        self.selected = OrderedSet()
+        self.selection_revision = 0  # bumped when selection changes, see UIManager.update_actions
         self.selected_root = None
         self.rootmarker = '/'
         self.pointing_mode = False
@@ -72,6 +74,8 @@ class Controller:
         self.pointing_data = {}
         self.pressed = None  # set() # prepare for multitouch
         self.ui_pressed = None  # set() # different coordinates to pressed set
+        self.gesture_id = None  # id of ongoing mouse press-drag-release, see start_gesture
+        self._gesture_counter = 0
         self.hovering = None
         self.text_editor_focus = None
         self.dragged_focus = None
@@ -106,6 +110,9 @@ class Controller:
         # set these back on.
         self.action_redraw = True
         self.undo_pile = set()
+        # objects changed since last draw, whether undo was enabled or not. Forest.draw uses
+        # these to update only what has changed.
+        self.changed_objects = set()
         # ---------------------------
 
     def late_init(self, main: 'KatajaMain'):
@@ -203,7 +210,8 @@ class Controller:
             return
         for obj in self.selected:
             obj.update_selection_status(False)
-        self.selected = []
+        self.selected = OrderedSet()
+        self.selection_revision += 1
         self.main.selection_changed.emit()
 
     def select(self, objs):
@@ -213,48 +221,48 @@ class Controller:
         if had_objs:
             for obj in self.selected:
                 obj.update_selection_status(False)
-            self.selected = []
+            self.selected = OrderedSet()
+            self.selection_revision += 1
         if not objs:
             if had_objs:
                 self.main.selection_changed.emit()
             return
-        if not isinstance(objs, abc.Sequence):
+        if not isinstance(objs, (abc.Sequence, abc.Set)):
             objs = [objs]
         for obj in objs:
             obj.update_selection_status(True)
-        self.selected = objs
+        self.selected = OrderedSet(objs)
+        self.selection_revision += 1
         self.main.selection_changed.emit()
 
     def add_to_selection(self, objs):
         if not objs:
             return
-        if not isinstance(objs, abc.Sequence):
+        if not isinstance(objs, (abc.Sequence, abc.Set)):
             objs = [objs]
         found = False
         for obj in objs:
             if obj not in self.selected:
-                self.selected.append(obj)
+                self.selected.add(obj)
                 obj.update_selection_status(True)
                 found = True
         if found:
+            self.selection_revision += 1
             self.main.selection_changed.emit()
 
     def remove_from_selection(self, objs):
         if not objs:
             return
         found = False
-        if isinstance(objs, abc.Sequence):
-            for obj in objs:
-                if obj in self.selected:
-                    self.selected.remove(obj)
-                    obj.update_selection_status(False)
-                    found = True
-        else:
-            if objs in self.selected:
-                self.selected.remove(objs)
-                objs.update_selection_status(False)
+        if not isinstance(objs, (abc.Sequence, abc.Set)):
+            objs = [objs]
+        for obj in objs:
+            if obj in self.selected:
+                self.selected.discard(obj)
+                obj.update_selection_status(False)
                 found = True
         if found:
+            self.selection_revision += 1
             self.main.selection_changed.emit()
 
     def get_selected_nodes(self, of_type=None):
@@ -273,6 +281,18 @@ class Controller:
         else:
             return [edge for edge in self.selected if isinstance(edge, eclass)]
 
+    def start_gesture(self):
+        """ Mouse has been pressed in graph view: everything until its release belongs to same
+        gesture. Actions with k_merge_undo may merge their undo snapshots within one gesture,
+        e.g. when several dragged nodes are dropped at once.
+        :return: None
+        """
+        self._gesture_counter += 1
+        self.gesture_id = self._gesture_counter
+
+    def end_gesture(self):
+        self.gesture_id = None
+
     def press(self, obj):
         """ Mark object to be the last pressed object.
         :param obj:
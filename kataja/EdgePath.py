@@ -6,6 +6,7 @@ import kataja.globals as g
 from kataja.Shapes import SHAPE_PRESETS, outline_stroker
 from kataja.globals import EDGE_PLUGGED_IN, EDGE_OPEN, EDGE_CAN_INSERT, EDGE_RECEIVING_NOW, \
     EDGE_OPEN_DOMINANT, EDGE_RECEIVING_NOW_DOMINANT
+from kataja.singletons import ctrl
 from kataja.utils import equal_synobj
 
 CONNECT_TO_CENTER = 0
@@ -364,9 +365,9 @@ class EdgePath:
         self.make_arrowhead_at_start(uses_pen)
         self.make_arrowhead_at_end(uses_pen)
 
-        if self.make_fat_path and not self.use_simple_path:
+        if self.make_fat_path and not (self.use_simple_path or ctrl.view_manager.low_detail):
             # Fat path is the shape of the path with some extra margin to
-            # make it easier to click/touch
+            # make it easier to click/touch. Not needed when zoomed out too far to aim at edges.
             self.fat_path = outline_stroker.createStroke(self.draw_path)
         else:
             self.fat_path = self.draw_path
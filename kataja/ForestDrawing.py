@@ -23,6 +23,7 @@
 # ############################################################################
 import random
 import string
+from contextlib import contextmanager
 
 from PyQt6 import QtCore
 
@@ -35,6 +36,18 @@ from kataja.saved.movables.Image import Image
 from kataja.saved.movables.Node import Node
 from kataja.singletons import ctrl, classes, log
 
+MAX_BATCH_FADES = 100  # batches larger than this add and remove items without fading
+
+
+def parent_depth(item):
+    """ How many parent items are above this graphics item """
+    depth = 0
+    parent = item.parentItem() if hasattr(item, 'parentItem') else None
+    while parent is not None:
+        depth += 1
+        parent = parent.parentItem()
+    return depth
+
 
 class ForestDrawing:
     """ This is a class purely for legibility and code organisation. This operates on Forest data
@@ -50,6 +63,11 @@ class ForestDrawing:
         self.forest = forest
         self._marked_for_deletion = set()
         self.label_rotator = 0
+        self._batch_depth = 0
+        self._batch_adds = {}
+        self._batch_removes = {}
+        self._batch_fade_ins = []
+        self._batch_deselected = []
 
     @property
     def nodes(self):
@@ -66,6 +84,75 @@ class ForestDrawing:
     def poke(self, attribute):
         self.forest.poke(attribute)
 
+    # ### Batches ###########################################################
+
+    @contextmanager
+    def batch(self):
+        """ Collect scene insertions and removals done by create_node, create_edge, delete_node
+        and delete_edge and apply them in one pass when the outermost batch ends. Selection is
+        updated once instead of sending selection_changed for each deleted item, and fades are
+        started together at the end -- or skipped, if there are more than MAX_BATCH_FADES of them,
+        as hundreds of separate fade animations cost more than they show.
+
+        Items created in a batch are not in scene until the batch ends, and items created and
+        deleted within the same batch never visit the scene.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._apply_batch()
+
+    def _apply_batch(self):
+        adds = self._batch_adds
+        removes = self._batch_removes
+        fade_ins = self._batch_fade_ins
+        deselected = self._batch_deselected
+        self._batch_adds = {}
+        self._batch_removes = {}
+        self._batch_fade_ins = []
+        self._batch_deselected = []
+        if deselected:
+            ctrl.remove_from_selection(deselected)
+        fade = len(removes) + len(fade_ins) <= MAX_BATCH_FADES
+        for item, fade_out in removes.items():
+            self.forest.remove_from_scene(item, fade_out=fade and fade_out)
+        # parents go first: adding a child whose parent is not in scene would detach it from
+        # its parent, but children of an added item enter the scene with it.
+        for item in sorted(adds, key=parent_depth):
+            self.forest.add_to_scene(item)
+        if fade:
+            for item in fade_ins:
+                if item.scene():
+                    item.fade_in()
+
+    def _add_to_scene(self, item, fade=False):
+        if self._batch_depth:
+            self._batch_adds[item] = True
+            if fade:
+                self._batch_fade_ins.append(item)
+        else:
+            self.forest.add_to_scene(item)
+            if fade:
+                item.fade_in()
+
+    def _remove_from_scene(self, item, fade=True):
+        if self._batch_depth:
+            if self._batch_adds.pop(item, False):
+                return
+            self._batch_removes[item] = fade
+        else:
+            self.forest.remove_from_scene(item, fade_out=fade)
+
+    def _deselect(self, item):
+        if self._batch_depth:
+            if item in ctrl.selected:
+                self._batch_deselected.append(item)
+        else:
+            ctrl.remove_from_selection(item)
+
     @staticmethod
     def copy_node_position(source, target):
         """ Helper method for newly created items. Takes other item and copies movement related
@@ -141,7 +228,7 @@ class ForestDrawing:
         if pos:
             node.set_original_position(pos)
             # node.update_position(pos)
-        self.forest.add_to_scene(node)
+        self._add_to_scene(node)
         node.update_visibility(fade_in=False, fade_out=False)
         return node
 
@@ -173,9 +260,8 @@ class ForestDrawing:
         rel = Edge(self.forest, start=start, end=end, edge_type=edge_type, origin=origin)
         rel.after_init()
         self.forest.store(rel)
-        self.forest.add_to_scene(rel)
-        if fade and self.forest.in_display and start.is_visible() and end.is_visible():
-            rel.fade_in()
+        self._add_to_scene(rel, fade=fade and self.forest.in_display and start.is_visible() and
+                            end.is_visible())
         return rel
 
     # not used
@@ -302,11 +388,11 @@ class ForestDrawing:
         if hasattr(node, 'on_delete'):
             node.on_delete()
         # -- scene --
-        self.forest.remove_from_scene(node, fade_out=fade)
+        self._remove_from_scene(node, fade=fade)
         # -- undo stack --
         node.announce_deletion()
         # -- remove from selection
-        ctrl.remove_from_selection(node)
+        self._deselect(node)
         # -- remove circularity block
         self._marked_for_deletion.remove(node)
 
@@ -333,7 +419,7 @@ class ForestDrawing:
                     edge_down.start_links_to = None
                     edge_down.update_start_symbol()
         # -- selections --
-        ctrl.remove_from_selection(edge)
+        self._deselect(edge)
         if touch_nodes:
             if start_node:
                 if edge in start_node.edges_down:
@@ -358,7 +444,7 @@ class ForestDrawing:
             self.poke('edges')
             del self.edges[edge.uid]
         # -- scene --
-        self.forest.remove_from_scene(edge, fade_out=fade)
+        self._remove_from_scene(edge, fade=fade)
         # -- undo stack --
         edge.announce_deletion()
         # -- remove circularity block
@@ -629,32 +715,33 @@ class ForestDrawing:
         for node in self.forest.nodes.values():
             if node.is_leaf():
                 leaves[self.forest.parser.get_root_word(node.label)] = node
-        for line in defstring.splitlines():
-            if '::' not in line:
-                continue
-            key, value = line.split('::', 1)
-            key = key.strip()
-            if not key in leaves:
-                print('missing key ', key)
-                continue
-            parts = [x.strip() for x in value.split(',')]
-            node = leaves[key]
-            for part in parts:
-                if (part.startswith("'") and part.endswith("'")) or (
-                        part.startswith('"') and part.endswith('"')):
-                    # gloss node
-                    label = part[1:-1]
-                    self.create_gloss_node(label=label, host=node)
-                elif part:
-                    if ':' in part:
-                        fparts = part.split(':')
-                    else:
-                        fparts = [part]
-                    family = ''
-                    value = ''
-                    if len(fparts) > 2:
-                        family = fparts[2]
-                    if len(fparts) > 1:
-                        value = fparts[1]
-                    self.create_feature_node(label=fparts[0], value=value, family=family,
-                                             host=node)
+        with self.batch():
+            for line in defstring.splitlines():
+                if '::' not in line:
+                    continue
+                key, value = line.split('::', 1)
+                key = key.strip()
+                if not key in leaves:
+                    print('missing key ', key)
+                    continue
+                parts = [x.strip() for x in value.split(',')]
+                node = leaves[key]
+                for part in parts:
+                    if (part.startswith("'") and part.endswith("'")) or (
+                            part.startswith('"') and part.endswith('"')):
+                        # gloss node
+                        label = part[1:-1]
+                        self.create_gloss_node(label=label, host=node)
+                    elif part:
+                        if ':' in part:
+                            fparts = part.split(':')
+                        else:
+                            fparts = [part]
+                        family = ''
+                        value = ''
+                        if len(fparts) > 2:
+                            family = fparts[2]
+                        if len(fparts) > 1:
+                            value = fparts[1]
+                        self.create_feature_node(label=fparts[0], value=value, family=family,
+                                                 host=node)
@@ -27,11 +27,12 @@ import PyQt6.QtGui as QtGui
 import PyQt6.QtWidgets as QtWidgets
 from PyQt6.QtCore import Qt
 
+from kataja.PhysicsScheduler import PhysicsScheduler
 from kataja.globals import ViewUpdateReason, CONSTITUENT_NODE
 from kataja.saved.Edge import Edge
 from kataja.saved.movables.Node import Node
 from kataja.singletons import ctrl, prefs, qt_prefs
-from kataja.utils import to_tuple, open_symbol_data
+from kataja.utils import to_tuple, open_symbol_data, timed
 
 
 # from BlenderExporter import export_visible_items
@@ -55,10 +56,9 @@ class GraphScene(QtWidgets.QGraphicsScene):
             self.setBackgroundBrush(qt_prefs.no_brush)
         self._timer_id = 0
         self._fade_timer_id = 0
-        self.timer_counter = 0
         self._fade_steps = 0
         self._fade_steps_list = []
-        self.heat = 0
+        self.scheduler = PhysicsScheduler()
         # self.focusItemChanged.connect(self.inspect_focus_change)
         self.setStickyFocus(True)
 
@@ -433,8 +433,7 @@ class GraphScene(QtWidgets.QGraphicsScene):
         """
         if ctrl.play and not self._timer_id:
             self._timer_id = self.startTimer(int(prefs.fps_in_msec))
-            self.timer_counter = 0
-            self.heat = 5.0
+            self.scheduler.start()
 
     start_animations = item_moved
 
@@ -442,6 +441,19 @@ class GraphScene(QtWidgets.QGraphicsScene):
         """ Stops the move animation timer """
         self.killTimer(self._timer_id)
         self._timer_id = 0
+        if ctrl.forest:
+            ctrl.forest.update_culled_edges()
+
+    def settle(self):
+        """ Bring current forest to rest at once, without animation. Use before exporting
+        images when nothing has been animated.
+        """
+        self.stop_animations()
+        ctrl.items_moving = False
+        f = ctrl.forest
+        if f and f.is_parsed:
+            with timed('physics.settle'):
+                self.scheduler.settle(f)
 
     # @time_me
     def timerEvent(self, event):
@@ -468,19 +480,13 @@ class GraphScene(QtWidgets.QGraphicsScene):
         f = ctrl.forest
         if (not f) or (not f.is_parsed):
             return
-
-        self.timer_counter += 1
-        if self.heat > 0.1:
-            self.heat *= 0.96
-            # print('heat: ', self.heat)
-        else:
-            self.stop_animations()
         if ctrl.pressed:
             return
 
-        nodes_are_moving = f.move_nodes(self.heat)
+        with timed('physics.tick'):
+            moving = self.scheduler.frame(f, prefs.fps_in_msec / 1000)
 
-        if not (nodes_are_moving or self.timer_counter < 20):
+        if not moving:
             self.stop_animations()
             ctrl.items_moving = False
         ctrl.view_manager.update_viewport(ViewUpdateReason.ANIMATION_STEP)
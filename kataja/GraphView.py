@@ -27,7 +27,9 @@ import PyQt6.QtGui as QtGui
 import PyQt6.QtWidgets as QtWidgets
 from PyQt6.QtCore import Qt
 
+from kataja.Profiler import profiler
 from kataja.singletons import ctrl
+from kataja.utils import timed
 
 
 class GraphView(QtWidgets.QGraphicsView):
@@ -75,6 +77,11 @@ class GraphView(QtWidgets.QGraphicsView):
         QtWidgets.QGraphicsView.resizeEvent(self, event)
         ctrl.main.viewport_resized.emit()
 
+    def paintEvent(self, event):
+        with timed('render'):
+            QtWidgets.QGraphicsView.paintEvent(self, event)
+        profiler.count('repaints')
+
     def mousePressEvent(self, event):
         """ Here we have a workaround for clicking labels and having editing cursor appear to
         that specific position. We always store last mousePressEvent while they are still events
@@ -85,8 +92,13 @@ class GraphView(QtWidgets.QGraphicsView):
         """
         self.latest_mpe = event
         self.setFocus(QtCore.Qt.FocusReason.MouseFocusReason)
+        ctrl.start_gesture()
         QtWidgets.QGraphicsView.mousePressEvent(self, event)
 
+    def mouseReleaseEvent(self, event):
+        QtWidgets.QGraphicsView.mouseReleaseEvent(self, event)
+        ctrl.end_gesture()
+
     def replay_mouse_press(self):
         print('replaying mousepressevent')
         self.mousePressEvent(self.latest_mpe)
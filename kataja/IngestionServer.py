@@ -0,0 +1,362 @@
+# coding=utf-8
+# ############################################################################
+#
+# *** Kataja - Biolinguistic Visualization tool ***
+#
+# Copyright 2013 Jukka Purma
+#
+# This file is part of Kataja.
+#
+# Kataja is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Kataja is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kataja.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ############################################################################
+""" Local socket endpoint for pushing trees into a running Kataja.
+
+Protocol is newline-delimited JSON: each line sent by client is one request and each request gets
+one line of JSON back. A request is either a dict:
+
+    {"id": 1, "trees": ["[A B]", ...], "replace": false, "show": true, "render": false}
+
+or, for compatibility with older scripts, a bare list of treelist lines or a single tree string,
+which replaces the current forests like before.
+
+Parsing of JSON happens in the server thread. Requests that arrive close to each other are
+collected into a batch and the batch is applied to the document in GUI thread, in one go.
+Responses are written back to client when the GUI thread has applied the batch:
+
+    {"id": 1, "ok": true, "added": 1, "first_index": 4, "forests": 5, "render": {...}}
+
+Commands 'render' and 'parse' are for daemon mode, where Kataja runs headless and serves scripts
+through kataja.client:
+
+    {"id": 2, "command": "render", "trees": ["[A B]"], "format": "png"}
+    -> {"id": 2, "ok": true, "format": "png", "images": [<base64 encoded image>]}
+    {"id": 3, "command": "parse", "trees": ["[A B]"]}
+    -> {"id": 3, "ok": true, "forests": [{"trees": ["[.A B]"], "heading": "", "nodes": 3}]}
+"""
+
+import asyncio
+import base64
+import json
+
+import PyQt6.QtCore as QtCore
+
+from kataja.singletons import ctrl, log
+
+IP, PORT = '127.0.0.1', 62236
+MAX_BATCH_SIZE = 64
+MAX_LINE_LENGTH = 64 * 1024 * 1024
+
+
+class IngestionRequest:
+    """ One decoded client request waiting to be applied in GUI thread. Response is delivered
+    through the asyncio future of the server thread. """
+
+    def __init__(self, data, loop, future):
+        self.loop = loop
+        self.future = future
+        if isinstance(data, dict):
+            self.request_id = data.get('id')
+            trees = data.get('trees', [])
+            self.replace = bool(data.get('replace', False))
+            self.show = bool(data.get('show', self.replace))
+            self.render = bool(data.get('render', False))
+            self.command = data.get('command', 'trees')
+            self.data = data
+        else:
+            self.request_id = None
+            trees = data
+            self.replace = True
+            self.show = True
+            self.render = False
+            self.command = 'trees'
+            self.data = {}
+        if isinstance(trees, str):
+            trees = trees.splitlines()
+        self.trees = trees
+
+    def respond(self, response):
+        if self.request_id is not None:
+            response['id'] = self.request_id
+        self.loop.call_soon_threadsafe(self._set_result, response)
+
+    def _set_result(self, response):
+        if not self.future.done():
+            self.future.set_result(response)
+
+
+class IngestionThread(QtCore.QThread):
+    """ Runs asyncio event loop for the server so that socket IO never blocks the GUI thread. """
+
+    batch_ready = QtCore.pyqtSignal(object)
+
+    def __init__(self, host, port, parent=None):
+        QtCore.QThread.__init__(self, parent)
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.queue = None
+        self.server = None
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._serve())
+        except OSError as err:
+            log.warning(f'Cannot listen to {self.host}:{self.port} for incoming trees: {err}')
+        finally:
+            self.loop.close()
+
+    async def _serve(self):
+        self.queue = asyncio.Queue()
+        self.server = await asyncio.start_server(self._handle_client, self.host, self.port,
+                                                 limit=MAX_LINE_LENGTH)
+        batcher = asyncio.ensure_future(self._batcher())
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            batcher.cancel()
+
+    async def _batcher(self):
+        """ Collect all requests that are waiting and send them to GUI thread as one batch. """
+        while True:
+            batch = [await self.queue.get()]
+            # give a moment for the rest of the burst to arrive
+            await asyncio.sleep(0)
+            while not self.queue.empty() and len(batch) < MAX_BATCH_SIZE:
+                batch.append(self.queue.get_nowait())
+            self.batch_ready.emit(batch)
+
+    async def _handle_client(self, reader, writer):
+        """ Read requests as fast as they come, so that a client streaming many lines gets them
+        applied in batches, and write responses back in the order the requests came in. """
+        responses = asyncio.Queue()
+        responder = asyncio.ensure_future(self._respond(writer, responses))
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    await responses.put({'ok': False, 'error': 'request is too long'})
+                    break
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line.decode('utf-8'))
+                except (UnicodeDecodeError, json.JSONDecodeError) as err:
+                    await responses.put({'ok': False, 'error': f'bad json: {err}'})
+                    continue
+                future = self.loop.create_future()
+                await self.queue.put(IngestionRequest(data, self.loop, future))
+                await responses.put(future)
+        except ConnectionError:
+            pass
+        await responses.put(None)
+        await responder
+
+    @staticmethod
+    async def _respond(writer, responses):
+        try:
+            while True:
+                response = await responses.get()
+                if response is None:
+                    break
+                if isinstance(response, asyncio.Future):
+                    response = await response
+                await IngestionThread._write(writer, response)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _write(writer, response):
+        writer.write(json.dumps(response).encode('utf-8') + b'\n')
+        await writer.drain()
+
+    def stop(self):
+        if self.loop and self.server and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.server.close)
+        self.wait(1000)
+
+
+class IngestionServer(QtCore.QObject):
+    """ Receives trees from scripts and applies them to the current document. Socket handling is
+    done in IngestionThread, this side lives in GUI thread and does the document changes. """
+
+    def __init__(self, host=IP, port=PORT, parent=None):
+        QtCore.QObject.__init__(self, parent)
+        self.pending = []
+        self.thread = IngestionThread(host, port)
+        self.thread.batch_ready.connect(self.receive_batch)
+        self._flush_scheduled = False
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.thread.stop()
+
+    def receive_batch(self, batch):
+        """ Batches may arrive faster than we can draw, so collect them and handle everything that
+        has arrived when the event loop gets back to us.
+        :param batch: list of IngestionRequests
+        """
+        self.pending += batch
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            QtCore.QTimer.singleShot(0, self.apply_pending)
+
+    def apply_pending(self):
+        self._flush_scheduled = False
+        batch = self.pending
+        self.pending = []
+        if batch:
+            self.apply_batch(batch)
+
+    def apply_batch(self, batch):
+        """ Create forests for all requests in batch, add them to document and redraw only once.
+        Every request gets a response, even if creating forests or drawing them fails.
+        :param batch: list of IngestionRequests
+        """
+        responses = {}
+        try:
+            self._apply_batch(batch, responses)
+        except Exception as err:
+            log.error(f'Failed to apply incoming trees: {err}')
+            # trees requests are done only when their forests are drawn
+            for request in batch:
+                response = responses.get(request)
+                if response is None or (response['ok'] and request.command == 'trees'):
+                    responses[request] = {'ok': False, 'error': str(err)}
+        finally:
+            for request in batch:
+                request.respond(responses.get(request) or {'ok': False,
+                                                           'error': 'request was not handled'})
+
+    def _apply_batch(self, batch, responses):
+        """ Do the work of apply_batch.
+        :param batch: list of IngestionRequests
+        :param responses: dict of request -> response, to be filled here
+        """
+        document = ctrl.document
+        show = None
+        for request in batch:
+            if request.command in ('render', 'parse'):
+                if show:
+                    document.set_forest(show)
+                    show = None
+                responses[request] = self.render_request(request)
+                continue
+            elif request.command != 'trees':
+                responses[request] = {'ok': False, 'error': f'unknown command {request.command}'}
+                continue
+            try:
+                forests = document.create_forests(treelist=list(request.trees)) \
+                    if request.trees else []
+            except Exception as err:
+                log.error(f'Failed to create forests from incoming trees: {err}')
+                responses[request] = {'ok': False, 'error': str(err)}
+                continue
+            ctrl.disable_undo()
+            try:
+                if request.replace:
+                    document.retire_from_display()
+                    document.forests = forests
+                    document.forest = None
+                    first_index = 0
+                else:
+                    first_index = len(document.forests)
+                    document.forests = document.forests + forests
+            finally:
+                ctrl.resume_undo()
+            if forests and request.show:
+                show = forests[0]
+            responses[request] = {'ok': True, 'added': len(forests), 'first_index': first_index}
+        if show:
+            document.set_forest(show)
+            ctrl.main.action_finished(undoable=False)
+        elif document.forest is None and document.forests:
+            document.set_forest(document.forests[0])
+            ctrl.main.action_finished(undoable=False)
+        else:
+            ctrl.main.forest_changed.emit()
+        render = None
+        total = len(document.forests)
+        for request in batch:
+            response = responses.get(request)
+            if response and response['ok'] and request.command == 'trees':
+                response['forests'] = total
+                if request.render:
+                    if render is None:
+                        render = self.render_summary()
+                    response['render'] = render
+
+    def render_request(self, request):
+        """ Render and parse requests replace the forests of the document with forests from
+        request and return either the images or the resulting bracket trees of each forest. This
+        is what daemon mode (see kataja.client) uses, there each request stands on its own.
+        :param request: IngestionRequest
+        :return: response dict
+        """
+        document = ctrl.document
+        fmt = request.data.get('format', 'png')
+        if request.command == 'render' and fmt not in ('png', 'pdf'):
+            return {'ok': False, 'error': f'unknown format {fmt}'}
+        try:
+            forests = document.create_forests(treelist=list(request.trees))
+            ctrl.disable_undo()
+            try:
+                document.retire_from_display()
+                document.forests = forests
+                document.forest = None
+            finally:
+                ctrl.resume_undo()
+            results = []
+            for forest in forests:
+                document.set_forest(forest)
+                if request.command == 'render':
+                    image = ctrl.main.print_manager.render_to_bytes(fmt)
+                    results.append(base64.b64encode(image).decode('ascii'))
+                else:
+                    results.append({'trees': [tree_top.as_bracket_string() for tree_top in
+                                              forest.trees if hasattr(tree_top,
+                                                                      'as_bracket_string')],
+                                    'heading': forest.heading_text,
+                                    'nodes': len(forest.nodes)})
+        except Exception as err:
+            log.error(f'Failed to {request.command} incoming trees: {err}')
+            return {'ok': False, 'error': str(err)}
+        if request.command == 'render':
+            return {'ok': True, 'format': fmt, 'images': results}
+        return {'ok': True, 'forests': results}
+
+    @staticmethod
+    def render_summary():
+        forest = ctrl.forest
+        if not forest:
+            return {}
+        rect = ctrl.view_manager.print_rect()
+        return {'index': ctrl.document.current_index,
+                'nodes': len(forest.nodes),
+                'edges': len(forest.edges),
+                'width': rect.width(),
+                'height': rect.height()}
@@ -28,6 +28,10 @@ from PyQt6 import QtCore, QtWidgets, QtGui
 
 from kataja.globals import SELECTION
 from kataja.singletons import ctrl, log, running_environment
+from kataja.utils import timed
+
+# continuous operation is closed as one undo step when it hasn't had events for this long (ms)
+transaction_idle_time = 800
 
 
 class ShortcutSolver(QtCore.QObject):
@@ -118,6 +122,14 @@ class KatajaAction(QtGui.QAction):
     """ Actions are defined as classes that have only one instance. Action method()
     performs the actual work, but class variables below can be used to finetune how action is
     presented for the user.
+
+    After each action the enabled state and displayed value of actions are refreshed, but only for
+    actions whose inputs have changed. k_depends_on lists the state that enabler() and getter()
+    read: 'forest' (active document and forest), 'selection', 'scope' (active scope, and the
+    selection when scope is selection), 'settings' (any level of settings) and 'undo' (undo
+    stack). Actions that have neither enabler nor getter need to be refreshed only when they
+    are created or connected to new ui elements. Actions that don't declare k_depends_on, but
+    have an enabler or getter, are refreshed after every action.
      """
     k_action_uid = ''
     k_command = ''
@@ -125,11 +137,13 @@ class KatajaAction(QtGui.QAction):
     k_tooltip = ''
     k_tooltip_alt = ''
     k_undoable = True
+    k_merge_undo = False
     k_shortcut_context = ''
     k_shortcut = ''
     k_exclusive = False
     k_checkable = False
     k_viewgroup = False
+    k_depends_on = None
 
     def __init__(self):
         super().__init__(ctrl.main)
@@ -147,6 +161,16 @@ class KatajaAction(QtGui.QAction):
         self.tip0 = self.k_tooltip or self.command
         self.tip1 = self.k_tooltip_alt or self.command_alt or self.tip0
         self.disable_undo_and_message = False
+        self._idle_timer = None
+        self._idle_undo_manager = None
+        self.outdated = True
+        if self.k_depends_on is not None:
+            self.depends_on = frozenset(self.k_depends_on)
+        elif type(self).enabler is KatajaAction.enabler and \
+                type(self).getter is KatajaAction.getter:
+            self.depends_on = frozenset()
+        else:
+            self.depends_on = None
         # when triggered from menu, forward the call to more complex trigger handler
         self.triggered.connect(self.run)
         shortcut = self.k_shortcut
@@ -211,6 +235,14 @@ class KatajaAction(QtGui.QAction):
         """
         if not self.isEnabled():
             return
+        with timed('action.' + self.k_action_uid):
+            self._run(args, kwargs, fetch_params, print_command)
+
+    def _run(self, args, kwargs, fetch_params, print_command):
+        undo_manager = getattr(ctrl.forest, 'undo_manager', None)
+        if undo_manager and not self.disable_undo_and_message:
+            # changes from earlier continuous operation shouldn't get mixed with this one
+            undo_manager.end_transaction_unless(self.k_action_uid)
         # Prepare to use alt_command in feedback if the action supports it
         command = self.command
         if self.isCheckable() and self.isChecked() and self.command_alt:
@@ -269,14 +301,23 @@ class KatajaAction(QtGui.QAction):
                 reply = f'({sc}) {message or command}'
             else:
                 reply = message
+            if self.k_merge_undo and ctrl.gesture_id is not None:
+                merge_key = self.k_action_uid, ctrl.gesture_id
+            else:
+                merge_key = None
             ctrl.main.action_finished(m=reply, undoable=self.undoable and not ctrl.undo_disabled,
-                                      error=error, play=self.autoplay)
+                                      error=error, play=self.autoplay, merge_key=merge_key,
+                                      transaction_key=self.k_action_uid)
+            # final action of continuous operation closes its undo transaction
+            if undo_manager and undo_manager.transaction_key == self.k_action_uid:
+                undo_manager.end_transaction()
 
     def update_action(self):
         """ If action is tied to some meter (e.g. number field that is used to show value and
         change it), update the value in the meter and see if it should be enabled.
         :return:
         """
+        self.outdated = False
         on = self.enabler()
         self.set_enabled(on)
         if on:
@@ -312,6 +353,40 @@ class KatajaAction(QtGui.QAction):
             self.disable_undo_and_message = False
             ctrl.resume_undo()
 
+    def trigger_continuous(self, *args, **kwargs):
+        """ Continuous UI events, e.g. moving a slider or scrolling a spinbox, run the action for
+        each event, but their changes are collected into one undo transaction. The transaction
+        is closed when the action is run normally, e.g. when slider is released, or when no
+        events have come for a while, e.g. after scrolling a spinbox.
+        """
+        if ctrl.main.init_done:
+            undo_manager = getattr(ctrl.forest, 'undo_manager', None)
+            if undo_manager and self.undoable:
+                undo_manager.start_transaction(self.k_action_uid)
+                self._close_transaction_when_idle(undo_manager)
+            else:
+                ctrl.disable_undo()
+            self.disable_undo_and_message = True
+            self.run(*args, **kwargs)
+            self.disable_undo_and_message = False
+            if not (undo_manager and self.undoable):
+                ctrl.resume_undo()
+
+    def _close_transaction_when_idle(self, undo_manager):
+        if not self._idle_timer:
+            self._idle_timer = QtCore.QTimer(self)
+            self._idle_timer.setSingleShot(True)
+            self._idle_timer.timeout.connect(self._close_idle_transaction)
+        self._idle_undo_manager = undo_manager
+        self._idle_timer.start(transaction_idle_time)
+
+    def _close_idle_transaction(self):
+        undo_manager = self._idle_undo_manager
+        self._idle_undo_manager = None
+        if undo_manager and undo_manager.transaction_key == self.k_action_uid:
+            undo_manager.end_transaction()
+            ctrl.ui.update_actions()
+
     def connect_element(self, element, connect_slot=None):
         """
 
@@ -320,6 +395,8 @@ class KatajaAction(QtGui.QAction):
         """
         element.k_action = self
         self.elements.add(element)
+        # new element gets its enabled state and value in next update
+        self.outdated = True
 
         # gray out ui element and its label if action is disabled
         if hasattr(element, 'setEnabled'):
@@ -349,7 +426,7 @@ class KatajaAction(QtGui.QAction):
         continuous_action_slot_name = getattr(element, 'continuous_action_slot', '')
         if continuous_action_slot_name:
             continuous_action_slot = getattr(element, continuous_action_slot_name)
-            continuous_action_slot.connect(self.trigger_but_suppress_undo)
+            continuous_action_slot.connect(self.trigger_continuous)
         self.on_connect(element)
 
     def disconnect_element(self, element):
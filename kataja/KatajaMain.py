@@ -30,8 +30,6 @@
 # Classnames are in camelcase.
 
 import gc
-import json
-import socketserver
 
 import PyQt6.QtCore as QtCore
 import PyQt6.QtGui as QtGui
@@ -40,10 +38,12 @@ import PyQt6.QtWidgets as QtWidgets
 import kataja.globals as g
 from kataja.GraphScene import GraphScene
 from kataja.GraphView import GraphView
+from kataja.IngestionServer import IngestionServer, PORT
 from kataja.LogWidgetPusher import capture_stdout
-from kataja.PaletteManager import PaletteManager
+from kataja.PaletteManager import PaletteManager, ui_color_keys
 from kataja.PluginManager import PluginManager
 from kataja.PrintManager import PrintManager
+from kataja.Profiler import profiler
 from kataja.Recorder import Recorder
 from kataja.UIManager import UIManager
 from kataja.ViewManager import ViewManager
@@ -52,8 +52,6 @@ from kataja.ui_support.PreferencesDialog import PreferencesDialog
 from kataja.utils import quit
 from kataja.visualizations.available import VISUALIZATIONS
 
-IP, PORT = '127.0.0.1', 62236
-
 # only for debugging (Apple-m, memory check), can be commented
 # try:
 # import objgraph
@@ -106,27 +104,6 @@ HeadingWidget QLabel {font-family: "%(main_font)s";
 """
 
 
-class Emitter(QtCore.QObject):
-    signal = QtCore.pyqtSignal(str)
-
-
-class Handler(socketserver.BaseRequestHandler):
-    emitter = Emitter()
-
-    def handle(self):
-        self.emitter.signal.emit(self.request.recv(1024).decode())
-
-
-class Thread(QtCore.QThread):
-    def __init__(self, target, parent=None):
-        QtCore.QThread.__init__(self, parent)
-        self.target = target
-
-    def run(self):
-        while True:
-            self.target()
-
-
 class KatajaMain(QtWidgets.QMainWindow):
     """ Qt's main window. When this is closed, application closes. Graphics are
     inside this, in scene objects with view widgets. This window also manages
@@ -145,25 +122,26 @@ class KatajaMain(QtWidgets.QMainWindow):
     viewport_resized = QtCore.pyqtSignal()
     visualisation_changed = QtCore.pyqtSignal()
 
-    def __init__(self, kataja_app, tree='', plugin='', image_out='', no_prefs=False, reset_prefs=False):
+    def __init__(self, kataja_app, tree='', plugin='', image_out='', no_prefs=False, reset_prefs=False,
+                 daemon=False, port=PORT):
         """ KatajaMain initializes all its children and connects itself to
         be the main window of the given application. Receives launch arguments:
         :param no_prefs: bool, don't load or save preferences
         :param reset_prefs: bool, don't attempt to load preferences, use defaults instead
+        :param daemon: bool, run without window and serve render and parse requests from
+        kataja.client
+        :param port: port for receiving trees and requests from scripts
 
         """
         # noinspection PyArgumentList
         QtWidgets.QMainWindow.__init__(self)
-        silent = bool(image_out)
+        silent = bool(image_out) or daemon
         self.init_done = False
         self._stored_init_state = True
         self.disable_signaling()
         self.outgoing = []
-        Handler.emitter.signal.connect(self.receive_external_signal)
-        self.server = socketserver.TCPServer((IP, PORT), Handler)
-
-        thread = Thread(target=self.server.handle_request)
-        thread.start()
+        self.server = IngestionServer(port=port, parent=self)
+        self.server.start()
         kataja_app.processEvents()
 
         self.use_tooltips = True
@@ -179,6 +157,7 @@ class KatajaMain(QtWidgets.QMainWindow):
         self.app = kataja_app
         self.classes = classes
         self.save_prefs = not no_prefs
+        self.colors_applied = False
         self.color_manager = PaletteManager(self)
         self.plugin_manager = PluginManager()
         self.document = None
@@ -188,6 +167,7 @@ class KatajaMain(QtWidgets.QMainWindow):
         prefs.import_node_classes(classes)  # add node styles defined at class to prefs
         prefs.load_preferences(disable=reset_prefs or no_prefs)
         qt_prefs.late_init(running_environment, prefs, log)
+        self.update_profiling()
         self.plugin_manager.find_plugins(prefs.plugins_path or running_environment.plugins_path)
         self.setWindowIcon(qt_prefs.kataja_icon)
         self.print_manager = PrintManager()
@@ -244,26 +224,20 @@ class KatajaMain(QtWidgets.QMainWindow):
         if image_out:
             self.print_manager.print_all(running_environment.default_userspace_path, image_out)
             quit()
+        elif daemon:
+            log.info(f'Kataja daemon listening to port {port}')
 
     @property
     def forest(self):
         return self.document.forest
 
-    def receive_external_signal(self, json_data):
-        data = json.loads(json_data)
-        print('received: ', data)
-        forests = self.document.create_forests(treelist=data)
-        if forests:
-            self.document.forests = forests
-            self.document.set_forest(forests[0])
-
     def update_style_sheet(self):
         c = ctrl.cm.drawing()
         ui = ctrl.cm.ui()
         f = qt_prefs.get_font(g.UI_FONT)
         fm = qt_prefs.get_font(g.MAIN_FONT)
         fc = qt_prefs.get_font(g.CONSOLE_FONT)
-        self.setStyleSheet(stylesheet % {
+        style_sheet = stylesheet % {
             'draw': c.name(),
             'lighter': c.lighter().name(),
             'paper': ctrl.cm.paper().name(),
@@ -278,7 +252,10 @@ class KatajaMain(QtWidgets.QMainWindow):
             'heading_font_size': fm.pointSize() * 2,
             'console_font': fc.family(),
             'console_font_size': fc.pointSize(),
-        })
+        }
+        # restyling the whole window is slow, don't do it if nothing changes
+        if style_sheet != self.styleSheet():
+            self.setStyleSheet(style_sheet)
 
     def leaveEvent(self, event):
         ctrl.ui.force_hide_help()
@@ -364,7 +341,8 @@ class KatajaMain(QtWidgets.QMainWindow):
 
     # ## Actions #######################################################
 
-    def action_finished(self, m='', undoable=True, error=None, play=False):
+    def action_finished(self, m='', undoable=True, error=None, play=False, merge_key=None,
+                        transaction_key=None):
         """ Write action to undo stack, report back to user and redraw trees
         if necessary
         :param m: message for undo
@@ -372,6 +350,9 @@ class KatajaMain(QtWidgets.QMainWindow):
         this action.
         :param error message
         :param play: force animations to play
+        :param merge_key: merge the snapshot with previous one if it had the same key and
+        changed the same things
+        :param transaction_key: operation this comes from, see UndoManager.take_snapshot
         """
         if error:
             log.error(error)
@@ -381,7 +362,8 @@ class KatajaMain(QtWidgets.QMainWindow):
             if ctrl.action_redraw:
                 self.forest.draw()
             if undoable and not error:
-                self.forest.undo_manager.take_snapshot(m)
+                self.forest.undo_manager.take_snapshot(m, merge_key=merge_key,
+                                                       transaction_key=transaction_key)
         if play:
             self.graph_scene.start_animations()
         ctrl.ui.update_actions()
@@ -447,7 +429,8 @@ class KatajaMain(QtWidgets.QMainWindow):
         :param event:
         """
         QtWidgets.QMainWindow.closeEvent(self, event)
-        self.server.server_close()
+        self.server.stop()
+        self.recorder.wait_for_encoders()
         if ctrl.print_garbage:
             # import objgraph
             log.debug('garbage stats: ' + str(gc.get_count()))
@@ -464,24 +447,34 @@ class KatajaMain(QtWidgets.QMainWindow):
     def update_colors(self, randomise=False, animate=True):
         """ This is the master palette change.
         Its effects should propagate to all objects in scene and ui, either through updated
-        style sheets, paletteChanged -events or 'palette_changed' -signals.
+        style sheets, paletteChanged -events or 'palette_changed' -signals. Only the colors that
+        actually changed are propagated: if background stays the same, only the items drawn with
+        changed colors are repainted, and if nothing changed, nothing is done.
         :param randomise:
         :param animate:
         :return:
         """
         cm = self.color_manager
         old_gradient_base = cm.paper()
-        cm.update_colors(randomise=randomise)
-        self.app.setPalette(cm.get_qt_palette())
-        self.update_style_sheet()
+        changed = cm.update_colors(randomise=randomise)
+        if self.colors_applied and not changed:
+            return
+        if changed & ui_color_keys or not self.colors_applied:
+            self.app.setPalette(cm.get_qt_palette())
+            self.update_style_sheet()
         ctrl.main.palette_changed.emit()
-        if cm.gradient:
-            if old_gradient_base != cm.paper() and animate:
-                self.graph_scene.fade_background_gradient(old_gradient_base, cm.paper())
+        if 'background1' in changed or not self.colors_applied:
+            # new background, everything in scene is repainted anyways
+            if cm.gradient:
+                if old_gradient_base != cm.paper() and animate:
+                    self.graph_scene.fade_background_gradient(old_gradient_base, cm.paper())
+                else:
+                    self.graph_scene.setBackgroundBrush(cm.gradient)
             else:
-                self.graph_scene.setBackgroundBrush(cm.gradient)
-        else:
-            self.graph_scene.setBackgroundBrush(qt_prefs.no_brush)
+                self.graph_scene.setBackgroundBrush(qt_prefs.no_brush)
+        elif self.forest:
+            self.forest.update_colors(changed)
+        self.colors_applied = True
         self.update()
 
     ### Applying specific preferences globally.
@@ -493,6 +486,13 @@ class KatajaMain(QtWidgets.QMainWindow):
     def prepare_easing_curve():
         qt_prefs.prepare_easing_curve(prefs.curve, prefs.move_frames)
 
+    @staticmethod
+    def update_profiling():
+        if prefs.profiling:
+            profiler.enable()
+        else:
+            profiler.disable()
+
     def update_color_theme(self):
         self.change_color_theme(prefs.color_theme, force=True)
 
@@ -0,0 +1,123 @@
+# -*- coding: UTF-8 -*-
+# ############################################################################
+#
+# *** Kataja - Biolinguistic Visualization tool ***
+#
+# Copyright 2013 Jukka Purma
+#
+# This file is part of Kataja.
+#
+# Kataja is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Kataja is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kataja.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ############################################################################
+
+import math
+from collections import OrderedDict
+
+from PyQt6 import QtCore, QtGui
+
+MIN_SCALE = 1 / 8
+MAX_SCALE = 16
+BUDGET = 64 * 1024 * 1024  # bytes of pixels kept in cache
+SMOOTH = QtGui.QPainter.RenderHint.SmoothPixmapTransform
+
+
+class LabelPixmapCache:
+    """ Shared cache of rendered label documents. Laying out and drawing rich text is the most
+    expensive part of painting a node, and during animations every moving label is painted on
+    every frame. Labels with identical content, font, width and color -- very common with
+    features and traces -- share one pixmap, which is drawn at the nearest power of two of the
+    current zoom so that it stays sharp when zooming.
+
+    Pixmaps are kept in least recently used order and dropped when they take more than BUDGET
+    bytes. Printing doesn't use the cache, labels are drawn as text there.
+    """
+
+    def __init__(self, budget=BUDGET):
+        self.budget = budget
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self._pixmaps = OrderedDict()
+
+    def clear(self):
+        self._pixmaps.clear()
+        self.used = 0
+
+    @staticmethod
+    def scale_bucket(painter) -> float:
+        """ Round the scale that painter uses to the next power of two.
+        :param painter: QPainter
+        :return: float
+        """
+        t = painter.worldTransform()
+        scale = math.hypot(t.m11(), t.m12()) * painter.device().devicePixelRatioF()
+        if scale <= MIN_SCALE:
+            return MIN_SCALE
+        elif scale >= MAX_SCALE:
+            return MAX_SCALE
+        return 2 ** math.ceil(math.log2(scale))
+
+    def draw(self, label, painter, color):
+        """ Draw label's document with painter using a cached pixmap.
+        :param label: SimpleLabel
+        :param painter: QPainter
+        :param color: QColor for text
+        """
+        rect = label.boundingRect()
+        if rect.isEmpty():
+            return
+        bucket = self.scale_bucket(painter)
+        key = label.pixmap_key(), color.rgba(), bucket
+        pixmap = self._pixmaps.get(key)
+        if pixmap is None:
+            self.misses += 1
+            pixmap = self._render(label.document(), rect, color, bucket)
+            self._pixmaps[key] = pixmap
+            self.used += pixmap.width() * pixmap.height() * 4
+            while self.used > self.budget and len(self._pixmaps) > 1:
+                _, old = self._pixmaps.popitem(last=False)
+                self.used -= old.width() * old.height() * 4
+        else:
+            self.hits += 1
+            self._pixmaps.move_to_end(key)
+        smooth = painter.testRenderHint(SMOOTH)
+        if not smooth:
+            painter.setRenderHint(SMOOTH)
+        painter.drawPixmap(rect.topLeft(), pixmap)
+        if not smooth:
+            painter.setRenderHint(SMOOTH, False)
+
+    @staticmethod
+    def _render(doc, rect, color, bucket) -> QtGui.QPixmap:
+        pixmap = QtGui.QPixmap(max(1, math.ceil(rect.width() * bucket)),
+                               max(1, math.ceil(rect.height() * bucket)))
+        pixmap.setDevicePixelRatio(bucket)
+        pixmap.fill(QtCore.Qt.GlobalColor.transparent)
+        painter = QtGui.QPainter(pixmap)
+        painter.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing)
+        painter.setRenderHint(QtGui.QPainter.RenderHint.TextAntialiasing)
+        painter.translate(-rect.topLeft())
+        painter.setClipRect(rect)
+        context = QtGui.QAbstractTextDocumentLayout.PaintContext()
+        palette = context.palette
+        palette.setColor(QtGui.QPalette.ColorRole.Text, color)
+        context.palette = palette
+        context.clip = rect
+        doc.documentLayout().draw(painter, context)
+        painter.end()
+        return pixmap
+
+
+label_pixmap_cache = LabelPixmapCache()
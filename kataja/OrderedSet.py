@@ -0,0 +1,89 @@
+# -*- coding: UTF-8 -*-
+# ############################################################################
+#
+# *** Kataja - Biolinguistic Visualization tool ***
+#
+# Copyright 2013 Jukka Purma
+#
+# This file is part of Kataja.
+#
+# Kataja is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Kataja is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kataja.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ############################################################################
+
+from collections import abc
+
+
+class OrderedSet(abc.MutableSet):
+    """ Set that remembers the order in which items were added. Membership tests, adding and
+    removing cost the same as with a set, and the first and last items can be read by index like
+    from a list (selected[0], selected[-1]). Other indices need a walk through the items.
+    Iteration goes over a snapshot of items, so the set can be changed while looping over it.
+
+    Used for ctrl.selected, where selection order matters, but clicking or rubber band selecting
+    shouldn't scan the whole selection for each item.
+    :param items: iterable of hashable items
+    """
+
+    def __init__(self, items=()):
+        self._items = dict.fromkeys(items)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        # iterate over a snapshot: selection is often changed while looping over it, e.g. when
+        # deleting selected items
+        return iter(list(self._items))
+
+    def __reversed__(self):
+        return reversed(list(self._items))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self._items)[i]
+        n = len(self._items)
+        if n and (i == 0 or i == -n):
+            return next(iter(self._items))
+        elif n and (i == -1 or i == n - 1):
+            return next(reversed(self._items))
+        # other indices, and IndexError for empty set
+        return list(self._items)[i]
+
+    def __eq__(self, other):
+        if isinstance(other, OrderedSet):
+            return list(self._items) == list(other._items)
+        elif isinstance(other, abc.Sequence):
+            return list(self._items) == list(other)
+        return abc.MutableSet.__eq__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'OrderedSet({list(self._items)})'
+
+    def add(self, item):
+        self._items[item] = None
+
+    def discard(self, item):
+        self._items.pop(item, None)
+
+    def clear(self):
+        self._items.clear()
+
+    def copy(self):
+        return OrderedSet(self._items)
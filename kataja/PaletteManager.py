@@ -25,7 +25,7 @@
 import math
 import operator
 import random
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 
 import PyQt6.QtGui as QtGui
 from PyQt6.QtGui import QColor
@@ -40,6 +40,9 @@ color_keys = [f'content{i}' for i in range(1, 4)] + \
              [f'accent{k}' for k in range(1, 9)] + \
              [f'accent{l}tr' for l in range(1, 9)] + \
              [f'custom{m}' for m in range(1, 10)]
+# colors used by application's Qt palettes and style sheet
+ui_color_keys = {'content1', 'content2', 'content3', 'background1', 'background2', 'accent2',
+                 'accent8'}
 
 # Solarized colors from http://ethanschoonover.com/solarized  (Ethan Schoonover)
 # We are going to have one theme built around these.
@@ -123,6 +126,53 @@ def shady(color, alpha):
     return c
 
 
+# Color names are looked up from a grid of NAME_CELL x NAME_CELL x NAME_CELL rgb cells, starting
+# from the cell of the color and widening the search one layer of cells at a time.
+NAME_CELL = 32
+_color_name_grid = None
+_color_name_memo = {}
+
+
+def closest_color_name(r, g, b) -> str:
+    """ Name of the closest color in color_names, by distance in rgb space. Same as going through
+    all names and picking the first one with the smallest distance.
+    :param r: 0-255
+    :param g: 0-255
+    :param b: 0-255
+    :return: str
+    """
+    global _color_name_grid
+    name = _color_name_memo.get((r, g, b))
+    if name:
+        return name
+    if _color_name_grid is None:
+        _color_name_grid = defaultdict(list)
+        for i, (name, hex, (ir, ig, ib)) in enumerate(color_names):
+            _color_name_grid[ir // NAME_CELL, ig // NAME_CELL, ib // NAME_CELL].append(i)
+    cr, cg, cb = r // NAME_CELL, g // NAME_CELL, b // NAME_CELL
+    last_layer = 256 // NAME_CELL
+    d_min = 100000
+    best = 0
+    for layer in range(last_layer + 1):
+        for dr in range(-layer, layer + 1):
+            for dg in range(-layer, layer + 1):
+                for db in range(-layer, layer + 1):
+                    if max(abs(dr), abs(dg), abs(db)) != layer:
+                        continue
+                    for i in _color_name_grid.get((cr + dr, cg + dg, cb + db), ()):
+                        ir, ig, ib = color_names[i][2]
+                        d = (r - ir) * (r - ir) + (g - ig) * (g - ig) + (b - ib) * (b - ib)
+                        if d < d_min or (d == d_min and i < best):
+                            d_min = d
+                            best = i
+        # colors in further layers differ at least this much in one of r, g or b
+        if d_min < (layer * NAME_CELL + 1) ** 2:
+            break
+    name = color_names[best][0]
+    _color_name_memo[r, g, b] = name
+    return name
+
+
 class PaletteManager:
     """ Provides detailed access to current active palette and means to create and choose
         palettes.
@@ -147,6 +197,8 @@ class PaletteManager:
         self.gradient.setSpread(QtGui.QGradient.Spread.PadSpread)
         self.background_lightness = 0.5
         self.custom = False
+        self._computed_palettes = {}  # (hsv, contrast, faded) -> dict of colors
+        self._applied_colors = {}  # color key -> rgba in previous update_colors
         # Theme management
         self.default_themes = color_themes
         self.custom_themes = OrderedDict()
@@ -275,17 +327,12 @@ class PaletteManager:
                     self.hsv = list(remembered[theme_key])
                     found = True
             if not found:
+                # pick lightness directly from the allowed range instead of trying random rgb
+                # colors until one fits
                 lu_min = data.get('lu_min', 25)
-                lu = 101
                 lu_max = data.get('lu_max', 95)
-                r = random.random()
-                g = random.random()
-                b = random.random()
-                while not (lu_min < lu < lu_max):
-                    r = random.random()
-                    g = random.random()
-                    b = random.random()
-                    hu, su, lu = rgb_to_husl(r, g, b)
+                r, g, b = husl_to_rgb(random.random() * 360, random.random() * 100,
+                                      lu_min + random.random() * (lu_max - lu_min))
                 key_color = c().fromRgbF(r, g, b)
                 self.hsv = list(key_color.getHsvF())[:3]
                 if ctrl.forest:
@@ -380,18 +427,26 @@ class PaletteManager:
             self.background_lightness = self.d['background1'].lightnessF()
             ctrl.main.update_colors(randomise=False, animate=False)
 
-    def update_colors(self, randomise=False):
-        """ Create/get root color and build palette around it
+    def update_colors(self, randomise=False) -> set:
+        """ Create/get root color and build palette around it. Qt palettes are rebuilt only if
+        colors they use have changed.
         :param randomise: if color mode allows, generate new base color
+        :return: set of color keys whose color changed since previous update_colors
         """
         if ctrl.forest:
             theme_key = ctrl.forest.settings.get('color_theme')
         else:
             theme_key = ctrl.doc_settings.get('color_theme')
         self.activate_color_theme(theme_key, try_to_remember=not randomise)
-        self.get_qt_palette(cached=False)
-        self.get_qt_palette_for_ui(cached=False)
-        self.create_accent_palettes()
+        # compare to colors of previous update, colors may have been set directly after that
+        applied = self._applied_colors
+        changed = {key for key, color in self.d.items() if applied.get(key) != color.rgba()}
+        self._applied_colors = {key: color.rgba() for key, color in self.d.items()}
+        if changed or not self._palette:
+            self.get_qt_palette(cached=False)
+            self.get_qt_palette_for_ui(cached=False)
+            self.create_accent_palettes()
+        return changed
 
     def build_solarized(self, light=True):
         """
@@ -436,14 +491,29 @@ class PaletteManager:
 
     def compute_palette(self, hsv, contrast=55, faded=False):
         """ Create/get root color and build palette around it.
-        Leaves custom colors as they are. """
+        Leaves custom colors as they are. Computed palettes are remembered, so switching back to
+        a theme doesn't need to go through husl conversions again. """
 
         self.hsv = hsv
         self.theme_contrast = contrast
+        cache_key = tuple(hsv), contrast, faded
+        computed = self._computed_palettes.get(cache_key)
+        if computed is None:
+            self._compute_palette_colors(hsv, contrast, faded)
+            self._computed_palettes[cache_key] = {key: QColor(self.d[key]) for key in
+                                                  color_keys if not key.startswith('custom')}
+        else:
+            for key, color in computed.items():
+                self.d[key] = QColor(color)
+        self.current_hex = self.d['content1'].name()
+        self.gradient.setColorAt(1, self.d['background1'])
+        self.gradient.setColorAt(0, self.d['background1'].lighter())
+        self.background_lightness = self.d['background1'].lightnessF()
+
+    def _compute_palette_colors(self, hsv, contrast, faded):
         # # This is the base color ##
         key = c()
         key.setHsvF(*hsv)
-        self.current_hex = key.name()
         r, g, b, a = key.getRgbF()
         h, s, l = rgb_to_husl(r, g, b)
         if l > 50:
@@ -483,9 +553,6 @@ class PaletteManager:
         else:
             background2 = adjust_lightness(background1, 8)
         self.d['background2'] = background2
-        self.gradient.setColorAt(1, self.d['background1'])
-        self.gradient.setColorAt(0, self.d['background1'].lighter())
-        self.background_lightness = background1.lightnessF()
 
     # Getters for common color roles ###########################################
 
@@ -640,15 +707,7 @@ class PaletteManager:
             log.warning('Unknown color: ', color)
             return 'unknown'
         r, g, b, a = cc.getRgb()
-        d_min = 100000
-        best = 0
-        for i, (name, hex, rgb) in enumerate(color_names):
-            ir, ig, ib = rgb
-            d = (r - ir) * (r - ir) + (g - ig) * (g - ig) + (b - ib) * (b - ib)
-            if d < d_min:
-                d_min = d
-                best = i
-        return color_names[best][0]
+        return closest_color_name(r, g, b)
 
     # ### QPalettes ################################################
 
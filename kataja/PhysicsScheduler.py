@@ -0,0 +1,159 @@
+# -*- coding: UTF-8 -*-
+# ############################################################################
+#
+# *** Kataja - Biolinguistic Visualization tool ***
+#
+# Copyright 2013 Jukka Purma
+#
+# This file is part of Kataja.
+#
+# Kataja is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Kataja is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kataja.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ############################################################################
+
+import math
+import time
+
+from kataja.Visualization import physics_random
+
+START_HEAT = 5.0
+MIN_HEAT = 0.1
+COOLING = 0.96  # heat is multiplied by this after each full physics step
+ENERGY_THRESHOLD = 0.05  # mean squared movement (px²) of nodes below which forest is at rest
+FRAME_BUDGET_SHARE = 0.5  # share of frame time that movement can use, rest is for painting
+MAX_SUBSTEPS = 8
+MAX_PARTS = 16
+MAX_SETTLE_STEPS = 500
+PHYSICS_SEED = 1
+
+
+class PhysicsScheduler:
+    """ Runs the movement of nodes for each animation frame of GraphScene.
+
+    A frame advances animated movements (move_to) by one frame, and physics of dynamic
+    visualizations by as much as fits the frame budget: if a physics step is cheap, several
+    physics-only substeps are taken, and if a step costs more than the budget, it is split into
+    parts so that each frame moves only every n:th node. Cost of a step is measured as it goes.
+    Heat cools after each full step, so the course of physics depends on the number of steps
+    taken, not on frame rate.
+
+    Movement is over when there are no animated movements left and the mean squared movement of
+    nodes falls below ENERGY_THRESHOLD, or when heat has cooled down.
+
+    settle() runs the same steps without timer and animation frames, e.g. before exporting
+    images in daemon mode, where nothing animates. It seeds physics noise, so that the same
+    forest settles the same way every time.
+    """
+
+    def __init__(self):
+        self.heat = 0
+        self.steps = 0
+        self.frames = 0
+        self.energy = 0
+        self.step_cost = 0  # seconds, moving average of a full physics step
+        self.parts = 1
+        self._part = 0
+        self._part_energy = 0
+
+    def start(self):
+        self.heat = START_HEAT
+        self.steps = 0
+        self.frames = 0
+        self.energy = 0
+        self._part = 0
+        self._part_energy = 0
+
+    def is_hot(self):
+        return self.heat > MIN_HEAT
+
+    def _measure(self, cost):
+        if self.step_cost:
+            self.step_cost = self.step_cost * 0.8 + cost * 0.2
+        else:
+            self.step_cost = cost
+
+    def _cool(self):
+        self.steps += 1
+        self.heat *= COOLING
+
+    def frame(self, forest, frame_time) -> bool:
+        """ Move nodes for one animation frame.
+        :param forest: Forest
+        :param frame_time: seconds between frames
+        :return: True if the movement should continue in next frame
+        """
+        self.frames += 1
+        budget = frame_time * FRAME_BUDGET_SHARE
+        start = time.perf_counter()
+        dynamic = forest.free_movers and self.is_hot()
+        if dynamic and self.step_cost > budget:
+            self.parts = min(MAX_PARTS, math.ceil(self.step_cost / budget))
+        elif self._part == 0:
+            self.parts = 1
+        parts = self.parts if dynamic else 1
+        part = self._part if parts > 1 else 0
+        energy, tweening = forest.move_nodes(self.heat, part=part, parts=parts, update=False)
+        cost = time.perf_counter() - start
+        if parts > 1:
+            self._part_energy += energy
+            self._part = (part + 1) % parts
+            if self._part:
+                forest.update_after_move()
+                return True
+            # full step done, its cost was spread over the parts
+            self._measure(cost * parts)
+            energy = self._part_energy / parts
+            self._part_energy = 0
+            self._cool()
+        else:
+            if dynamic:
+                self._measure(cost)
+            self._cool()
+            substeps = 0
+            while (dynamic and substeps < MAX_SUBSTEPS and self.is_hot() and
+                   energy >= ENERGY_THRESHOLD and
+                   time.perf_counter() - start + self.step_cost < budget):
+                step_start = time.perf_counter()
+                energy = forest.move_nodes(self.heat, physics_only=True, update=False)[0]
+                self._measure(time.perf_counter() - step_start)
+                self._cool()
+                substeps += 1
+        forest.update_after_move()
+        self.energy = energy
+        return bool(tweening) or (self.is_hot() and energy >= ENERGY_THRESHOLD)
+
+    def settle(self, forest, max_steps=MAX_SETTLE_STEPS) -> int:
+        """ Finish animated movements at once and run physics until forest is at rest, without
+        timers or painting.
+        :param forest: Forest
+        :param max_steps: give up after this many physics steps
+        :return: number of physics steps taken
+        """
+        physics_random.seed(PHYSICS_SEED)
+        for node in forest.nodes.values():
+            node.finish_moving()
+        # elements placed relative to nodes affect the bounding rects used by physics, so they
+        # have to be in place before the first step
+        forest.update_after_move()
+        self.start()
+        if forest.free_movers:
+            while self.steps < max_steps and self.is_hot():
+                energy, tweening = forest.move_nodes(self.heat, update=False)
+                self._cool()
+                if energy < ENERGY_THRESHOLD and not tweening:
+                    break
+        forest.update_after_move()
+        forest.update_culled_edges()
+        self.energy = 0
+        return self.steps
@@ -1,6 +1,6 @@
 import os
 
-from PyQt6 import QtCore, QtWidgets, QtGui
+from PyQt6 import QtCore, QtGui
 
 from kataja.singletons import ctrl, prefs, running_environment, log
 from kataja.utils import find_free_filename
@@ -28,8 +28,6 @@ class PrintManager:
         sc.setBackgroundBrush(no_brush)
         sc.photo_frame = sc.addRect(ctrl.view_manager.print_rect().adjusted(-1, -1, 2, 2), ctrl.cm.selection())
         sc.update()
-        for node in ctrl.forest.nodes.values():
-            node.setCacheMode(QtWidgets.QGraphicsItem.CacheMode.NoCache)
         ctrl.graph_view.repaint()
         self.print_started = True  # to avoid a bug where other timers end up triggering main's
         ctrl.main.startTimer(50)
@@ -54,9 +52,21 @@ class PrintManager:
         self.print_to_file(path, prefs.print_file_name)
 
     def print_all(self, path, filename='output_trees.pdf'):
-        """ If there """
+        """ Print all forests of current document. With pdf format they are printed as pages of
+        one pdf, with png format into a folder with one image for each forest.
+        :param path: folder
+        :param filename: file name for pdf or png, for pngs it also names the folder
+        """
         doc = ctrl.document
-        if len(ctrl.document.forests) > 1:
+        if len(doc.forests) > 1 and prefs.print_format != 'png':
+            if filename.endswith(('.pdf', '.png')):
+                filename = filename[:-4]
+            write_path = os.path.join(path, f'{filename}.pdf')
+            pages = self.print_document_to_pdf(write_path, doc)
+            msg = f"printed to {write_path} as PDF, {pages} pages."
+            print(msg)
+            log.info(msg)
+        elif len(doc.forests) > 1:
             base_part, suffix = filename.rsplit('.')
             os.makedirs(base_part, exist_ok=True)
             for i, forest in enumerate(doc.forests):
@@ -66,17 +76,68 @@ class PrintManager:
         else:
             self.print_to_file(path, filename, overwrite=True)
 
+    @staticmethod
+    def print_document_to_pdf(write_target, document=None, dpi=25.4) -> int:
+        """ Print each forest of document as a page of one pdf. All pages are painted in one
+        QPdfWriter and QPainter session, so the file is opened once and the fonts are embedded
+        once, and forests are brought to rest with GraphScene.settle instead of waiting for
+        animations.
+        :param write_target: file path or QIODevice
+        :param document: KatajaDocument, current document if not given
+        :param dpi:
+        :return: number of pages printed
+        """
+        doc = document or ctrl.document
+        if not doc.forests:
+            return 0
+        sc = ctrl.graph_scene
+        current = doc.forest
+        background = sc.backgroundBrush()
+        sc.setBackgroundBrush(QtGui.QBrush(QtCore.Qt.BrushStyle.NoBrush))
+        writer = None
+        painter = QtGui.QPainter()
+        pages = 0
+        try:
+            for forest in doc.forests:
+                doc.set_forest(forest)
+                sc.settle()
+                source = ctrl.view_manager.print_rect()
+                target = QtCore.QRectF(0, 0, source.width() / 2.0, source.height() / 2.0)
+                page_size = QtGui.QPageSize(target.size(), QtGui.QPageSize.Unit.Millimeter)
+                if writer is None:
+                    writer = QtGui.QPdfWriter(write_target)
+                    writer.setResolution(int(dpi))
+                    writer.setPageSize(page_size)
+                    writer.setPageMargins(QtCore.QMarginsF(0, 0, 0, 0))
+                    painter.begin(writer)
+                else:
+                    # new page size takes effect from the next page
+                    writer.setPageSize(page_size)
+                    writer.newPage()
+                ctrl.printing = True
+                with ctrl.view_manager.full_detail():
+                    sc.render(painter, target=target, source=source)
+                ctrl.printing = False
+                pages += 1
+        finally:
+            ctrl.printing = False
+            if painter.isActive():
+                painter.end()
+            sc.setBackgroundBrush(background)
+            doc.set_forest(current)
+        return pages
+
     def print_to_file(self, path, filename, overwrite=False):
         if filename.endswith(('.pdf', '.png')):
             filename = filename[:-4]
         # Prepare printer
         png = prefs.print_format == 'png'
         suffix = '.png' if png else '.pdf'
+        if not ctrl.play:
+            # nothing animates, dynamic visualizations have to be run to rest before printing
+            ctrl.graph_scene.settle()
         source = ctrl.view_manager.print_rect()
 
-        for node in ctrl.forest.nodes.values():
-            node.setCacheMode(QtWidgets.QGraphicsItem.CacheMode.NoCache)
-
         if overwrite:
             write_path = os.path.join(path, f'{filename}{suffix}')
         else:
@@ -88,35 +149,57 @@ class PrintManager:
             self._write_pdf(source, write_path)
 
         # Restore image
-        for node in ctrl.forest.nodes.values():
-            node.setCacheMode(QtWidgets.QGraphicsItem.CacheMode.DeviceCoordinateCache)
         ctrl.graph_scene.setBackgroundBrush(ctrl.cm.gradient)
 
+    def render_to_bytes(self, fmt='png'):
+        """ Render current forest into memory instead of a file, for clients of daemon mode.
+        :param fmt: 'png' or 'pdf'
+        :return: bytes
+        """
+        if not ctrl.play:
+            ctrl.graph_scene.settle()
+        source = ctrl.view_manager.print_rect()
+        buffer = QtCore.QBuffer()
+        buffer.open(QtCore.QIODevice.OpenModeFlag.WriteOnly)
+        if fmt == 'pdf':
+            self._paint_pdf(source, buffer)
+        else:
+            image = self._paint_png(source)
+            image.save(buffer, 'PNG')
+        buffer.close()
+        return bytes(buffer.data())
+
     @staticmethod
-    def _write_png(source, write_path):
-        scale = 4
+    def _paint_png(source, scale=4):
         target = QtCore.QRectF(QtCore.QPointF(0, 0), source.size() * scale)
         writer = QtGui.QImage(target.size().toSize(), QtGui.QImage.Format.Format_ARGB32_Premultiplied)
-        writer.fill(QtCore.Qt.GlobalColor.NoPen)
+        writer.fill(QtCore.Qt.GlobalColor.transparent)
         painter = QtGui.QPainter()
         painter.begin(writer)
         painter.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing)
         painter.setRenderHint(QtGui.QPainter.RenderHint.SmoothPixmapTransform)
 
-        ctrl.graph_scene.render(painter, target=target, source=source)
+        with ctrl.view_manager.full_detail():
+            ctrl.graph_scene.render(painter, target=target, source=source)
         painter.end()
+        return writer
+
+    @staticmethod
+    def _write_png(source, write_path):
+        scale = 4
+        writer = PrintManager._paint_png(source, scale)
         iwriter = QtGui.QImageWriter(write_path)
         iwriter.write(writer)
-        msg = f"printed to {write_path} as PNG ({int(target.width())}px x {int(target.height())}px, {scale}x size)."
+        msg = f"printed to {write_path} as PNG ({writer.width()}px x {writer.height()}px, {scale}x size)."
         print(msg)
         log.info(msg)
 
     @staticmethod
-    def _write_pdf(source, write_path):
-        dpi = 25.4
+    def _paint_pdf(source, write_target, dpi=25.4):
+        """ :param write_target: file path or QIODevice """
         target = QtCore.QRectF(0, 0, source.width() / 2.0, source.height() / 2.0)
 
-        writer = QtGui.QPdfWriter(write_path)
+        writer = QtGui.QPdfWriter(write_target)
         writer.setResolution(int(dpi))
         page_size = QtGui.QPageSize(target.size(), QtGui.QPageSize.Unit.Millimeter)
         writer.setPageSize(page_size)
@@ -126,9 +209,15 @@ class PrintManager:
         painter.begin(writer)
         # painter.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing)
         # painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
-        ctrl.graph_scene.render(painter, target=target, source=source)
+        with ctrl.view_manager.full_detail():
+            ctrl.graph_scene.render(painter, target=target, source=source)
         painter.end()
         ctrl.printing = False
+
+    @staticmethod
+    def _write_pdf(source, write_path):
+        dpi = 25.4
+        PrintManager._paint_pdf(source, write_path, dpi)
         msg = f"printed to {write_path} as PDF with {dpi} dpi."
         print(msg)
         log.info(msg)
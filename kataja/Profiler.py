@@ -0,0 +1,145 @@
+# -*- coding: UTF-8 -*-
+# ############################################################################
+#
+# *** Kataja - Biolinguistic Visualization tool ***
+#
+# Copyright 2013 Jukka Purma
+#
+# This file is part of Kataja.
+#
+# Kataja is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Kataja is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kataja.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ############################################################################
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from kataja.utils import add_timing_hook, remove_timing_hook
+
+MAX_EVENTS = 50000  # older spans and counter values are dropped from the trace
+
+
+class Profiler:
+    """ Collects the spans timed with utils.timed and named counters, e.g. number of nodes or
+    repaints. Spans are kept as a bounded trace that can be exported in Chrome trace format
+    (open in chrome://tracing or ui.perfetto.dev), and summed up per name for ProfilerPanel.
+
+    Recording a span costs a couple of tuple and dict operations, so the profiler can be left on
+    when working with real corpora. When disabled, timed() doesn't even read the clock.
+
+    Span names are dotted, e.g. 'action.next_derivation_step', 'draw.visualization',
+    'physics.tick', and the part before the first dot is used as span category.
+    """
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.enabled = False
+        self.spans = deque(maxlen=max_events)  # (name, start, duration, thread id)
+        self.counter_values = deque(maxlen=max_events)  # (name, time, value)
+        self.stats = {}  # name -> [count, total, max, last]
+        self.counters = {}
+        self.t0 = time.perf_counter()
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            add_timing_hook(self.record)
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            remove_timing_hook(self.record)
+
+    def clear(self):
+        self.spans.clear()
+        self.counter_values.clear()
+        self.stats = {}
+        self.counters = {}
+        self.t0 = time.perf_counter()
+
+    def record(self, name, duration):
+        """ Timing hook: store a finished span.
+        :param name: span name
+        :param duration: seconds
+        """
+        end = time.perf_counter()
+        self.spans.append((name, end - duration, duration, threading.get_ident()))
+        stat = self.stats.get(name)
+        if stat is None:
+            self.stats[name] = [1, duration, duration, duration]
+        else:
+            stat[0] += 1
+            stat[1] += duration
+            if duration > stat[2]:
+                stat[2] = duration
+            stat[3] = duration
+
+    def count(self, name, value=1):
+        """ Add value to counter
+        :param name: counter name
+        :param value: int
+        """
+        if self.enabled:
+            value += self.counters.get(name, 0)
+            self.counters[name] = value
+            self.counter_values.append((name, time.perf_counter(), value))
+
+    def set_counter(self, name, value):
+        """ Set counter to value, e.g. number of nodes after drawing
+        :param name: counter name
+        :param value: int
+        """
+        if self.enabled and self.counters.get(name) != value:
+            self.counters[name] = value
+            self.counter_values.append((name, time.perf_counter(), value))
+
+    def summary(self) -> list:
+        """ :return: list of (name, count, total ms, mean ms, max ms, last ms), slowest total
+        first """
+        rows = [(name, count, total * 1000, total * 1000 / count, longest * 1000, last * 1000)
+                for name, (count, total, longest, last) in self.stats.items()]
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows
+
+    def chrome_trace(self) -> dict:
+        """ Spans and counter values in Chrome trace event format. Times are microseconds from
+        the start (or clear) of the profiler.
+        :return: dict that can be dumped as json
+        """
+        pid = os.getpid()
+        t0 = self.t0
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+                   'args': {'name': 'Kataja'}}]
+        for name, start, duration, tid in list(self.spans):
+            events.append({'name': name, 'cat': name.split('.', 1)[0], 'ph': 'X', 'pid': pid,
+                           'tid': tid, 'ts': (start - t0) * 1000000, 'dur': duration * 1000000})
+        for name, t, value in list(self.counter_values):
+            events.append({'name': name, 'ph': 'C', 'pid': pid, 'tid': 0,
+                           'ts': (t - t0) * 1000000, 'args': {name: value}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, filename):
+        """ Write trace as json file
+        :param filename: path
+        :return: number of events written
+        """
+        trace = self.chrome_trace()
+        with open(filename, 'w') as f:
+            json.dump(trace, f)
+        return len(trace['traceEvents'])
+
+
+profiler = Profiler()
@@ -23,116 +23,225 @@
 #
 # ############################################################################
 
+import queue
 import subprocess
-import tempfile
 
 import PyQt6.QtCore as QtCore
 import PyQt6.QtGui as QtGui
-import PyQt6.QtWidgets as QtWidgets
 from PIL import Image
+from PIL.GifImagePlugin import getdata, getheader
 
 from kataja.singletons import ctrl, prefs, log
 
+MAX_QUEUED_FRAMES = 16
+PALETTE_SIZE = 64  # colours taken from the first frame
+MAX_COLORS = 256
+FINAL_REST_FRAMES = 30
+
+
+class FrameEncoder(QtCore.QThread):
+    """ Converts captured frames to palette images and writes them to the output as they come.
+    Palette is made from the colours of the current theme and the first frame, and all frames are
+    quantized to the same palette, so each frame can be appended to gif right away. WebP can't be written a frame at a time, its
+    frames are kept as palette images (a quarter of the size of captured frames) and saved when
+    recording ends.
+
+    Frames wait in a bounded queue: if encoding falls behind, capturing waits instead of eating
+    memory.
+    """
+
+    message = QtCore.pyqtSignal(str)
+
+    def __init__(self, outfile, gif=True, webp=False, duration=100, theme_colors=()):
+        QtCore.QThread.__init__(self)
+        self.outfile = outfile
+        self.theme_colors = list(theme_colors)
+        self.gif = gif
+        self.webp = webp
+        self.duration = duration
+        self.frames = queue.Queue(maxsize=MAX_QUEUED_FRAMES)
+        self.palette = None
+        self.gif_file = None
+        self.webp_frames = []
+        self.count = 0
+
+    def add_frame(self, image):
+        self.frames.put(image)
+
+    def finish(self):
+        self.frames.put(None)
+
+    def run(self):
+        previous = None
+        # first frame stays on screen a bit longer
+        duration = self.duration * 2
+        try:
+            while True:
+                image = self.frames.get()
+                if image is None:
+                    break
+                frame = self.convert(image)
+                # a frame is written when the next one arrives, the last frame gets longer time
+                if previous is not None:
+                    self.write_frame(previous, duration)
+                    duration = self.duration
+                previous = frame
+            if previous is not None:
+                # linger on the last frame instead of repeating it
+                self.write_frame(previous, self.duration * FINAL_REST_FRAMES)
+            self.close()
+        except (OSError, ValueError) as err:
+            self.message.emit(f'  Recording animation failed: {err}')
+            if self.gif_file:
+                self.gif_file.close()
+
+    def convert(self, image):
+        """ QImage -> palette image. Quantizing to an existing palette is also much faster than
+        computing a new palette for each frame. """
+        image = image.convertToFormat(QtGui.QImage.Format.Format_RGB32)
+        w = image.width()
+        h = image.height()
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+        frame = Image.frombuffer('RGB', (w, h), bytes(bits), 'raw', 'BGRX', image.bytesPerLine(), 1)
+        if self.palette is None:
+            self.palette = self.make_palette(frame)
+        return frame.quantize(palette=self.palette)
+
+    def make_palette(self, frame):
+        """ Palette has the theme colours, so that things that appear later in other theme colours
+        keep their colour, and the colours of the first frame, e.g. antialiased edges.
+        :param frame: first frame as RGB image
+        :return: palette image
+        """
+        colors = self.theme_colors[:MAX_COLORS - PALETTE_SIZE]
+        used = set(colors)
+        flat = frame.quantize(PALETTE_SIZE).getpalette()[:PALETTE_SIZE * 3]
+        for i in range(0, len(flat), 3):
+            rgb = tuple(flat[i:i + 3])
+            if rgb not in used:
+                used.add(rgb)
+                colors.append(rgb)
+        palette = Image.new('P', (1, 1))
+        palette.putpalette([value for rgb in colors for value in rgb])
+        return palette
+
+    def write_frame(self, frame, duration):
+        self.count += 1
+        if self.gif:
+            if not self.gif_file:
+                self.gif_file = open(self.outfile + '.gif', 'wb')
+                header, used_colors = getheader(frame, info={'loop': 1, 'optimize': False})
+                for chunk in header:
+                    self.gif_file.write(chunk)
+            for chunk in getdata(frame, duration=duration):
+                self.gif_file.write(chunk)
+        if self.webp:
+            self.webp_frames.append((frame, duration))
+
+    def close(self):
+        fname = ''
+        if self.gif_file:
+            self.gif_file.write(b';')
+            self.gif_file.close()
+            self.gif_file = None
+            fname = self.outfile + '.gif'
+            self.message.emit(f'  Gif recorded as {repr(fname)} ({self.count} frames)')
+        if self.webp and self.webp_frames:
+            fname_w = self.outfile + '.webp'
+            frames = [frame for frame, duration in self.webp_frames]
+            frames[0].save(fname_w, save_all=True, append_images=frames[1:],
+                           duration=[duration for frame, duration in self.webp_frames], loop=1)
+            self.webp_frames = []
+            self.message.emit(f'  WebP recorded as {repr(fname_w)}')
+        if fname:
+            optimized = Recorder.try_optimising_with_gifsicle(fname)
+            if optimized:
+                self.message.emit(f'Writing optimized gif as {optimized}')
+
 
 class Recorder:
+    """ Captures frames of animations from the scene. Frames are handed to FrameEncoder, which
+    encodes them in its own thread while recording goes on, so stopping the recording doesn't
+    have to wait for the conversions. """
+
     def __init__(self, scene):
         self.scene = scene
         self.recording = False
         self.frame_count = 0
+        self.frames_sent = 0
         self.width = 640
         self.height = 480
         self.every_nth = 1
-        self.frames = []
         self.gif = True
         self.webp = False
+        self.encoder = None
+        self.encoders = set()
 
     def start_recording(self, width=640, height=480, every_nth=1, gif=True, webp=False):
         self.frame_count = 0
+        self.frames_sent = 0
         self.recording = True
-        self.frames = []
         self.width = width
         self.height = height
         self.every_nth = int(every_nth) or 1
         self.gif = gif
         self.webp = webp
-        for node in ctrl.forest.nodes.values():
-            node.setCacheMode(QtWidgets.QGraphicsItem.NoCache)
+        self.encoder = FrameEncoder(prefs.animation_file_name, gif=gif, webp=webp,
+                                    duration=prefs.fps_in_msec * self.every_nth,
+                                    theme_colors=self.theme_colors())
+        self.encoder.message.connect(log.info)
+        # keep reference until encoder is done, recording can be restarted before that
+        self.encoders.add(self.encoder)
+        self.encoder.finished.connect(self._forget_finished_encoders)
+        self.encoder.start()
         # record initial frame before the animations start
         self.record_frame()
 
     def stop_recording(self):
-        outfile = prefs.animation_file_name
+        """ Returns immediately, encoder finishes the file in its thread. """
+        if not self.recording:
+            return
         self.recording = False
-        max_w = 0
-        max_h = 0
-        final_rest_frames = 30
-        self.frames = [self.frames[0]] + self.frames + [self.frames[-1]]
-        log.info(f'  Writing {len(self.frames)} animation frames...')
-        fname = ''
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            for i, image in enumerate(self.frames):
-                w = image.width()
-                h = image.height()
-                if w > max_w:
-                    max_w = w
-                if h > max_h:
-                    max_h = h
-                image.save(f'{tmpdirname}/buffer{i}.png')
-            resized = []
-            count = len(self.frames)
-            self.frames = []
-            log.info('  Loading and resizing images...')
-            for i in range(0, count):
-                image = Image.open(f'{tmpdirname}/buffer{i}.png')
-                w, h = image.size
-                if w != max_w or h != max_h:
-                    iw = max_w / w
-                    ih = max_h / h
-                    r = iw if iw < ih else ih
-                    new_w = int(r * w)
-                    new_h = int(r * h)
-                    top_left = (int((new_w - max_w) / 2), int((new_h - max_h) / 2))
-                    log.info(f'resizing frame: {(new_w, new_h)}, top_left: {top_left}')
-                    new_image = image.resize((new_w, new_h))
-                    background = Image.new('RGBA', (max_w, max_h), ctrl.cm.paper().getRgb())
-                    background.paste(new_image, top_left)
-                    background = background.quantize(64)
-                    resized.append(background)
-                else:
-                    resized.append(image.quantize(64))
-            if resized:
-                log.info(f'Adding {final_rest_frames} frames to end.')
-                last_image = resized[-1]
-                for i in range(0, final_rest_frames):
-                    resized.append(last_image)
-            if self.gif:
-                fname = outfile + '.gif'
-                resized[0].save(fname,
-                                save_all=True,
-                                append_images=resized[1:],
-                                delay=0.3,
-                                loop=1,
-                                optimize=True)
-                log.info(f'  Gif recorded as {repr(fname)}')
-            if self.webp:
-                fname_w = outfile + '.webp'
-                resized[0].save(fname_w,
-                                save_all=True,
-                                append_images=resized[1:],
-                                delay=0.3,
-                                loop=1,
-                                optimize=True)
-                log.info(f'  WebP recorded as {repr(fname_w)}')
-        if self.gif:
-            self.try_optimising_with_gifsicle(fname)
-        self.frames = []
+        log.info(f'  Writing {self.frames_sent} animation frames...')
+        self.encoder.finish()
+        self.encoder = None
+
+    def wait_for_encoders(self):
+        """ Stop recording and let encoders finish their files, e.g. when the program closes. """
+        self.stop_recording()
+        for encoder in list(self.encoders):
+            encoder.wait()
+        self.encoders = set()
+
+    @staticmethod
+    def theme_colors():
+        """ Colours of the current palette as they look on paper
+        :return: list of (r, g, b) -tuples
+        """
+        paper = ctrl.cm.paper()
+        colors = []
+        for color in ctrl.cm.d.values():
+            a = color.alphaF()
+            rgb = (round(a * color.red() + (1 - a) * paper.red()),
+                   round(a * color.green() + (1 - a) * paper.green()),
+                   round(a * color.blue() + (1 - a) * paper.blue()))
+            if rgb not in colors:
+                colors.append(rgb)
+        return colors
+
+    def _forget_finished_encoders(self):
+        self.encoders = {encoder for encoder in self.encoders if not encoder.isFinished()}
 
     def record_frame(self):
+        if not self.recording:
+            return
         if self.frame_count % self.every_nth == 0:
             source = ctrl.main.view_manager.print_rect()
-            self.frames.append(self._write_frame(source))
+            self.encoder.add_frame(self._write_frame(source))
+            self.frames_sent += 1
         self.frame_count += 1
-        if len(self.frames) == prefs.animation_max_frames:
+        if self.frames_sent == prefs.animation_max_frames:
             log.info('  Stopping recording, max frame count reached '
                      f'({prefs.animation_max_frames}).')
             self.stop_recording()
@@ -150,20 +259,21 @@ class Recorder:
         left = int((max_w - new_w) / 2)
         top = int((max_h - new_h) / 2)
 
-        target = QtCore.QRectF(left, top, max_w, max_h)
+        target = QtCore.QRectF(left, top, new_w, new_h)
 
-        image = QtGui.QImage(target.size().toSize(), QtGui.QImage.Format_ARGB32_Premultiplied)
+        image = QtGui.QImage(max_w, max_h, QtGui.QImage.Format.Format_ARGB32_Premultiplied)
         image.fill(ctrl.cm.paper())
         painter = QtGui.QPainter()
         painter.begin(image)
         painter.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing)
-        painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
-        self.scene.render(painter, source=source, target=target)
+        painter.setRenderHint(QtGui.QPainter.RenderHint.SmoothPixmapTransform)
+        self.scene.render(painter, target=target, source=source)
         painter.end()
         return image
 
     @staticmethod
     def try_optimising_with_gifsicle(gifname):
+        """ :return: name of the optimized gif or empty string if gifsicle wasn't available """
         commands = ['gifsicle', './gifsicle']
         command = None
         for candidate in commands:
@@ -176,4 +286,5 @@ class Recorder:
             result = subprocess.run([command, '-O3', gifname], stdout=ofile, stderr=subprocess.PIPE)
             ofile.close()
             if result.returncode == 0:
-                log.info(f'Writing optimized gif as o_{gifname}')
+                return 'o_' + gifname
+        return ''
@@ -71,19 +71,22 @@ class SavedField(object):
                 old_value = saved[self.name]
                 saved[self.name] = value
                 if old_value != value:
+                    ctrl.changed_objects.add(obj)
                     if self.if_changed:
                         self.if_changed(obj, value)
                     if self.watcher:
                         self.watcher.emit()
             else:
                 saved[self.name] = value
+                ctrl.changed_objects.add(obj)
                 if self.if_changed:
                     self.if_changed(obj, value)
                 if self.watcher:
                     self.watcher.emit()
         elif self.name in saved:
             old = saved[self.name]
-            if (isinstance(value, Iterable) and old != value) or (not isinstance(value, Iterable) and old is not value):
+            # identity check first, it is cheap and it is enough for repeated sets of same value
+            if old is not value and (not isinstance(value, Iterable) or old != value):
                 history = obj.get_history()
                 if not history:
                     ctrl.undo_pile.add(obj)
@@ -91,12 +94,14 @@ class SavedField(object):
                 elif self.name not in history:
                     history[self.name] = old
                 saved[self.name] = value
+                ctrl.changed_objects.add(obj)
                 if self.if_changed:
                     self.if_changed(obj, value)
                 if self.watcher:
                     self.watcher.emit()
         else:
             saved[self.name] = value
+            ctrl.changed_objects.add(obj)
             if self.if_changed:
                 self.if_changed(obj, value)
             if self.watcher:
@@ -104,6 +104,7 @@ class SavedObject(object):
         :param attribute: string, name of the attribute
         :return: None
         """
+        ctrl.changed_objects.add(self)
         if ctrl.undo_disabled:
             return
 
@@ -120,6 +121,7 @@ class SavedObject(object):
         from scene.
         :return:None
         """
+        ctrl.changed_objects.add(self)
         if ctrl.undo_disabled:
             return
         self._cd = CREATED
@@ -129,6 +131,7 @@ class SavedObject(object):
         """ Flag object to have been deleted in this undo cycle.
         :return:None
         """
+        ctrl.changed_objects.add(self)
         if ctrl.undo_disabled or not self._can_be_deleted_with_undo:
             return
         self._cd = DELETED
@@ -8,14 +8,15 @@ class SemanticsArray:
         self.array_id = array_id
         self.array_type = array_type
         self.array = []
+        self.items = {}  # label -> SemanticsItem
         self.x = x
         self.y = y
         for label in model:
             item = SemanticsItem(sm, label, array_id, sm.colors[label], x, y)
             self.array.append(item)
+            if label not in self.items:
+                self.items[label] = item
             y += item.label_rect().height()
-            if not sm.visible:
-                sm.hide()
 
     def total_size(self):
         h = 0
@@ -27,7 +28,17 @@ class SemanticsArray:
             h += r.height()
         return w, h
 
-    def move_to(self, x, y):
+    def move_to(self, x, y, force=False):
+        """ Move items of array so that they stack upwards from given position.
+        :param x:
+        :param y:
+        :param force: move items even if the position is the same, e.g. when their texts have
+        changed
+        """
+        if x == self.x and y == self.y and not force:
+            return
+        self.x = x
+        self.y = y
         for item in reversed(self.array):
             item.prepareGeometryChange()
             item.setPos(x, y)
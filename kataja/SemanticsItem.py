@@ -2,6 +2,7 @@ import math
 
 from PyQt6 import QtCore, QtWidgets, QtGui
 
+from kataja.OrderedSet import OrderedSet
 from kataja.globals import SMALL_FEATURE
 from kataja.singletons import ctrl, qt_prefs
 
@@ -19,15 +20,14 @@ class SemanticsItem(QtWidgets.QGraphicsSimpleTextItem):
         self.array_id = array_id
         self.color_key = color_key
         self.color_key_tr = color_key if color_key.endswith('tr') else color_key + 'tr'
-        self.members = []
+        self.members = OrderedSet()
         self.setZValue(2)
         self.setPos(x, y)
         if not sm.visible:
             self.hide()
 
     def add_member(self, node):
-        if node not in self.members:
-            self.members.append(node)
+        self.members.add(node)
 
     def update_text(self):
         words = [self.label]
@@ -10,9 +10,12 @@ class SemanticsManager:
         self.all_items = []
         self.arrays = {}
         self.arrays_list = []
+        self.label_index = {}  # label -> (model index, model, index in all models)
         self.total_height = 0
         self.total_length = 0
         self.visible = self.forest.settings.get('show_semantics')
+        self._changed_items = set()  # items whose text has to be updated
+        self._relayout = False
 
     def hide(self):
         self.visible = False
@@ -29,11 +32,14 @@ class SemanticsManager:
         self.visible = self.forest.settings.get('show_semantics')
         self.models = syn_state.semantic_hierarchies
         self.colors = {}
+        self.label_index = {}
         c = 1
         total_length = 0
-        for model in self.models:
+        for i, model in enumerate(self.models):
             for name in model:
                 self.colors[name] = 'accent%s' % c
+                if name not in self.label_index:
+                    self.label_index[name] = i, model, total_length
                 c += 1
                 total_length += 1
                 if c > 8:
@@ -41,29 +47,25 @@ class SemanticsManager:
         self.total_length = total_length
 
     def index_for_feature(self, fname):
-        past = 0
-        for model in self.models:
-            if fname in model:
-                return model.index(fname) + past, self.total_length
-            past += len(model)
+        found = self.label_index.get(fname)
+        if found:
+            return found[2], self.total_length
         return -1, self.total_length
 
     def add_to_array(self, node, label, array_id):
-        """ Create new arrays when necessary
+        """ Create new arrays when necessary. Texts and positions of arrays are updated in next
+        update_position, so that adding many members costs only one update.
         :param node:
         :param label:
         :param array_id:
         :return:
         """
-        if array_id not in self.arrays:
-            model = None
-            model_type = 0
-            for i, model in enumerate(self.models):
-                if label in model:
-                    model_type = i
-                    break
-            if not model:
+        array = self.arrays.get(array_id)
+        if not array:
+            found = self.label_index.get(label)
+            if not found:
                 return
+            model_type, model = found[:2]
             if self.arrays_list:
                 last = self.arrays_list[0]
                 x = last.x
@@ -77,25 +79,28 @@ class SemanticsManager:
             if self.visible:
                 for item in array.array:
                     self.forest.add_to_scene(item)
-        else:
-            array = self.arrays[array_id]
-        for item in array.array:
-            if label == item.label:
-                item.add_member(node)
-            item.update_text()
-        if self.visible:
-            self.update_position()
+        item = array.items.get(label)
+        if item:
+            item.add_member(node)
+            self._changed_items.add(item)
 
     def update_position(self):
-        if self.visible:
+        """ Update texts of items that have got new members and move arrays next to trees. """
+        if self._changed_items:
+            for item in self._changed_items:
+                item.update_text()
+            self._changed_items = set()
+            self._relayout = True
+        if self.visible and self.arrays_list:
             x, y = self.find_good_starting_position()
             self.total_height = 0
             for array in self.arrays_list:
                 indent = array.array_type * 8
                 height = array.total_size()[1] + 8
                 y -= height
-                array.move_to(x + indent, y)
+                array.move_to(x + indent, y, force=self._relayout)
                 self.total_height += height
+            self._relayout = False
 
     def find_good_starting_position(self):
         x = 0
@@ -118,3 +123,4 @@ class SemanticsManager:
         self.all_items = []
         self.arrays = {}
         self.arrays_list = []
+        self._changed_items = set()
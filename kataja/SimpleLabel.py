@@ -25,6 +25,7 @@
 from PyQt6 import QtWidgets, QtGui, QtCore
 
 from kataja.LabelDocument import LabelDocument
+from kataja.LabelPixmapCache import label_pixmap_cache
 from kataja.globals import LEFT_ALIGN, \
     CENTER_ALIGN, RIGHT_ALIGN
 from kataja.singletons import ctrl
@@ -68,6 +69,7 @@ class SimpleLabel(QtWidgets.QGraphicsTextItem):
         self._last_blockpos = ()
         self.editable_doc = LabelDocument()
         self._fresh_focus = False
+        self._pixmap_key = None
         self.setDocument(self.editable_doc)
         self.setZValue(20)  # ZValue amongst the childItems of Node
         # not acceptin hover events is important, editing focus gets lost if other labels take
@@ -92,6 +94,7 @@ class SimpleLabel(QtWidgets.QGraphicsTextItem):
         return 'Label:' + self.editable_html
 
     def set_font(self, font):
+        self._pixmap_key = None
         self.setFont(font)
         self._font = font
         self._font_metrics = QtGui.QFontMetrics(font)
@@ -100,8 +103,9 @@ class SimpleLabel(QtWidgets.QGraphicsTextItem):
         self.set_font(self._host.get_font())
 
     def update_label(self, force_update=False):
-        """ Asks for node/host to give text and update if changed """
-        force_update = True
+        """ Asks for node/host to give text and update if changed
+        :param force_update: set the text again even if it hasn't changed
+        """
         self.has_been_initialized = True
         if self.text_align == LEFT_ALIGN:
             self.editable_doc.set_align(QtCore.Qt.AlignmentFlag.AlignLeft)
@@ -110,15 +114,12 @@ class SimpleLabel(QtWidgets.QGraphicsTextItem):
         else:
             self.editable_doc.set_align(QtCore.Qt.AlignmentFlag.AlignHCenter)
         html = self._host.label_as_html()
-        if force_update or html != self.editable_html:
-            if self.editable_html != html:
-                self.editable_doc.blockSignals(True)
-                self.editable_doc.setTextWidth(-1)
-                self.editable_html = html
-                self.setHtml(html)
-                self.editable_doc.blockSignals(False)
-
-            ctrl.qdocument_parser.process(self.editable_doc)
+        if force_update or self.editable_html != html:
+            self.editable_doc.blockSignals(True)
+            self.editable_doc.setTextWidth(-1)
+            self.editable_html = html
+            self.setHtml(html)
+            self.editable_doc.blockSignals(False)
         self.resize_label()
 
     def string_width(self, string):
@@ -231,7 +232,20 @@ class SimpleLabel(QtWidgets.QGraphicsTextItem):
         else:
             return 0, 0
 
+    def pixmap_key(self) -> tuple:
+        """ Everything that affects how the label looks like, apart from color and scale. Labels
+        with equal keys can share their pixmaps in label_pixmap_cache.
+        :return: tuple
+        """
+        if self._pixmap_key is None:
+            rect = self.boundingRect()
+            self._pixmap_key = (self.editable_html, self.font().key(), rect.width(),
+                                rect.height(), self.textWidth(),
+                                self.editable_doc.defaultTextOption().alignment())
+        return self._pixmap_key
+
     def resize_label(self):
+        self._pixmap_key = None
         self.prepareGeometryChange()
 
         user_width, user_height = self.get_max_size_from_host()
@@ -304,9 +318,15 @@ class SimpleLabel(QtWidgets.QGraphicsTextItem):
             QtWidgets.QGraphicsTextItem.dragEnterEvent(self, event)
 
     def paint(self, painter, option, widget):
+        if ctrl.view_manager.low_detail:
+            # host node draws a box in place of the label
+            return
         if self._host.invert_colors:
             c = ctrl.cm.paper()
         else:
             c = self._host.contextual_color()
+        if not (self._quick_editing or ctrl.view_manager.printing):
+            label_pixmap_cache.draw(self, painter, c)
+            return
         self.setDefaultTextColor(c)
         super().paint(painter, option, widget)
@@ -0,0 +1,184 @@
+# -*- coding: UTF-8 -*-
+# ############################################################################
+#
+# *** Kataja - Biolinguistic Visualization tool ***
+#
+# Copyright 2013 Jukka Purma
+#
+# This file is part of Kataja.
+#
+# Kataja is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Kataja is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kataja.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ############################################################################
+
+
+class TopologyIndex:
+    """ Facts about the shape of forest's node graph that are expensive to compute over and over
+    again: sorted order of nodes under each node, position of each node in that order, parent
+    through which each node is first reached, top nodes above each node and the longest distance
+    from node to a top node. Values are computed when first asked and kept until the node graph
+    changes. Nodes invalidate the index when their edges change (connect_node, disconnect_node,
+    delete_edge etc. poke 'edges_up' and 'edges_down'), edges when their end points change, and
+    forest invalidates it when everything is redrawn (undo, switching derivation steps etc.)
+
+    Walks are iterative, so deep trees don't hit the recursion limit, and multidominated structures
+    with exponentially many paths visit each node only once. Returned lists and dicts are shared,
+    don't modify them.
+    """
+
+    def __init__(self, forest):
+        self.forest = forest
+        self._sorted_nodes = {}
+        self._parents = {}
+        self._positions = {}
+        self._highest = {}
+        self._dominated = {}
+        self._max_depths = {}
+
+    def invalidate(self):
+        if self._sorted_nodes or self._highest or self._dominated or self._max_depths:
+            self._sorted_nodes = {}
+            self._parents = {}
+            self._positions = {}
+            self._highest = {}
+            self._dominated = {}
+            self._max_depths = {}
+
+    @staticmethod
+    def _walk(top, children):
+        """ Left-first preorder walk where only the first instance of each node is included.
+        :param top: Node
+        :param children: function(node) -> list of child nodes
+        :return: list of Nodes, dict Node -> parent Node through which it was first reached
+        """
+        nodes = []
+        parents = {}
+        used = set()
+        stack = [(top, None)]
+        while stack:
+            node, parent = stack.pop()
+            if node in used:
+                continue
+            used.add(node)
+            nodes.append(node)
+            if parent is not None:
+                parents[node] = parent
+            stack += [(child, node) for child in reversed(children(node))]
+        return nodes, parents
+
+    def sorted_nodes(self, tree_top) -> list:
+        """ Node and all nodes below it, in order where each node is followed by its children,
+        left first. Nodes reachable through several parents are included only once.
+        :param tree_top: Node
+        :return: list of Nodes
+        """
+        nodes = self._sorted_nodes.get(tree_top)
+        if nodes is None:
+            nodes, parents = self._walk(tree_top, _all_children)
+            self._sorted_nodes[tree_top] = nodes
+            self._parents[tree_top] = parents
+        return nodes
+
+    def parents(self, tree_top) -> dict:
+        """ For each node below tree_top the parent through which the node is first reached in
+        sorted_nodes(tree_top).
+        :param tree_top: Node
+        :return: dict Node -> Node
+        """
+        parents = self._parents.get(tree_top)
+        if parents is None:
+            self.sorted_nodes(tree_top)
+            parents = self._parents[tree_top]
+        return parents
+
+    def positions(self, tree_top) -> dict:
+        """ Index of each node in sorted_nodes(tree_top)
+        :param tree_top: Node
+        :return: dict Node -> int
+        """
+        positions = self._positions.get(tree_top)
+        if positions is None:
+            positions = self._positions[tree_top] = {node: i for i, node in
+                                                     enumerate(self.sorted_nodes(tree_top))}
+        return positions
+
+    def highest(self, node) -> list:
+        """ Top nodes that can be reached by going up from node, through parents of any type.
+        :param node: Node
+        :return: list of Nodes
+        """
+        tops = self._highest.get(node)
+        if tops is None:
+            tops = []
+            used = {node}
+            stack = [node]
+            while stack:
+                n = stack.pop()
+                parents = n.get_all_parents(visible=False)
+                if not parents:
+                    tops.append(n)
+                for parent in parents:
+                    if parent not in used:
+                        used.add(parent)
+                        stack.append(parent)
+            self._highest[node] = tops
+        return tops
+
+    def dominated_nodes(self, node) -> list:
+        """ Nodes of same type below node, following only edges that belong to node's type,
+        like get_children does.
+        :param node: Node
+        :return: list of Nodes, node itself is not included
+        """
+        nodes = self._dominated.get(node)
+        if nodes is None:
+            nodes = self._dominated[node] = self._walk(node, _children)[0][1:]
+        return nodes
+
+    def max_depth(self, node) -> int:
+        """ Length of the longest path from node up to a top node, following all parents of same
+        node type. Top node has depth 0.
+        :param node: Node
+        :return: int
+        """
+        depths = self._max_depths
+        depth = depths.get(node)
+        if depth is not None:
+            return depth
+        in_progress = set()
+        stack = [node]
+        while stack:
+            n = stack[-1]
+            if n in depths:
+                stack.pop()
+                continue
+            parents = n.get_parents()
+            missing = [p for p in parents if p not in depths and p not in in_progress]
+            if missing:
+                in_progress.add(n)
+                stack += missing
+                continue
+            # parents still in progress are part of a cycle, they don't make the path longer
+            depths[n] = max((depths[p] + 1 for p in parents if p in depths), default=0)
+            in_progress.discard(n)
+            stack.pop()
+        return depths[node]
+
+
+def _all_children(node):
+    return node.get_all_children(visible=False)
+
+
+def _children(node):
+    return node.get_children(visible=False)
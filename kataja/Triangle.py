@@ -31,6 +31,16 @@ from kataja.singletons import ctrl, prefs
 
 
 class Triangle(QtWidgets.QGraphicsItem, FadeInOut):
+    """ Triangle drawn under a triangle host, and the fold of nodes inside it. The fold is
+    remembered as folded nodes in left-first order with their x offsets, so that updating a
+    triangle needs to lock, move and relabel only the nodes that enter or leave it. Nodes know
+    the host they are folded into (node.folded_into).
+
+    Widths of folded nodes are measured again only if some of them have changed size. When a
+    triangle is folded inside another, the outer triangle reuses the inner triangle's offsets and
+    width for the inner triangle's nodes.
+    """
+
     def __init__(self, host, width, height):
         QtWidgets.QGraphicsItem.__init__(self, parent=host)
         FadeInOut.__init__(self)
@@ -38,6 +48,8 @@ class Triangle(QtWidgets.QGraphicsItem, FadeInOut):
         self._host = host
         self.width = width
         self.height = height
+        self.folded = {}  # node -> x offset, in left-first order
+        self.measured = False  # offsets and width are up to date with the sizes of nodes
 
     def get_color(self):
         return self._host.color
@@ -90,74 +102,129 @@ class Triangle(QtWidgets.QGraphicsItem, FadeInOut):
             else:
                 painter.drawPath(path)
 
+    def measure(self, folded) -> (dict, float):
+        """ Compute x offsets for folded nodes so that they form a row. Nodes hidden in triangle
+        don't take room. If offsets are still valid, they are used as they are, and for nodes
+        in triangles nested inside this, the offsets of those triangles are used.
+        :param folded: list of nodes in left-first order
+        :return: dict of node -> x offset, width of the row
+        """
+        if self.measured and len(self.folded) == len(folded) and \
+                all(a is b for a, b in zip(self.folded, folded)):
+            return self.folded, self.width
+        offsets = {}
+        x = 0
+        i = 0
+        n = len(folded)
+        while i < n:
+            node = folded[i]
+            br = node.boundingRect()
+            offsets[node] = x - br.left()
+            i += 1
+            if not node.hidden_in_triangle():
+                x += br.width()
+                continue
+            inner = node.triangle_item
+            if inner and inner.measured and inner.folded:
+                k = len(inner.folded)
+                if i + k <= n and all(a is b for a, b in zip(inner.folded, folded[i:i + k])):
+                    for inner_node, inner_offset in inner.folded.items():
+                        offsets[inner_node] = x + inner_offset
+                    x += inner.width
+                    i += k
+        return offsets, x
+
+    @staticmethod
+    def get_folded_nodes(root, fold_scope) -> list:
+        """ Find the nodes in fold scope that can be folded into root's triangle: multidominated
+        nodes can be folded if all of their parents are in the triangle. The branch that
+        couldn't be folded won't allow any of its children to be folded either.
+        :param root: triangle host
+        :param fold_scope: root's descendants in left-first order
+        :return: list of nodes in left-first order
+        """
+        whole_triangle = set(fold_scope)
+        whole_triangle.add(root)
+        left_out = set()
+        to_check = []
+        for node in fold_scope:
+            parents = node.get_parents()
+            if len(parents) > 1 and not whole_triangle.issuperset(parents):
+                to_check.append(node)
+        while to_check:
+            node = to_check.pop()
+            if node not in left_out:
+                left_out.add(node)
+                to_check += node.get_all_children(visible=False)
+        if not left_out:
+            return fold_scope
+        return [node for node in fold_scope if node not in left_out]
+
     @staticmethod
     def add_or_update_triangle_for(root):
 
-        def fold_into_me(host, nodes):
-            to_do = []
-            x = 0
-            for node in nodes:
-                node.lock_to_node(host)
-                br = node.boundingRect()
-                to_do.append((node, x, br.left()))
-                if not node.hidden_in_triangle():
-                    x += br.width()
+        def fold_into_me(host, folded):
+            triangle = host.triangle_item
+            if not triangle or triangle.parentItem() is not host:
+                triangle = host.triangle_item = Triangle(host=host, width=0, height=0)
+            # nodes that have left the triangle, e.g. when they became multidominated from outside
+            folded_set = set(folded)
+            for node in triangle.folded:
+                if node not in folded_set and node.folded_into is host:
+                    node.folded_into = None
+                    if node.locked_to_node is host:
+                        node.release_from_locked_position(update_parent=False)
+                    node.update_visibility()
+            entering = set()
+            previous_hosts = set()
+            for node in folded:
+                if node.folded_into is not host or node.locked_to_node is not host:
+                    if node.locked_to_node and node.locked_to_node is not host:
+                        previous_hosts.add(node.locked_to_node)
+                    node.lock_to_node(host, update_parent=False)
+                    node.folded_into = host
+                    node.update_label()
+                    node.update_visibility()
+                    entering.add(node)
+            for node in previous_hosts:
+                node.update_bounding_rect()
+            offsets, x = triangle.measure(folded)
+            if entering or triangle.folded is not offsets or \
+                    getattr(host.label_object, 'triangle_width', None) != x:
+                host.label_object.triangle_width = x
+                host.update_label()
             xt = x / 2
-            host.label_object.triangle_width = x
-            host.update_label()
             bottom = host.boundingRect().bottom()
             height = max(x / 8, prefs.edge_height)
-            for node, my_x, my_l in to_do:
-                node.move_to(my_x - my_l - xt, bottom + height, can_adjust=False, valign=g.TOP)
-                node.update_label()
-                node.update_visibility()
-            draw_triangle(host, bottom, x, height)
-
-        def draw_triangle(host, top, width, height):
-            triangle = Triangle(host=host, width=width, height=height)
-            triangle.setY(top)
-
-        def remove_children(bad_node):
-            for child in bad_node.get_all_children(visible=False):
-                if child in folded:
-                    folded.remove(child)
-                    remove_children(child)
+            y = bottom + height
+            for node in folded:
+                node_x = offsets[node] - xt
+                # move_to aligns node's top to y
+                if node in entering or \
+                        node.target_position != (node_x, y - node.boundingRect().top()):
+                    node.move_to(node_x, y, can_adjust=False, valign=g.TOP)
+            triangle.folded = offsets
+            triangle.measured = True
+            host.update_bounding_rect()
+            triangle.prepareGeometryChange()
+            triangle.width = x
+            triangle.set_height(height)
+            triangle.setY(bottom)
+            triangle.show()
 
         if root not in root.triangle_stack:
             root.poke('triangle_stack')
             root.triangle_stack.append(root)
         fold_scope = root.list_descendants_once()
-        folded = []
-        left_out = set()
 
         # triangle_stack for node holds the ground truth of triangles. Folding and graphicsitem
         # parent relation are surface stuff.
-        whole_triangle = set(fold_scope)
-        whole_triangle.add(root)
-
         for node in fold_scope:
             if root not in node.triangle_stack:
                 node.poke('triangle_stack')
                 node.triangle_stack.append(root)
-            # multidominated nodes can be folded if all parents are in scope of fold
-            parents = node.get_parents()
-            if len(parents) > 1:
-                can_fold = True
-                for parent in parents:
-                    if parent not in whole_triangle:
-                        left_out.add(node)
-                        can_fold = False
-                        break
-                if can_fold:
-                    folded.append(node)
-            else:
-                folded.append(node)
-
-        # remember that the branch that couldn't be folded won't allow any of its children to be folded either.
-        for bad_node in left_out:
-            remove_children(bad_node)
 
-        fold_into_me(root, folded)
+        fold_into_me(root, Triangle.get_folded_nodes(root, fold_scope))
 
     @staticmethod
     def remove_triangle_from(root):
@@ -167,6 +234,7 @@ class Triangle(QtWidgets.QGraphicsItem, FadeInOut):
                 if isinstance(item, Triangle):
                     item.setParentItem(None)
                     item.hide()
+            host.triangle_item = None
 
         assert root.triangle_stack[-1] is root
         root.poke('triangle_stack')
@@ -178,14 +246,17 @@ class Triangle(QtWidgets.QGraphicsItem, FadeInOut):
             if node.triangle_stack and node.triangle_stack[-1] is root:
                 node.poke('triangle_stack')
                 node.triangle_stack.pop()
+            if node.folded_into is root:
+                node.folded_into = None
             if node.parentItem() is root:
                 if node.is_triangle_host():
                     restored_hosts.append(node)
-                node.release_from_locked_position()
+                node.release_from_locked_position(update_parent=False)
                 if not node.isVisible():
                     node.current_position = root.current_position
             node.update_visibility()  # with triangle_stack reduced, hidden nodes may become
             # visible again. movement back to visualisation positions is handled by visualisation redraw
+        root.update_bounding_rect()
         # when unfolding a triangle previous triangles may become unfolded. Their leaf nodes are now
         # in wrong positions and have to be redrawn. Update all contained triangles:
         for host in restored_hosts:
@@ -34,6 +34,7 @@ import kataja.globals as g
 import kataja.ui_graphicsitems.TouchArea
 import kataja.ui_widgets.buttons.OverlayButton as ob
 from kataja.KatajaAction import KatajaAction, ShortcutSolver, ButtonShortcutFilter, MediatingAction
+from kataja.OrderedSet import OrderedSet
 from kataja.saved.Edge import Edge
 from kataja.saved.Group import Group
 from kataja.saved.movables.Arrow import Arrow
@@ -64,6 +65,7 @@ from kataja.ui_widgets.panels.LineOptionsPanel import LineOptionsPanel
 from kataja.ui_widgets.panels.LogPanel import LogPanel
 from kataja.ui_widgets.panels.NavigationPanel import NavigationPanel
 from kataja.ui_widgets.panels.ParseTreePanel import ParseTreePanel
+from kataja.ui_widgets.panels.ProfilerPanel import ProfilerPanel
 from kataja.ui_widgets.panels.ScopePanel import ScopePanel
 from kataja.ui_widgets.panels.SemanticsPanel import SemanticsPanel
 from kataja.ui_widgets.panels.SymbolPanel import SymbolPanel
@@ -97,7 +99,8 @@ PANELS = [{'class': LogPanel, 'name': 'Log', 'position': 'bottom'},
           {'class': InputPanel, 'name': 'Input tree', 'position': 'bottom', 'closed': False},
           {'class': LexiconPanel, 'name': 'Lexicon', 'position': 'float', 'closed': False},
           {'class': ParseTreePanel, 'name': 'Parses', 'position': 'float', 'closed': False},
-          {'class': HelpPanel, 'name': 'Help', 'position': 'float', 'closed': True}]
+          {'class': HelpPanel, 'name': 'Help', 'position': 'float', 'closed': True},
+          {'class': ProfilerPanel, 'name': 'Profiler', 'position': 'float', 'closed': True}]
 
 menu_structure = OrderedDict([('file_menu', ('&File',
                                              ['new_project', 'new_forest', 'open', 'save',
@@ -136,6 +139,7 @@ class UIManager:
         self.main = main
         self.scene = main.graph_scene
         self.actions = {}
+        self._action_states = {}
         self._action_groups = {}
         self._top_menus = {}
         self.top_bar_buttons = None
@@ -143,6 +147,7 @@ class UIManager:
         self.quick_edit_buttons = None
         self._items = {}
         self._items_by_host = {}
+        self._selection_items = OrderedSet()  # items that are removed when selection changes
         self._timer_id = 0
         self._panels = {}
         self._panel_positions = {}
@@ -244,6 +249,8 @@ class UIManager:
                 self._items_by_host[key].append(item)
             else:
                 self._items_by_host[key] = [item]
+            if not item.selection_independent:
+                self._selection_items.add(item)
         if item.scene_item:
             self.scene.addItem(item)
         # if show:
@@ -258,6 +265,7 @@ class UIManager:
             fade = False
         if item.ui_key in self._items:
             del self._items[item.ui_key]
+        self._selection_items.discard(item)
         if item.host:
             key = item.host.uid
             if key in self._items_by_host:
@@ -309,10 +317,37 @@ class UIManager:
     def resize_ui(self, size):
         self.update_positions()
 
-    def update_actions(self):
-        # prepare style dictionaries for selections, to be used for displaying style values in UI
+    def get_action_states(self) -> dict:
+        """ Cheap fingerprints of the state that actions' enablers and getters depend on, see
+        KatajaAction.k_depends_on. If a fingerprint is the same as in previous update, actions
+        depending on it don't need to be updated.
+        :return: dict of dependency key -> fingerprint
+        """
+        forest = ctrl.forest
+        undo_manager = forest and forest.undo_manager
+        return {
+            'forest': (id(ctrl.document), id(forest)),
+            'selection': ctrl.selection_revision,
+            'scope': (self.active_scope, ctrl.selection_revision if self.scope_is_selection
+                      else None),
+            'settings': prefs.settings_generation,
+            'undo': (id(undo_manager), undo_manager.can_undo(), undo_manager.can_redo())
+            if undo_manager else None
+        }
+
+    def update_actions(self, force=False):
+        """ Update enabled state and displayed values of actions whose dependencies have changed
+        since last update, or that are outdated otherwise.
+        :param force: update all actions
+        """
+        states = self.get_action_states()
+        old_states = self._action_states
+        changed = {key for key, value in states.items() if old_states.get(key, -1) != value}
+        self._action_states = states
         for action in self.actions.values():
-            action.update_action()
+            if force or action.outdated or action.depends_on is None or \
+                    not changed.isdisjoint(action.depends_on):
+                action.update_action()
 
     def update_action(self, key):
         """ If action is tied to some meter (e.g. number field that is used to show value and
@@ -326,15 +361,11 @@ class UIManager:
         active_embed = self.active_embed
 
         # clear all ui_support pieces
-        for item in list(self._items.values()):
-            if item.host and not (item.is_fading_out or item.selection_independent):
+        for item in self._selection_items:
+            if not item.is_fading_out:
                 self.remove_ui(item)
 
-        # Have a better way to do this -- halos as UI-items?
-        if ctrl.forest and ctrl.forest.nodes:
-            for node in ctrl.forest.nodes.values():
-                if node.node_type == g.CONSTITUENT_NODE and node.halo:
-                    node.toggle_halo(False)
+        self.remove_halos()
 
         # create ui_support pieces for selected elements. don't create touchareas and buttons
         # if multiple selection, it gets confusing fast
@@ -485,6 +516,8 @@ class UIManager:
         for action_key in added:
             del self.actions[action_key]
         self.actions.update(replaced)
+        for action in replaced.values():
+            action.outdated = True
 
     def create_actions(self):
         """ KatajaActions define user commands and interactions. They are loaded from modules in
@@ -634,14 +667,16 @@ class UIManager:
         if not panel.isVisible():
             panel.show()
         toggle_action = self.get_action('toggle_panel')
-        toggle_action.set_checked_for(panel_id, True)
+        if toggle_action:  # there are no actions in headless mode
+            toggle_action.set_checked_for(panel_id, True)
 
     def hide_panel(self, panel_id):
         panel = self.get_panel(panel_id)
         if panel and panel.isVisible():
             panel.close()
         toggle_action = self.get_action('toggle_panel')
-        toggle_action.set_checked_for(panel_id, False)
+        if toggle_action:  # there are no actions in headless mode
+            toggle_action.set_checked_for(panel_id, False)
 
     def create_panels(self):
         self._panels = {}
@@ -826,10 +861,20 @@ class UIManager:
             self.active_embed.update_position()
         self.add_ui(self.active_embed, show=False)
         self.active_embed.wake_up()
-        if ctrl.forest and ctrl.forest.nodes:
-            for node in ctrl.forest.nodes.values():
-                if node.node_type == g.CONSTITUENT_NODE and node.halo:
-                    node.toggle_halo(False)
+        self.remove_halos()
+
+    @staticmethod
+    def remove_halos():
+        """ Switch off halos of constituent nodes. Forest keeps track of nodes that have halos,
+        so this doesn't have to go through all nodes. """
+        forest = ctrl.forest
+        if not forest:
+            return
+        for node in list(forest.halo_nodes):
+            if forest.nodes.get(node.uid) is not node:
+                forest.halo_nodes.discard(node)
+            elif node.node_type == g.CONSTITUENT_NODE:
+                node.toggle_halo(False)
 
     # ### Touch areas
     # #####################################################################
@@ -23,15 +23,127 @@
 # along with Kataja.  If not, see <http://www.gnu.org/licenses/>.
 #
 # ############################################################################
+import io
+import pickle
 import pprint
+import sys
+import zlib
+from contextlib import contextmanager
 
-from kataja.singletons import ctrl, log
+from kataja.singletons import ctrl, log, prefs
 
 # Creation/Deletion flags
 CREATED = 1
 DELETED = 2
 
 max_stack = 24
+# this many newest snapshots are kept as they are, older ones can be compressed
+keep_uncompressed = 4
+POINTER_SIZE = 8
+PLAIN_TYPES = (type(None), bool, int, float, complex, str, bytes)
+CONTAINER_TYPES = (list, tuple, set, frozenset)
+
+
+def is_saved_object(value):
+    return hasattr(value, 'uid') and hasattr(value, 'get_saved')
+
+
+def estimate_size(value, seen=None):
+    """ Rough estimate of how many bytes a snapshot value keeps alive. Only builtin containers
+    are looked into. Other saved objects are alive anyway, so references to them are counted
+    only as pointers.
+    :param value: anything stored in transitions
+    :param seen: set of ids of already counted objects
+    :return: int
+    """
+    if seen is None:
+        seen = set()
+    size = 0
+    # iterate instead of recursing, as values can be deeply nested
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or is_saved_object(item):
+            size += POINTER_SIZE
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item, 64)
+        if type(item) is dict:
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif type(item) in CONTAINER_TYPES:
+            stack.extend(item)
+    return size
+
+
+class _DeltaPickler(pickle.Pickler):
+    """ Pickles the structure of snapshot and plain values, but leaves references to all other
+    objects as they are, so restoring keeps their identity. """
+
+    def __init__(self, file, refs, by_value):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.refs = refs
+        self.ref_index = {}
+        self.by_value = by_value
+
+    def persistent_id(self, obj):
+        if type(obj) in PLAIN_TYPES or id(obj) in self.by_value:
+            return None
+        key = id(obj)
+        if key not in self.ref_index:
+            self.ref_index[key] = len(self.refs)
+            self.refs.append(obj)
+        return self.ref_index[key]
+
+
+class _DeltaUnpickler(pickle.Unpickler):
+    def __init__(self, file, refs):
+        super().__init__(file)
+        self.refs = refs
+
+    def persistent_load(self, pid):
+        return self.refs[pid]
+
+
+class CompressedSnapshot:
+    """ Old snapshot serialized into compressed bytes. Only the snapshot's own structure, plain
+    values and the builtin containers that SavedObject stores as shallow copies are pickled.
+    Everything else, e.g. saved objects, INodes or Qt objects, is kept as live reference, so
+    restoring gives the same result as restoring uncompressed snapshot.
+
+    Behaves like the snapshot dict where UndoManager needs it.
+    """
+
+    def __init__(self, snapshot):
+        self.refs = []
+        entries = list(snapshot.values())
+        by_value = {id(entries)}
+        for entry in entries:
+            by_value.add(id(entry))
+            transitions = entry[1]
+            by_value.add(id(transitions))
+            for pair in transitions.values():
+                by_value.add(id(pair))
+                for value in pair:
+                    if type(value) in CONTAINER_TYPES or type(value) is dict:
+                        by_value.add(id(value))
+        buffer = io.BytesIO()
+        _DeltaPickler(buffer, self.refs, by_value).dump(entries)
+        self.data = zlib.compress(buffer.getvalue())
+        self.size = len(self.data) + len(self.refs) * POINTER_SIZE
+
+    def values(self):
+        return _DeltaUnpickler(io.BytesIO(zlib.decompress(self.data)), self.refs).load()
+
+
+def snapshot_size(snapshot):
+    if isinstance(snapshot, CompressedSnapshot):
+        return snapshot.size
+    seen = set()
+    size = sys.getsizeof(snapshot)
+    for obj, transitions, transition_type in snapshot.values():
+        size += POINTER_SIZE + estimate_size(transitions, seen)
+    return size
 
 
 class UndoManager:
@@ -41,7 +153,18 @@ class UndoManager:
         self.forest = forest
         self.full_state = {}
         self._stack = []
+        self._sizes = []
         self._current = 0
+        self._transaction_key = None
+        self._transaction_depth = 0
+        self._transaction_msg = ''
+        self._transaction_scoped = False
+        self._merge_key = None
+
+    @property
+    def total_size(self):
+        """ Estimated bytes held by undo stack """
+        return sum(self._sizes)
 
     def can_undo(self):
         return self._current >= 0
@@ -56,12 +179,125 @@ class UndoManager:
             obj.flush_history()
         ctrl.undo_pile = set()
 
+    # Transactions ###########################
+
+    @property
+    def transaction_key(self):
+        return self._transaction_key
+
+    def start_transaction(self, key='', scoped=False):
+        """ Start collecting changes into one undo step. While transaction is open, take_snapshot
+        doesn't compute anything, changed objects just stay in undo pile with their original
+        values in history. Starting a transaction with the same key as the open one does
+        nothing, so continuous UI events can call this for each event.
+
+        Transactions that aren't scoped stay open only as long as snapshots come from the same
+        operation: a snapshot with some other key closes the transaction before it is taken.
+        Their owner should also close them when the operation goes idle.
+        :param key: identifies what kind of operation this is, e.g. action uid
+        :param scoped: transaction is closed explicitly by its owner (see transaction()) and
+        collects all snapshots until then. Scoped transactions started inside it are counted
+        into it and other transactions started inside it join it.
+        """
+        if self._transaction_depth and self._transaction_scoped:
+            if scoped:
+                self._transaction_depth += 1
+            return
+        if self._transaction_depth and key == self._transaction_key and not scoped:
+            return
+        if self._transaction_depth:
+            self.end_transaction()
+        self._transaction_key = key
+        self._transaction_depth = 1
+        self._transaction_msg = ''
+        self._transaction_scoped = scoped
+
+    def end_transaction(self, msg='', scoped=False):
+        """ Close the transaction and store everything that happened in it as one undo step.
+        :param msg: message for undo, if not given use the last message received during
+        transaction.
+        :param scoped: this closes a scoped transaction. Only the outermost scoped transaction
+        stores the undo step, and other calls don't close scoped transactions.
+        """
+        if not self._transaction_depth:
+            return
+        if self._transaction_scoped:
+            if not scoped:
+                return
+            if self._transaction_depth > 1:
+                self._transaction_depth -= 1
+                self._transaction_msg = msg or self._transaction_msg
+                return
+        msg = msg or self._transaction_msg
+        self._transaction_depth = 0
+        self._transaction_key = None
+        self._transaction_msg = ''
+        self._transaction_scoped = False
+        self.take_snapshot(msg)
+
+    def end_transaction_unless(self, key):
+        """ Close open transaction if it is for something else than key and not scoped. Call
+        this before starting another kind of operation, so that it doesn't get merged into
+        earlier one. """
+        if self._transaction_depth and not self._transaction_scoped and \
+                self._transaction_key != key:
+            self.end_transaction()
+
+    @contextmanager
+    def transaction(self, key='', msg=''):
+        """ with forest.undo_manager.transaction('drag'):
+                ...many changes and action_finished -calls...
+        """
+        self.start_transaction(key, scoped=True)
+        try:
+            yield self
+        finally:
+            self.end_transaction(msg, scoped=True)
+
+    @staticmethod
+    def _merge_snapshots(earlier, later):
+        """ Merge later snapshot into earlier if later only edits the same fields of the same
+        objects, e.g. repeated position updates.
+        :return: True if merged, False if snapshots weren't compatible
+        """
+        for uid, (obj, transitions, transition_type) in later.items():
+            if transition_type or uid not in earlier:
+                return False
+            e_obj, e_transitions, e_transition_type = earlier[uid]
+            if e_transition_type or not transitions.keys() <= e_transitions.keys():
+                return False
+        for uid, (obj, transitions, transition_type) in later.items():
+            e_transitions = earlier[uid][1]
+            for key, (old, new) in transitions.items():
+                e_old = e_transitions[key][0]
+                if e_old == new:
+                    del e_transitions[key]
+                else:
+                    e_transitions[key] = e_old, new
+            if not e_transitions:
+                del earlier[uid]
+        return True
+
     #    @time_me
-    def take_snapshot(self, msg=''):
+    def take_snapshot(self, msg='', merge_key=None, transaction_key=None):
         """ Store changes from ctrl.undo_pile and put them here into undo_stack.
         :param msg: str = msg to
+        :param merge_key: if previous snapshot was taken with same merge_key and this snapshot
+        edits the same fields of the same objects, merge them into one. Callers should make the
+        key unique for one gesture, so that separate user operations are not merged.
+        :param transaction_key: operation that the snapshot comes from. Snapshot from another
+        operation closes open transaction that is not scoped.
         :return: None
         """
+        if self._transaction_depth:
+            if self._transaction_scoped or transaction_key == self._transaction_key:
+                # transitions are computed once, when transaction ends
+                self._transaction_msg = msg or self._transaction_msg
+                return
+            # change from elsewhere closes the continuous operation. Their changes are already
+            # mixed in undo pile, so they become one undo step, but later snapshots are not lost.
+            self.end_transaction(msg)
+            return
         # save objects in undo pile
         snapshot = {}
         # print('items in undo pile:', len(ctrl.undo_pile))
@@ -72,19 +308,60 @@ class UndoManager:
                 snapshot[obj.uid] = (obj, transitions, transition_type)
             obj.flush_history()
         # ...
-        if snapshot:
+        if snapshot and merge_key is not None and merge_key == self._merge_key and \
+                self._current == len(self._stack) - 1 and self._stack and isinstance(self._stack[-1][1], dict) and \
+                self._merge_snapshots(self._stack[-1][1], snapshot):
+            earlier = self._stack[-1][1]
+            self._stack[-1] = (msg or self._stack[-1][0], earlier)
+            self._sizes[-1] = snapshot_size(earlier)
+            if not earlier:
+                # merged changes cancelled each other out
+                self._stack.pop()
+                self._sizes.pop()
+                self._current -= 1
+        elif snapshot:
+            self._merge_key = merge_key
             self._stack = self._stack[:self._current + 1]
+            self._sizes = self._sizes[:self._current + 1]
             self._stack.append((msg, snapshot))
+            self._sizes.append(snapshot_size(snapshot))
             self._current = len(self._stack) - 1
+            self.compress_old_snapshots()
+            self.evict()
         ctrl.undo_pile = set()
-        if len(self._stack) > max_stack:
+
+        # log.info('took snapshot of size: %s, undo stack size: %s items %s bytes' % (
+        #    self._sizes[-1] if self._sizes else 0, len(self._stack), self.total_size))
+
+    def compress_old_snapshots(self):
+        """ Older snapshots are less likely to be needed, so serialize and compress those that
+        are not among the newest few. Snapshot that cannot be pickled is kept as it is. """
+        if not prefs.compress_undo:
+            return
+        for i in range(len(self._stack) - keep_uncompressed):
+            msg, snapshot = self._stack[i]
+            if isinstance(snapshot, CompressedSnapshot):
+                continue
+            try:
+                compressed = CompressedSnapshot(snapshot)
+            except (pickle.PicklingError, TypeError, AttributeError, RecursionError) as err:
+                log.debug(f'undo snapshot "{msg}" cannot be compressed: {err}')
+                continue
+            if compressed.size < self._sizes[i]:
+                self._stack[i] = (msg, compressed)
+                self._sizes[i] = compressed.size
+
+    def evict(self):
+        """ Remove oldest snapshots if there are too many or they take too much memory. Latest
+        snapshot is always kept. """
+        budget = prefs.undo_memory_budget * 1024 * 1024
+        total = self.total_size
+        while len(self._stack) > 1 and self._current > 0 and \
+                (len(self._stack) > max_stack or total > budget):
             self._stack.pop(0)
+            total -= self._sizes.pop(0)
             self._current -= 1
 
-        # log.info('took snapshot of size: %s, undo stack size: %s items %s chars' % (
-        #    len(str(snapshot)), len(self._stack), len(str(self._stack))))
-        # print('stack len:', len(str(self._stack)))
-
     def undo(self):
         """ Move backward in the undo stack
         :return: None
@@ -97,9 +374,13 @@ class UndoManager:
         ctrl.disable_undo()
         ctrl.multiselection_start()
         self.forest.halt_drawing = True
+        self._merge_key = None
         msg, snapshot = self._stack[self._current]
         for obj, transitions, transition_type in snapshot.values():
             obj.revert_to_earlier(transitions, transition_type)
+        # restored objects may have had their settings changed
+        prefs.bump_settings_generation()
+        self.forest.mark_all_dirty()
         self.forest.edge_visibility_check()
         self.forest.flush_and_rebuild_temporary_items()
         log.info('undo [%s]: %s' % (self._current, msg))
@@ -122,9 +403,13 @@ class UndoManager:
         ctrl.disable_undo()
         ctrl.multiselection_start()
         self.forest.halt_drawing = True
+        self._merge_key = None
         msg, snapshot = self._stack[self._current]
         for obj, transitions, transition_type in snapshot.values():
             obj.move_to_later(transitions, transition_type)
+        # restored objects may have had their settings changed
+        prefs.bump_settings_generation()
+        self.forest.mark_all_dirty()
         self.forest.edge_visibility_check()
         self.forest.flush_and_rebuild_temporary_items()
         log.info('redo [%s]: %s' % (self._current, msg))
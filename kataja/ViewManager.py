@@ -23,6 +23,7 @@
 # ############################################################################
 
 import math
+from contextlib import contextmanager
 from itertools import chain
 
 import PyQt6.QtCore as QtCore
@@ -51,6 +52,8 @@ class ViewManager:
         self.auto_zoom = True
         self.predictive = False
         self._cached_visible_rect = None
+        self.low_detail = False
+        self.printing = False
 
         # self.zoom_anim = None
         # self._last_rect = self._target_rect
@@ -60,6 +63,7 @@ class ViewManager:
         self.scene = graph_scene
         self._zoom_timer = QtCore.QTimer(graph_view)
         self._zoom_timer.setSingleShot(True)
+        ctrl.main.viewport_moved.connect(self.viewport_changed)
 
     # def scale_step(self, r):
     #     ox, oy, ow, oh = self._zoom_rect
@@ -253,6 +257,61 @@ class ViewManager:
             self.set_auto_zoom(True)
             self.fit_to_window()
 
+    def viewport_changed(self):
+        """ When the view is zoomed or panned, items that were skipped while outside of the view
+        may have come into view and zooming may have crossed the threshold for simplified drawing.
+        """
+        self.update_level_of_detail()
+        if ctrl.forest:
+            ctrl.forest.update_culled_edges(self.visible_scene_rect())
+
+    def update_level_of_detail(self):
+        """ Switch between full drawing and simplified drawing for very large forests. In low
+        detail mode nodes are drawn as boxes without their labels and edges as plain lines
+        without arrowheads. Items check self.low_detail when painting, so the whole scene has to
+        be repainted when it changes.
+        """
+        threshold = prefs.low_detail_zoom
+        low_detail = bool(threshold) and self.view.transform().m11() < threshold
+        if low_detail == self.low_detail:
+            return
+        self.low_detail = low_detail
+        f = ctrl.forest
+        if not f:
+            return
+        # nodes, edges and groups have no item cache (NoCache) and labels are painted from the
+        # shared LabelPixmapCache, so repainting the items switches their detail level
+        for item in chain(f.nodes.values(), f.edges.values(), f.groups.values()):
+            item.update()
+        for node in f.nodes.values():
+            if node.label_object:
+                node.label_object.update()
+        if not low_detail:
+            # fat paths for hovering and clicking were skipped while zoomed out
+            for edge in list(f.edges.values()):
+                edge.path.changed = True
+                edge.make_path()
+
+    @contextmanager
+    def full_detail(self):
+        """ Paint for printing: full detail regardless of zoom level, and labels as text
+        instead of cached pixmaps, so that pdfs get vector graphics. """
+        low_detail = self.low_detail
+        self.low_detail = False
+        self.printing = True
+        try:
+            yield
+        finally:
+            self.low_detail = low_detail
+            self.printing = False
+
+    def visible_scene_rect(self):
+        """ The part of the scene that is actually shown in the view right now. This differs from
+        _calculate_visible_rect, which is the area of all visible items.
+        :return: QRectF
+        """
+        return self.view.mapToScene(self.view.viewport().rect()).boundingRect()
+
     def center(self):
         if self._cached_visible_rect:
             return self._cached_visible_rect.center()
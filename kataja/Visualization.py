@@ -27,6 +27,10 @@ import random
 import kataja.globals as g
 from kataja.saved.movables import Node
 
+# Random noise used by physics steps comes from its own generator, so that PhysicsScheduler can
+# seed it and settle a forest the same way every time.
+physics_random = random.Random()
+
 LEFT = 1
 NO_ALIGN = 0
 RIGHT = 2
@@ -52,6 +56,7 @@ class BaseVisualization:
     hide_edges_if_nodes_overlap = True
     use_rotation = False
     use_gravity = True
+    use_contour_layout = False  # grid-based visualizations can use ContourLayout instead of Grid
 
     def __init__(self):
         """ This is called once when building Kataja. Set up properties for this kind of 
@@ -192,7 +197,7 @@ class BaseVisualization:
 
         min_left = 1000
         nodes_to_move = []
-        for node in right_tree_top.get_sorted_nodes():
+        for node in self.forest.topology_index.sorted_nodes(right_tree_top):
             if node.locked_to_node:
                 continue
             elif node.physics_x and node.physics_y:
@@ -256,7 +261,7 @@ class BaseVisualization:
         new = tree_top.target_position
         dx = old[0] - new[0]
         dy = old[1] - new[1]
-        for node in tree_top.get_sorted_nodes():
+        for node in self.forest.topology_index.sorted_nodes(tree_top):
             if node.locked_to_node:
                 continue
             elif node.physics_x and node.physics_y:
@@ -339,8 +344,8 @@ class BaseVisualization:
             other_x, other_y = other.node_center_position()
             dist_x, dist_y = node_x - other_x, node_y - other_y
             if dist_x == 0 and dist_y == 0:
-                xvel += (random.random() * 4) - 2
-                yvel += (random.random() * 4) - 2
+                xvel += (physics_random.random() * 4) - 2
+                yvel += (physics_random.random() * 4) - 2
                 return xvel, yvel
             elif dist_x == 0:
                 force_ratio = (my_h / my_w + other_h / other_w) / 2
@@ -405,8 +410,8 @@ class BaseVisualization:
             overlap_y = minimum_dy - abs(dist_y)
             overlap_x = minimum_dx - abs(dist_x)
             if dist_x == 0 and dist_y == 0:
-                xvel += (random.random() * 4) - 2
-                yvel += (random.random() * 4) - 2
+                xvel += (physics_random.random() * 4) - 2
+                yvel += (physics_random.random() * 4) - 2
             elif overlap_x > 0 and overlap_y > 0:
                 if overlap_x > overlap_y:
                     xvel += math.copysign(1.0, dist_x) * inner_repulsion * overlap_x
@@ -442,9 +447,9 @@ class BaseVisualization:
     @staticmethod
     def speed_noise(node, x_vel, y_vel):
         if abs(x_vel) > 3:
-            y_vel += (random.random() * -4) + 2
+            y_vel += (physics_random.random() * -4) + 2
         if abs(y_vel) > 3:
-            x_vel += (random.random() * -4) + 2
+            x_vel += (physics_random.random() * -4) + 2
         return x_vel, y_vel
 
     def calculate_movement(self, node: 'Node', other_nodes: list, heat: float):
@@ -1,7 +1,7 @@
 # coding=utf-8
 import os
 
-from kataja.launcher import start, draw
+from kataja.launcher import start, draw, serve
 
 name = 'kataja'
 parent = os.path.dirname(os.path.dirname(__file__))
@@ -32,6 +32,7 @@ class SetActiveColorMode(KatajaAction):
     k_action_uid = 'set_active_color_theme'
     k_command = 'Change palette'
     k_tooltip = 'Change palette used for UI and drawings'
+    k_depends_on = ('forest', 'scope', 'settings')
 
     def prepare_parameters(self, args, kwargs):
         sender = self.sender()
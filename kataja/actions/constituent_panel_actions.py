@@ -34,6 +34,7 @@ class SelectLabelShape(KatajaAction):
     k_command = 'Rotate between node shapes'
     k_shortcut = 'b'
     k_checkable = True
+    k_depends_on = ('scope',)
 
     def method(self):
         """ Brackets are visible always for non-leaves, never or for important parts
@@ -133,6 +134,7 @@ class SelectTraceMode(KatajaAction):
     k_action_uid = 'select_trace_strategy'
     k_command = 'Show traces'
     k_shortcut = 't'
+    k_depends_on = ('forest', 'scope', 'settings')
 
     def prepare_parameters(self, args, kwargs):
         sender = self.sender()
@@ -171,6 +173,7 @@ class SelectLinearizationMode(KatajaAction):
     k_action_uid = 'select_linearization_mode'
     k_command = 'Select linearization strategy'
     k_shortcut = 'i'
+    k_depends_on = ('forest', 'scope', 'settings')
 
     def prepare_parameters(self, args, kwargs):
         sender = self.sender()
@@ -209,6 +212,7 @@ class SetVisibleLabel(KatajaAction):
     k_undoable = True
     k_shortcut = 'l'
     k_tooltip = 'Switch what to show as label text'
+    k_depends_on = ('forest', 'scope', 'settings')
 
     def prepare_parameters(self, args, kwargs):
         sender = self.sender()
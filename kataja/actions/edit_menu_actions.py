@@ -33,6 +33,7 @@ class Cut(KatajaAction):
     k_command = 'Cut'
     k_tooltip = 'Cut element'
     k_shortcut = QKeySequence(QKeySequence.StandardKey.Cut)
+    k_depends_on = ('selection',)
 
     def method(self):
         qclipboard = ctrl.main.app.clipboard()
@@ -58,6 +59,7 @@ class Copy(KatajaAction):
     k_command = 'Copy'
     k_tooltip = 'Copy element'
     k_shortcut = QKeySequence(QKeySequence.StandardKey.Copy)
+    k_depends_on = ('selection',)
 
     def method(self):
         ctrl.clipboard = []
@@ -97,6 +99,7 @@ class Undo(KatajaAction):
     k_tooltip = 'Undo element'
     k_shortcut = QKeySequence(QKeySequence.StandardKey.Undo)
     k_undoable = False
+    k_depends_on = ('undo',)
 
     def method(self):
         """ Undo -command triggered
@@ -117,6 +120,7 @@ class Redo(KatajaAction):
     k_tooltip = 'Redo element'
     k_shortcut = QKeySequence(QKeySequence.StandardKey.Redo)
     k_undoable = False
+    k_depends_on = ('undo',)
 
     def method(self):
         """ Redo -command triggered
@@ -35,6 +35,7 @@ class SwitchFeatureCheckingMode(KatajaAction):
                 "displayed"
     k_checkable = False
     k_shortcut = 'Shift+f'
+    k_depends_on = ('forest', 'scope', 'settings')
 
     def method(self):
         """ Toggle between no 
@@ -60,6 +61,7 @@ class SetFeaturesApart(KatajaAction):
     k_action_uid = 'set_features_apart'
     k_command = "Don't show feature checking"
     k_checkable = True
+    k_depends_on = ('forest', 'scope', 'settings')
 
     def method(self):
         """ Set nodes to be frameless and small
@@ -79,6 +81,7 @@ class SetFeaturesLocked(KatajaAction):
     k_action_uid = 'set_features_locked'
     k_command = "Checking features lock into each other"
     k_checkable = True
+    k_depends_on = ('forest', 'scope', 'settings')
 
     def method(self):
         """ Set nodes to be frameless and small
@@ -98,6 +101,7 @@ class SetFeaturesConnected(KatajaAction):
     k_action_uid = 'set_features_connected'
     k_command = "Checking features are connected by line"
     k_checkable = True
+    k_depends_on = ('forest', 'scope', 'settings')
 
     def method(self):
         """ Set nodes to be frameless and small
@@ -118,6 +122,7 @@ class SelectFeatureDisplayMode(KatajaAction):
     k_command = 'Change how to display features'
     k_tooltip = 'Switch between ways to arrange features'
     k_shortcut = 'f'
+    k_depends_on = ('forest', 'scope', 'settings')
 
     def method(self):
         f_mode = ctrl.ui.get_active_setting('feature_positioning')
@@ -142,6 +147,7 @@ class SetFeaturesAsRow(KatajaAction):
     k_action_uid = 'set_features_as_row'
     k_command = "Features form a horizontal row below the constituent"
     k_checkable = True
+    k_depends_on = ('forest', 'scope', 'settings')
 
     def method(self):
         """ Set nodes to be frameless and small
@@ -161,6 +167,7 @@ class SetFeaturesAsColumn(KatajaAction):
     k_action_uid = 'set_features_as_column'
     k_command = "Features form a vertical column below the constituent"
     k_checkable = True
+    k_depends_on = ('forest', 'scope', 'settings')
 
     def method(self):
         """ Set nodes to be frameless and small
@@ -180,6 +187,7 @@ class SetFeaturesAsTwoColumns(KatajaAction):
     k_action_uid = 'set_features_as_2_columns'
     k_command = "Features form two columns, one for receiving and one for giving"
     k_checkable = True
+    k_depends_on = ('forest', 'scope', 'settings')
 
     def method(self):
         """ Set nodes to be frameless and small
@@ -199,6 +207,7 @@ class SetFeaturesHanging(KatajaAction):
     k_action_uid = 'set_features_hanging'
     k_command = "Features use physics to find their places"
     k_checkable = True
+    k_depends_on = ('forest', 'scope', 'settings')
 
     def method(self):
         """ Set nodes to be frameless and small
@@ -2,6 +2,7 @@
 
 from kataja.KatajaAction import KatajaAction
 from kataja.singletons import ctrl
+from kataja.utils import timed
 
 
 # ==== Class variables for KatajaActions:
@@ -47,10 +48,11 @@ class DeriveFromInput(KatajaAction):
             semantics = sem_panel.semantics_text.text() if sem_panel else None
             forest = ctrl.forest
             forest.clear()
-            ctrl.syntax.create_derivation(input_text=input_text,
-                                          lexicon=lexicon,
-                                          semantics=semantics,
-                                          forest=forest)
+            with timed('parse'):
+                ctrl.syntax.create_derivation(input_text=input_text,
+                                              lexicon=lexicon,
+                                              semantics=semantics,
+                                              forest=forest)
             forest.is_parsed = True
             forest.derivation_tree.update_dimensions()
             ctrl.main.forest_changed.emit()
@@ -32,6 +32,7 @@ class SetLogLevel(KatajaAction):
     k_command = 'Set log level'
     k_undoable = False
     k_tooltip = 'Set minimum priority for visible messages'
+    k_depends_on = ('settings',)
 
     def prepare_parameters(self, args, kwargs):
         value = self.sender().currentData()
@@ -76,6 +76,7 @@ class PreviousForest(KatajaAction):
 class JumpToForest(KatajaAction):
     k_action_uid = 'jump_to_forest'
     k_command = 'Jump to tree set'
+    k_depends_on = ('forest',)
 
     def prepare_parameters(self, args, kwargs):
         if not args:
@@ -55,6 +55,7 @@ class AddConstituentNode(AbstractAddNode):
     k_action_uid = 'add_constituent_node'
     k_command = 'Add constituent node'
     k_tooltip = 'Create new constituent node'
+    k_depends_on = ()
     node_type = g.CONSTITUENT_NODE
 
     def enabler(self):
@@ -65,6 +66,7 @@ class AddFeatureNode(AbstractAddNode):
     k_action_uid = 'add_feature_node'
     k_command = 'Add feature node'
     k_tooltip = 'Create new feature node'
+    k_depends_on = ()
     node_type = g.FEATURE_NODE
 
     def enabler(self):
@@ -87,6 +89,7 @@ class AddCommentNode(AbstractAddNode):
 
 class AbstractToggleVisibility(KatajaAction):
     k_action_uid = ''
+    k_depends_on = ('forest', 'scope', 'settings')
     node_type = 0
 
     def prepare_parameters(self, args, kwargs):
@@ -140,6 +143,7 @@ class ToggleCommentNodeVisibility(AbstractToggleVisibility):
 
 class AbstractToggleEdgeVisibility(KatajaAction):
     k_action_uid = ''
+    k_depends_on = ('forest', 'scope', 'settings')
     node_type = 0
 
     def prepare_parameters(self, args, kwargs):
@@ -191,6 +195,7 @@ class ToggleCommentEdgeVisibility(AbstractToggleEdgeVisibility):
 
 class AbstractSelectFont(KatajaAction):
     k_action_uid = ''
+    k_depends_on = ('forest', 'scope', 'settings')
     node_type = 0
 
     def prepare_parameters(self, args, kwargs):
@@ -268,6 +273,7 @@ class SelectFontFromDialog(KatajaAction):
 
 class AbstractChangeNodeColor(KatajaAction):
     k_action_uid = ''
+    k_depends_on = ('forest', 'scope', 'settings')
     node_type = 0
 
     def prepare_parameters(self, args, kwargs):
@@ -63,6 +63,7 @@ class ReloadPlugin(KatajaAction):
     k_command = '&Reload plugins'
     k_shortcut = 'Ctrl+Shift+r'
     k_undoable = False
+    k_depends_on = ('settings',)
 
     def method(self):
         """ Reload currently active plugin """
@@ -0,0 +1,91 @@
+# coding=utf-8
+import os
+
+from PyQt6 import QtWidgets
+
+from kataja.KatajaAction import KatajaAction
+from kataja.Profiler import profiler
+from kataja.singletons import ctrl, prefs
+
+
+# ==== Class variables for KatajaActions:
+#
+# k_action_uid : unique id for calling this action. required, other are optional
+# k_command : text used for menu command and log feedback, unless the method returns a fdback string
+# k_tooltip : tooltip text for ui element. If not given, uses k_command as tooltip.
+# k_undoable : is the action undoable, default is True
+# k_shortcut : keyboard shortcut given as string, e.g. 'Ctrl+x'
+# k_shortcut_context : can be nothing or 'parent_and_children' if shortcut is active only when the
+#                      parent widget is visible and active
+# k_checkable : should the action be checkable, default False
+#
+# ==== Methods:
+#
+# method : gets called when action is triggered. If it returns a string, this is used as a command
+#          feedback string, otherwise k_command is printed to log.
+# getter : if there is an UI element that can show state or display value, this method returns the
+#          value. These are called quite often, but with values that have to change e.g. when item
+#          is dragged, you'll have to update manually.
+# enabler : if enabler is defined, the action is active (also reflected into its UI elements) only
+#           when enabler returns True
+#
+
+
+class ToggleProfiling(KatajaAction):
+    k_action_uid = 'toggle_profiling'
+    k_command = 'Record timings'
+    k_undoable = False
+    k_checkable = True
+    k_tooltip = 'Measure how long actions, parsing and drawing stages take'
+    k_depends_on = ('settings',)
+
+    def prepare_parameters(self, args, kwargs):
+        value = bool(args[0]) if args else not prefs.profiling
+        return [value], kwargs
+
+    def method(self, value):
+        """ Switch profiling on or off.
+        :param value: bool
+        """
+        prefs.set('profiling', value)
+        ctrl.main.update_profiling()
+        return 'Recording timings.' if value else 'Stopped recording timings.'
+
+    def getter(self):
+        return prefs.profiling
+
+
+class ClearProfile(KatajaAction):
+    k_action_uid = 'clear_profile'
+    k_command = 'Clear timings'
+    k_undoable = False
+
+    def method(self):
+        profiler.clear()
+        panel = ctrl.ui.get_panel('ProfilerPanel')
+        if panel:
+            panel.clear()
+
+
+class ExportProfileTrace(KatajaAction):
+    k_action_uid = 'export_profile_trace'
+    k_command = 'Export timings as trace'
+    k_undoable = False
+    k_tooltip = 'Save recorded timings as a Chrome trace file (open in chrome://tracing or ' \
+                'ui.perfetto.dev)'
+
+    def prepare_parameters(self, args, kwargs):
+        # noinspection PyTypeChecker,PyCallByClass
+        filename, filetypes = QtWidgets.QFileDialog.getSaveFileName(
+            ctrl.main, "Export timings", os.path.join(prefs.userspace_path, 'kataja_trace.json'),
+            "Chrome trace (*.json)")
+        return [filename], kwargs
+
+    def method(self, filename):
+        """ Write recorded spans and counters to a json file in Chrome trace format.
+        :param filename: path for the trace
+        """
+        if not filename:
+            return
+        count = profiler.export_chrome_trace(filename)
+        return f"Wrote {count} trace events to '{filename}'."
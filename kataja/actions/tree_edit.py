@@ -132,6 +132,7 @@ class ToggleNodeEditEmbed(KatajaAction):
 class AdjustNode(KatajaAction):
     k_action_uid = 'adjust_node'
     k_command = 'Adjust node position'
+    k_merge_undo = True
 
     def method(self, node_uid, x, y):
         """ Node has been dragged to this position and the current algorithm has a static position
@@ -154,6 +155,7 @@ class AdjustNode(KatajaAction):
 class MoveNode(KatajaAction):
     k_action_uid = 'move_node'
     k_command = 'Move node position'
+    k_merge_undo = True
 
     def method(self, node_uid, x, y):
         """ Immediately move node to given scene position. If node was using force algorithm to
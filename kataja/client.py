@@ -0,0 +1,249 @@
+# coding=utf-8
+""" Client for scripted rendering with a long-running Kataja daemon.
+
+Starting Kataja means starting Python interpreter, PyQt and plugins, which takes seconds. A script
+that draws many trees can instead keep one or more headless Kataja instances running and send
+them requests:
+
+import kataja.client
+png_bytes = kataja.client.render('[.S [.NP John ] [.VP sleeps ] ]')
+pdf_bytes = kataja.client.render(tree, fmt='pdf')
+brackets = kataja.client.parse(tree)
+
+The first call starts a daemon if there isn't one already listening. Daemon can also be started
+from command line:
+
+python Kataja.py --daemon -port 62237
+
+For concurrent requests use WorkerPool, which starts several daemons and spreads the requests
+between them:
+
+with kataja.client.WorkerPool(size=4) as pool:
+    images = pool.map_render(trees)
+
+"""
+import base64
+import json
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+IP = '127.0.0.1'
+DAEMON_PORT = 62237  # 62236 is used by Kataja instances with windows
+STARTUP_TIMEOUT = 60
+
+
+class KatajaClientError(Exception):
+    """ for failed requests to Kataja daemon """
+
+
+class KatajaClient:
+    """ Connection to one Kataja daemon. Requests are sent as newline-delimited json, one at a
+    time, so share a client between threads only through WorkerPool.
+    """
+
+    def __init__(self, host=IP, port=DAEMON_PORT, timeout=STARTUP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._socket = None
+        self._file = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def connect(self):
+        if not self._socket:
+            self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            self._file = self._socket.makefile('rwb')
+        return self
+
+    def close(self):
+        if self._socket:
+            self._file.close()
+            self._socket.close()
+            self._socket = None
+            self._file = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def request(self, command, trees, **kwargs):
+        """ Send one request and wait for its response.
+        :param command: 'trees', 'render' or 'parse'
+        :param trees: tree string or list of treelist lines
+        :param kwargs: other request fields, e.g. format='pdf'
+        :return: response dict
+        """
+        if isinstance(trees, str):
+            trees = trees.splitlines()
+        with self._lock:
+            self.connect()
+            self._next_id += 1
+            message = dict(kwargs, id=self._next_id, command=command, trees=trees)
+            try:
+                self._file.write(json.dumps(message).encode('utf-8') + b'\n')
+                self._file.flush()
+                line = self._file.readline()
+            except OSError:
+                self.close()
+                raise
+            if not line:
+                self.close()
+                raise KatajaClientError('Kataja closed the connection')
+        response = json.loads(line.decode('utf-8'))
+        if not response.get('ok'):
+            raise KatajaClientError(response.get('error', 'request failed'))
+        return response
+
+    def render(self, tree, fmt='png'):
+        """ Draw tree and return the image as bytes.
+        :param tree: bracket tree or treelist with one tree
+        :param fmt: 'png' or 'pdf'
+        :return: bytes
+        """
+        images = self.render_all(tree, fmt=fmt)
+        if not images:
+            raise KatajaClientError('nothing was rendered')
+        return images[0]
+
+    def render_all(self, treelist, fmt='png'):
+        """ Draw every forest in treelist and return list of images as bytes. """
+        response = self.request('render', treelist, format=fmt)
+        return [base64.b64decode(image) for image in response['images']]
+
+    def parse(self, tree):
+        """ Let the active plugin build the trees and return them as bracket strings.
+        :param tree: bracket tree, sentence or treelist, whatever the plugin understands
+        :return: list of dicts with 'trees', 'heading' and 'nodes', one per forest
+        """
+        return self.request('parse', tree)['forests']
+
+    def add_trees(self, treelist, replace=False, show=True):
+        """ Append (or replace) forests in a Kataja that is used interactively.
+        :return: response dict
+        """
+        return self.request('trees', treelist, replace=replace, show=show)
+
+
+def is_listening(host=IP, port=DAEMON_PORT):
+    try:
+        with socket.create_connection((host, port), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+def start_daemon(port=DAEMON_PORT, plugin='', timeout=STARTUP_TIMEOUT):
+    """ Launch a headless Kataja in a separate process and wait until it accepts connections.
+    :param port: port for the daemon to listen
+    :param plugin: plugin to enable, default is the one from preferences
+    :param timeout: seconds to wait for startup
+    :return: subprocess.Popen
+    """
+    args = [sys.executable, '-m', 'kataja', '--daemon', '--no_prefs', '-port', str(port)]
+    if plugin:
+        args += ['-plugin', plugin]
+    kwargs = {'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL,
+              'cwd': os.path.dirname(os.path.dirname(os.path.abspath(__file__)))}
+    if os.name == 'posix':
+        kwargs['start_new_session'] = True
+    process = subprocess.Popen(args, **kwargs)
+    waited = 0
+    while not is_listening(port=port):
+        if process.poll() is not None or waited > timeout:
+            process.kill()
+            raise KatajaClientError(f'Kataja daemon failed to start on port {port}')
+        time.sleep(0.2)
+        waited += 0.2
+    return process
+
+
+class WorkerPool:
+    """ Pool of Kataja daemons for rendering several trees at the same time. Each daemon draws
+    in its own process, requests are given to whichever daemon is free.
+
+    :param size: number of daemons
+    :param base_port: ports base_port ... base_port + size - 1 are used
+    :param plugin: plugin to enable in daemons
+    :param start: launch the daemons that aren't already listening
+    """
+
+    def __init__(self, size=2, base_port=DAEMON_PORT + 1, plugin='', start=True):
+        self.processes = []
+        self.idle = queue.Queue()
+        for port in range(base_port, base_port + size):
+            if start and not is_listening(port=port):
+                self.processes.append(start_daemon(port=port, plugin=plugin))
+            self.idle.put(KatajaClient(port=port))
+        self.executor = ThreadPoolExecutor(max_workers=size)
+
+    def _call(self, method, *args, **kwargs):
+        client = self.idle.get()
+        try:
+            return getattr(client, method)(*args, **kwargs)
+        finally:
+            self.idle.put(client)
+
+    def submit_render(self, tree, fmt='png'):
+        """ :return: concurrent.futures.Future for image bytes """
+        return self.executor.submit(self._call, 'render', tree, fmt=fmt)
+
+    def submit_parse(self, tree):
+        """ :return: concurrent.futures.Future for parse results """
+        return self.executor.submit(self._call, 'parse', tree)
+
+    def render(self, tree, fmt='png'):
+        return self.submit_render(tree, fmt=fmt).result()
+
+    def parse(self, tree):
+        return self.submit_parse(tree).result()
+
+    def map_render(self, trees, fmt='png'):
+        """ Render many trees concurrently, results are in the same order as trees. """
+        return [future.result() for future in [self.submit_render(tree, fmt=fmt) for tree in trees]]
+
+    def close(self):
+        self.executor.shutdown()
+        while not self.idle.empty():
+            self.idle.get().close()
+        for process in self.processes:
+            process.terminate()
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+_default_client = None
+
+
+def get_client(port=DAEMON_PORT, plugin=''):
+    """ Return shared client for the daemon in given port, start the daemon if necessary. """
+    global _default_client
+    if _default_client and _default_client.port == port:
+        return _default_client
+    if not is_listening(port=port):
+        start_daemon(port=port, plugin=plugin)
+    _default_client = KatajaClient(port=port)
+    return _default_client
+
+
+def render(tree, fmt='png', port=DAEMON_PORT):
+    """ Draw tree with a warm Kataja daemon and return image bytes. """
+    return get_client(port=port).render(tree, fmt=fmt)
+
+
+def parse(tree, port=DAEMON_PORT):
+    """ Build the tree with a warm Kataja daemon and return the trees as bracket strings. """
+    return get_client(port=port).parse(tree)
@@ -143,6 +143,35 @@ NONE = 0
 HIDE_UNJUSTIFIED_EDGES = 1
 
 
+# Settings that don't affect labels, sizes or shapes of nodes. Changing any other setting makes
+# Forest.draw update all nodes. Every default setting has to belong to one of these sets or to
+# NODE_SETTINGS, tests/test_forest_settings.py checks this.
+GLOSS_SETTINGS = frozenset({'gloss_strategy'})
+PAINT_AND_UI_SETTINGS = frozenset({
+    'color_theme', 'hsv', 'color_key', 'last_key_colors', 'custom_colors', 'custom_themes',
+    'thickness_multiplier', 'projection_highlights', 'highlight_dominated_nodes_on_selection',
+    'glow_effect', 'move_effect', 'move_frames', 'curve', 'fps_in_msec', 'touch', 'large_ui_text',
+    'auto_pan_select', 'zoom_to_center', 'single_click_editing', 'dpi', 'print_format',
+    'print_file_name', 'animation_file_name', 'animation_width', 'animation_height',
+    'animation_skip_frames', 'animation_gif', 'animation_webp', 'animation_max_frames',
+    'include_gloss_to_print', 'undo_memory_budget', 'compress_undo', 'userspace_path',
+    'plugins_path', 'log_level', 'tab_order', 'low_detail_zoom', 'profiling', 'FPS',
+    'active_plugin_name', 'available_styles', 'save_key', 'version'})
+LAYOUT_SETTINGS = frozenset({
+    'visualization', 'edge_visibility_rule', 'edge_width', 'edge_height', 'spacing_between_trees',
+    'linearization_mode', 'left_first_rotation', 'use_magnets', 'hide_edges_if_nodes_overlap',
+    'binary_branching', 'shape_name', 'pull', 'fixed_dx', 'fixed_dy', 'rel_dx', 'rel_dy',
+    'leaf_x', 'leaf_y', 'fill', 'outline', 'thickness'})
+# Settings that change how nodes or edges look or what they contain. Forest.draw doesn't need this,
+# as unknown settings are treated the same way, but it keeps the classification complete.
+NODE_SETTINGS = frozenset({
+    'style', 'syntactic_mode', 'nodes', 'edges', 'fonts', 'cn_shape', 'feature_nodes',
+    'feature_positioning', 'feature_check_display', 'gloss_nodes', 'lock_glosses_to_label',
+    'label_text_mode', 'show_node_labels', 'show_semantics', 'trace_strategy', 'visible',
+    'font', 'font_id', 'font-size', 'arrowheads', 'start_connects_to', 'end_connects_to',
+    'z_value'})
+
+
 class ViewUpdateReason(Enum):
     """ Reasons for updating viewport """
     NEW_FOREST = 0
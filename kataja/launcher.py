@@ -1,7 +1,7 @@
 """
 
 usage: __main__.py [-h] [--reset_prefs] [--no_prefs] [-image_out IMAGE_OUT]
-                   [-plugin PLUGIN]
+                   [-plugin PLUGIN] [--daemon] [-port PORT]
                    [tree]
 
 Launch Kataja visualisation environment.
@@ -16,6 +16,8 @@ optional arguments:
   -image_out IMAGE_OUT  draw tree into given file (name.pdf or name.png) and
                         exit
   -plugin PLUGIN        start with the given plugin (default: 'FreeDrawing'
+  --daemon              run without window and serve render requests from kataja.client
+  -port PORT            port for receiving trees from scripts (default: 62236)
 
 or
 import kataja
@@ -29,6 +31,12 @@ kataja.draw(tree, image_out="kataja_tree.pdf", **kwargs])
 
 Draw tree into file and exit kataja
 
+or
+import kataja
+kataja.serve(port=62237, **kwargs)
+
+Run Kataja as a headless daemon for kataja.client
+
 """
 import argparse
 import datetime
@@ -38,6 +46,7 @@ import sys
 from PyQt6 import QtWidgets, QtCore
 
 import kataja
+from kataja.IngestionServer import PORT
 from kataja.singletons import running_environment, log
 
 
@@ -89,10 +98,14 @@ def launch_from_command_line():
                         help="draw tree into given file (name.pdf or name.png) and exit")
     parser.add_argument('-plugin', type=str, default='',
                         help="start with the given plugin")
+    parser.add_argument('--daemon', action='store_true', default=False,
+                        help="run without window and serve render requests from kataja.client")
+    parser.add_argument('-port', type=int, default=PORT,
+                        help=f"port for receiving trees from scripts (default: {PORT})")
     parser.add_argument('tree', type=str, nargs='?',
                         help='bracket tree or source tree filename')
     kwargs = vars(parser.parse_args())
-    silent = True if kwargs['image_out'] else False
+    silent = True if kwargs['image_out'] or kwargs['daemon'] else False
     print(f"Launching Kataja {kataja.__version__} with Python {sys.version_info.major}.{sys.version_info.minor}")
     app = prepare_app()
     log.info('Starting Kataja...')
@@ -144,6 +157,16 @@ def draw(tree, image_out='kataja_tree.pdf', **kwargs):
     app.exec_()
 
 
+def serve(port=PORT, **kwargs):
+    """ Run Kataja as a headless daemon that keeps plugins and lexicons loaded and answers
+    render and parse requests. See kataja.client. """
+    from kataja.KatajaMain import KatajaMain
+    app = prepare_app()
+    KatajaMain(app, daemon=True, port=port, **kwargs)
+    app.processEvents()
+    app.exec()
+
+
 def prepare_app():
     app = QtWidgets.QApplication(sys.argv)
     #app.setAttribute(QtCore.Qt.ApplicationAttribute.AA_UseHighDpiPixmaps)
@@ -1,5 +1,6 @@
 from html.parser import HTMLParser
 
+from kataja.parser.INodeCache import inode_cache
 from kataja.parser.INodes import ITextNode, ICommandNode
 from kataja.parser.mappings import html_to_command
 
@@ -51,12 +52,22 @@ class HTMLToINode(HTMLParser):
         self.current.append(data)
 
     def process(self, string):
+        """ Parse string, or return the shared INodes from earlier parse of the same string.
+        :param string: str
+        :return: ITextNode, or list of rows in rows_mode. Don't modify the INodes.
+        """
+        if self.rows_mode:
+            return inode_cache.get('html_rows', string, self._process)
+        return inode_cache.get('html', string, self._process)
+
+    def _process(self, string):
         self.feed(string)
         result = self.current
         self.reset()
         if self.rows_mode:
-            self.rows.append(result)
-            return self.rows
+            rows = self.rows + [result]
+            self.rows = []
+            return rows
         else:
             return result
 
@@ -0,0 +1,97 @@
+# -*- coding: UTF-8 -*-
+# ############################################################################
+#
+# *** Kataja - Biolinguistic Visualization tool ***
+#
+# Copyright 2013 Jukka Purma
+#
+# This file is part of Kataja.
+#
+# Kataja is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Kataja is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kataja.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ############################################################################
+
+import sys
+from collections import OrderedDict
+
+from kataja.parser.INodes import ITextNode, ICommandNode
+
+MAX_ENTRIES = 4096
+
+
+class INodeCache:
+    """ Shared cache of parsed label texts. The same strings -- 'NP', 'D', '[uCase]', feature
+    names -- are parsed over and over again when trees are parsed, undo states restored and
+    derivation steps inflated. Results are kept by parse mode and source string in least recently
+    used order, and the same text returns the same INode, so nodes with identical labels share one
+    structure. Strings inside results are interned.
+
+    Shared INodes must not be modified: functions that edit labels (join_lines, removing dot
+    labels etc.) build new INodes instead. Rows are returned as new lists each time, the rows in
+    them are shared.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+
+    def clear(self):
+        self._results.clear()
+
+    def get(self, mode, source, parse):
+        """ Return cached parse result for source, or parse it and store the result.
+        :param mode: str, parse mode, e.g. 'latex_rows', different modes give different results
+        :param source: str (or other hashable) given to parse function
+        :param parse: function(source) -> INode, str or list of them
+        :return: INode, str or list
+        """
+        key = mode, source
+        result = self._results.get(key)
+        if result is None:
+            self.misses += 1
+            result = parse(source)
+            if isinstance(result, list):
+                result = tuple(intern_inode(row) for row in result)
+            else:
+                result = intern_inode(result)
+            self._results[key] = result
+            if len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        else:
+            self.hits += 1
+            self._results.move_to_end(key)
+        if isinstance(result, tuple):
+            return list(result)
+        return result
+
+
+def intern_inode(item):
+    """ Intern strings in INode tree so that identical label parts share memory.
+    :param item: INode or str
+    :return: the same INode, or interned str
+    """
+    if isinstance(item, str):
+        return sys.intern(item)
+    elif isinstance(item, ITextNode):
+        item.parts = [intern_inode(part) for part in item.parts]
+        if isinstance(item, ICommandNode):
+            item.command = sys.intern(item.command)
+        if hasattr(item, 'label_rows'):
+            item.label_rows = [intern_inode(row) for row in item.label_rows]
+    return item
+
+
+inode_cache = INodeCache()
@@ -1,3 +1,4 @@
+import copy
 import html
 
 from kataja.parser.latex_to_unicode import latex_to_unicode
@@ -92,12 +93,15 @@ def as_text(item, omit_triangle=False, omit_index=False, omit_outmost=False, sin
         return s
 
 
-def extract_triangle(item, remove_from_original=False):
+def extract_triangle(item):
+    """ Find the triangle (qroof) part of label. Item is not modified, as parsed labels are
+    shared, see INodeCache.
+    :param item: INode or str
+    :return: ICommandNode or None
+    """
     if isinstance(item, ITextNode):
-        for part in list(item.parts):
+        for part in item.parts:
             if isinstance(part, ICommandNode) and part.command == 'qroof':
-                if remove_from_original:
-                    item.parts.remove(part)
                 return part
             found = extract_triangle(part)
             if found:
@@ -108,6 +112,7 @@ def join_lines(lines):
     """ Flatten rows of label into one string/ITextNode/ICommandNode
     It gets bit complicated, because str+ITextNode, str+str, ITextNode+ITextNode and
     ICommandNode + ... all need different ways to join them. This is reverse to INode's splitlines.
+    Rows are not modified, they may be shared parse results.
     :param lines: list of INodes and/or strings
     :return: INode or str 
     """
@@ -127,25 +132,20 @@ def join_lines(lines):
                         last_row = ITextNode(parts=[row, '\n', last_row])
                     # commandnode + textnode
                     else:
-                        last_row.parts = [row, '\n'] + last_row.parts
+                        last_row = ITextNode(parts=[row, '\n'] + last_row.parts)
                 elif isinstance(row, ITextNode):
                     # textnode + commandnode, textnode + str
                     if isinstance(last_row, ICommandNode) or isinstance(last_row, str):
-                        row.parts.append('\n')
-                        row.parts.append(last_row)
-                        last_row = row
+                        last_row = ITextNode(parts=row.parts + ['\n', last_row])
                     # textnode + textnode
                     else:
-                        row.parts.append('\n')
-                        row.parts += last_row.parts
-                        last_row = row
+                        last_row = ITextNode(parts=row.parts + ['\n'] + last_row.parts)
                 # str + commandnode
                 elif isinstance(last_row, ICommandNode):
-                    row = ITextNode(parts=[row, '\n', last_row])
-                    last_row = row
+                    last_row = ITextNode(parts=[row, '\n', last_row])
                 # str + textnode
                 elif isinstance(last_row, ITextNode):
-                    last_row.parts = [row, '\n'] + last_row.parts
+                    last_row = ITextNode(parts=[row, '\n'] + last_row.parts)
                 # str + str
                 else:
                     last_row = row + '\n' + last_row
@@ -235,29 +235,43 @@ class ITextNode:
     def startswith(self, s):
         return self.parts and self.parts[0].startswith(s)
 
+    def copy_with_parts(self, parts):
+        """ Shallow copy of this node (of the same class) with given parts. Parsed INodes are
+        shared between labels (see INodeCache), so methods that change them return copies.
+        :param parts: list
+        :return: INode
+        """
+        new = copy.copy(self)
+        new.parts = parts
+        return new
+
     def remove_prefix(self, s):
-        if self.parts:
-            p = self.parts[0]
+        """ :return: copy of this node without prefix s """
+        parts = list(self.parts)
+        if parts:
+            p = parts[0]
             if isinstance(p, ITextNode):
-                p.remove_prefix(s)
+                parts[0] = p.remove_prefix(s)
             elif p.startswith(s):
-                self.parts[0] = p[len(s):]
+                parts[0] = p[len(s):]
+        return self.copy_with_parts(parts)
 
     def find_and_remove_part(self, part):
         """ Recursively search and remove part
         :param part: INode or str
-        :return:
+        :return: copy of this node without the part
         """
         if part in self.parts:
-            self.remove(part)
+            parts = list(self.parts)
+            parts.remove(part)
         else:
-            for p in self.parts:
-                if isinstance(p, ITextNode):
-                    p.find_and_remove_part(part)
+            parts = [p.find_and_remove_part(part) if isinstance(p, ITextNode) else p
+                     for p in self.parts]
+        return self.copy_with_parts(parts)
 
     def tidy(self, keep_node=True):
         """ Join string parts into continuous strings when possible, just to
-        help readability
+        help readability. Returns a tidied copy, this node is not modified.
         :return:
         """
         merged_parts = []
@@ -277,18 +291,18 @@ class ITextNode:
                 merged_parts.append(part)
         if current_section:
             merged_parts.append(''.join(current_section))
-        self.parts = merged_parts
+        new = self.copy_with_parts(merged_parts)
         if keep_node:
-            return self
+            return new
         else:
             if plain_string:
-                return str(self)
-            elif not self.parts:
+                return str(new)
+            elif not new.parts:
                 return ''
-            elif len(self.parts) == 1:
-                return self.parts[0]
+            elif len(new.parts) == 1:
+                return new.parts[0]
             else:
-                return self
+                return new
 
     def splitlines(self):
         """ This is shallow splitline, it doesn't go inside other INodes to look for linebreaks
@@ -552,7 +566,7 @@ class ICommandNode(ITextNode):
                     s.append(str(part))
 
     def tidy(self, keep_node=True):
-        """ Tidy insides, but always maintain identity so that the command remains even if it has
+        """ Tidy insides, but always keep the node so that the command remains even if it has
         empty scope
         :param keep_node:
         :return:
@@ -653,7 +667,7 @@ class IParserNode(ITextNode):
                     break
 
     def tidy(self, keep_node=True):
-        """ Tidy insides, but always maintain identity so that the template node remains even if it
+        """ Tidy insides, but always keep the node so that the template node remains even if it
         has empty scope
         :param keep_node:
         :return:
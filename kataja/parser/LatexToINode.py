@@ -6,6 +6,7 @@
 # This module can be run and tested as it is,
 # from kataja.utils import time_me
 
+from kataja.parser.INodeCache import inode_cache
 from kataja.parser.INodes import ICommandNode, ITextNode
 from kataja.parser.mappings import latex_to_command
 
@@ -31,6 +32,15 @@ class LatexToINode:
         self.rows_mode = rows_mode
 
     def process(self, string):
+        """ Parse string, or return the shared INodes from earlier parse of the same string.
+        :param string: str
+        :return: INode or str, or list of rows in rows_mode. Don't modify the INodes.
+        """
+        if self.rows_mode:
+            return inode_cache.get('latex_rows', string, self._process)
+        return inode_cache.get('latex', string, self._process)
+
+    def _process(self, string):
         self.feed = list(string)
         self.feed.reverse()
         self.nodes = []
@@ -60,7 +70,7 @@ class LatexToINode:
                 new_node = self.parse_command()
                 if return_rows and isinstance(new_node, ICommandNode) and new_node.command == 'br':
                     # fixme: doesn't handle if some style scope continues across line break
-                    rows.append(node)
+                    rows.append(node.tidy(keep_node=False))
                     node = ITextNode()
                 else:
                     node.append(new_node)
@@ -232,9 +242,15 @@ class LatexFieldToINode(LatexToINode):
     def process(self, text):
         """ Simpler version of parse, turns values of text elements into INodes
         (intermediary nodes).  Results are ITextNodes that may contain more
-        ITextNodes and ICommandNodes.
+        ITextNodes and ICommandNodes. Results are shared between identical texts, don't
+        modify them.
             :param text: string to parse.
         """
+        if not text:
+            return ""
+        return inode_cache.get('latex_field', text, self._process)
+
+    def _process(self, text):
         # print('LatexFieldToINode called with "%s"' % text)
         self.math_mode = False
         self.node = None
@@ -1,3 +1,4 @@
+from kataja.parser.INodeCache import inode_cache
 from kataja.parser.INodes import ITextNode, ICommandNode
 
 
@@ -8,6 +9,16 @@ class QDocumentToINode:
 
     @staticmethod
     def process(doc):
+        """ Parse document, or return the shared INodes from earlier parse of a document with
+        the same html. Don't modify the INodes.
+        :param doc: QTextDocument
+        :return: INode or str
+        """
+        return inode_cache.get('qdocument', doc.toHtml(),
+                               lambda html: QDocumentToINode._process(doc))
+
+    @staticmethod
+    def _process(doc):
 
         def removed(stack, command):
             for item in reversed(stack):
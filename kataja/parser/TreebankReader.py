@@ -0,0 +1,226 @@
+# -*- coding: UTF-8 -*-
+# ############################################################################
+#
+# *** Kataja - Biolinguistic Visualization tool ***
+#
+# Copyright 2013 Jukka Purma
+#
+# This file is part of Kataja.
+#
+# Kataja is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Kataja is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Kataja.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ############################################################################
+
+import os
+from array import array
+
+TREEBANK_EXTENSIONS = ('.mrg', '.ptb')
+SNIFF_LINES = 20
+BRACKETS = {b'(': b')', b'[': b']'}
+
+
+class TreebankReader:
+    """ Streaming reader for bracketed treebank files: Penn Treebank style .mrg files where a tree
+    can span several lines, or files with one tree per line. The file is read line by line as
+    bytes, and a tree is a run of lines from the line where a bracket opens at depth 0 to the line
+    where brackets are balanced again. Lines outside trees (comments, '*x*' headers) are skipped.
+
+    scan() walks the file once and records the byte offsets of each tree, so afterwards any tree
+    can be read by seeking into the file without keeping the file or its trees in memory.
+    Brackets in PTB words are escaped as -LRB- etc., so counting brackets is enough to find trees.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.starts = array('q')  # byte offsets where trees start
+        self.ends = array('q')  # and where they end
+
+    def __len__(self):
+        return len(self.starts)
+
+    @staticmethod
+    def is_treebank(filename) -> bool:
+        """ Treebank files either have a known extension or start with a '(' -bracketed tree.
+        Kataja's own tree files use '[' and may have definitions and glosses between trees.
+        :param filename: path
+        :return: bool
+        """
+        if os.path.splitext(filename)[1].lower() in TREEBANK_EXTENSIONS:
+            return True
+        try:
+            with open(filename, 'rb') as f:
+                for i, line in enumerate(f):
+                    line = line.strip()
+                    if line and not line.startswith(b'#'):
+                        return line.startswith(b'(')
+                    if i > SNIFF_LINES:
+                        break
+        except (FileNotFoundError, IsADirectoryError):
+            pass
+        return False
+
+    def records(self):
+        """ Read the file and yield trees one at a time.
+        :return: generator of (start offset, end offset, tree as bytes)
+        """
+        depth = 0
+        start = 0
+        offset = 0
+        lines = []
+        opening = closing = b''
+        with open(self.filename, 'rb') as f:
+            for line in f:
+                line_start = offset
+                offset += len(line)
+                if not depth:
+                    stripped = line.lstrip()
+                    opening = stripped[:1]
+                    if opening not in BRACKETS:
+                        continue
+                    closing = BRACKETS[opening]
+                    start = line_start + len(line) - len(stripped)
+                    lines = []
+                lines.append(line)
+                depth += line.count(opening) - line.count(closing)
+                if depth <= 0:
+                    depth = 0
+                    tree = b''.join(lines).strip()
+                    yield start, start + len(tree), tree
+            if depth and lines:
+                # unbalanced tree at the end of file, let the parser deal with it
+                tree = b''.join(lines).strip()
+                yield start, start + len(tree), tree
+
+    def scan(self) -> int:
+        """ Find where trees are in the file.
+        :return: number of trees
+        """
+        self.starts = array('q')
+        self.ends = array('q')
+        for start, end, tree in self.records():
+            self.starts.append(start)
+            self.ends.append(end)
+        return len(self.starts)
+
+    def read(self, i) -> str:
+        """ Read one tree from the file, with the tree's line breaks and indentation collapsed
+        into single spaces.
+        :param i: index of tree
+        :return: str
+        """
+        start = self.starts[i]
+        end = self.ends[i]
+        with open(self.filename, 'rb') as f:
+            f.seek(start)
+            tree = f.read(end - start)
+        return ' '.join(tree.decode('utf-8', errors='replace').split())
+
+
+class LazyForestList(list):
+    """ List of forests where forests for treebank trees are built only when they are accessed,
+    e.g. when navigated to. Until then the list keeps only the index of the tree in the
+    TreebankReader. Forests can be inserted into list as usual.
+
+    It is a list so that saving and undo treat it like any list of forests, and every method
+    that gives out items is overridden to build them. Iterating, sorting, copying into a plain
+    list and comparing with a plain list build all of the forests, so use len() and indexing
+    where possible.
+    :param reader: TreebankReader that has scanned its file
+    :param build_forest: function(tree as str) -> Forest
+    """
+
+    def __init__(self, reader, build_forest):
+        super().__init__(range(len(reader)))
+        self.reader = reader
+        self.build_forest = build_forest
+
+    def _new(self, items):
+        new = LazyForestList.__new__(LazyForestList)
+        list.extend(new, items)
+        new.reader = self.reader
+        new.build_forest = self.build_forest
+        return new
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        item = list.__getitem__(self, i)
+        if isinstance(item, int):
+            item = self.build_forest(self.reader.read(item))
+            list.__setitem__(self, i, item)
+        return item
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __reversed__(self):
+        for i in range(len(self) - 1, -1, -1):
+            yield self[i]
+
+    # Unbuilt items are ints and forests are never equal to them, so searching for a forest
+    # doesn't need to build anything: __contains__, count, index and remove work as they are.
+
+    def pop(self, i=-1):
+        item = self[i]
+        list.pop(self, i)
+        return item
+
+    def sort(self, *, key=None, reverse=False):
+        list.__setitem__(self, slice(None), sorted(self, key=key, reverse=reverse))
+
+    def __eq__(self, other):
+        """ Lists from the same reader are compared without building forests: unbuilt items
+        are equal if they are the same tree. Comparing with other lists builds the forests. """
+        if not isinstance(other, list):
+            return NotImplemented
+        if len(self) != len(other):
+            return False
+        if isinstance(other, LazyForestList) and other.reader is self.reader:
+            return list.__eq__(self, other)
+        return all(a == b for a, b in zip(self, other))
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __add__(self, other):
+        new = self.__copy__()
+        new.extend(other)
+        return new
+
+    def __radd__(self, other):
+        new = self._new(other)
+        list.extend(new, list.__iter__(self))
+        return new
+
+    def __mul__(self, n):
+        return self._new(list.__mul__(self, n))
+
+    __rmul__ = __mul__
+
+    def __copy__(self):
+        return self._new(list.__iter__(self))
+
+    def copy(self):
+        return self.__copy__()
+
+    def __repr__(self):
+        return f'LazyForestList({len(self)} forests, {len(self.built_forests())} built)'
+
+    def built_forests(self) -> list:
+        """ :return: forests that have been built so far """
+        return [item for item in list.__iter__(self) if not isinstance(item, int)]
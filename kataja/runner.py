@@ -5,6 +5,9 @@ import subprocess
 # This is an example for using Kataja to launch a visualisation from a python script that doesn't use kataja
 # structures, but can output bracket trees. Kataja is launched as a separate process so it doesn't stop the
 # main script.
+#
+# If you draw many trees into files, launching Kataja for each of them is slow. Use a Kataja daemon instead,
+# see render_with_daemon below and kataja/client.py.
 
 
 def send_to_kataja(tree, image_file=''):
@@ -23,6 +26,14 @@ def send_to_kataja(tree, image_file=''):
     # python Kataja.py -image_out test.pdf "[ [ A {word} ] [.T did [.V happen ] ] ]"
 
 
+def render_with_daemon(tree, image_file):
+    """ Draw tree into image_file with a headless Kataja that stays running between calls. """
+    from kataja.client import render
+    fmt = 'png' if image_file.endswith('.png') else 'pdf'
+    with open(image_file, 'wb') as f:
+        f.write(render(tree, fmt=fmt))
+
+
 # tree = """[.{CP} [.{DP(0)} [.{D'} [.{D} which ] [.{NP} [.{N'} [.N wine ] ] ] ] ] [.{C'} [.C \epsilon [.{VP} [.{DP} [.{D'} [.D the ] [.{NP} [.{N'} [.N queen ] ] ] ] ] [.{V'} [.V prefers ] [.{DP} t(0) ] ] ] ] ] ]
 # """
 
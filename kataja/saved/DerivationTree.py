@@ -123,7 +123,10 @@ class DerivationTree(SavedObject):
     def restore_derivation_step(self):
         d_step = self.get_derivation_step_by_id(self.current_step_id)
         if d_step:
-            syntactic_state_to_nodes(self.forest, d_step.to_syn_state())
+            # scene insertions, removals and fades are applied together when the batch ends
+            with self.forest.drawing.batch():
+                syntactic_state_to_nodes(self.forest, d_step.to_syn_state())
+            self.forest.mark_all_dirty()
             if d_step.msg:
                 log.info(f'<b>msg: {d_step.msg}</b>')
             for log_msg in d_step.log:
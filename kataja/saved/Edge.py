@@ -594,6 +594,14 @@ class Edge(QtWidgets.QGraphicsObject, SavedObject, FadeInOut):
     # ## Qt paint method override
     def paint(self, painter, option, widget=None):
         c = self.contextual_color()
+        if ctrl.view_manager.low_detail:
+            # zoomed far out: hairline along the inner path, no thickness, fill or arrowheads
+            p = QtGui.QPen(c)
+            p.setCosmetic(True)
+            painter.setPen(p)
+            if self.path.true_path:
+                painter.drawPath(self.path.true_path)
+            return
         sx, sy = self.start_point
         ex, ey = self.end_point
         if self.path.use_simple_path:
@@ -778,10 +786,14 @@ class Edge(QtWidgets.QGraphicsObject, SavedObject, FadeInOut):
     #                #
     # ############## #
 
+    def _end_point_changed(self, value):
+        if self.forest:
+            self.forest.topology_index.invalidate()
+
     # Saved properties
     edge_type = SavedField("edge_type")
     curve_adjustment = SavedField("curve_adjustment")
-    start = SavedField("start")
-    end = SavedField("end")
+    start = SavedField("start", if_changed=_end_point_changed)
+    end = SavedField("end", if_changed=_end_point_changed)
     origin = SavedField("origin")
     forest = SavedField("forest")
@@ -23,15 +23,17 @@
 # ############################################################################
 import itertools
 
-from PyQt6 import QtWidgets
+from PyQt6 import QtCore, QtWidgets
 
 import kataja.globals as g
 from kataja.ChainManager import ChainManager
 from kataja.ForestDrawing import ForestDrawing
+from kataja.Profiler import profiler
 from kataja.ProjectionManager import ProjectionManager
 from kataja.SavedField import SavedField
 from kataja.SavedObject import SavedObject
 from kataja.SemanticsManager import SemanticsManager
+from kataja.TopologyIndex import TopologyIndex
 from kataja.Triangle import Triangle
 from kataja.UndoManager import UndoManager
 from kataja.globals import ViewUpdateReason
@@ -41,8 +43,13 @@ from kataja.saved.Edge import Edge
 from kataja.saved.movables.Arrow import Arrow
 from kataja.saved.movables.Node import Node
 from kataja.settings.ForestSettings import ForestSettings
-from kataja.singletons import ctrl, classes
+from kataja.singletons import ctrl, classes, prefs
 from kataja.syntax.SyntaxState import SyntaxState
+from kataja.utils import timed
+
+# Settings that don't affect labels, sizes or shapes of nodes, see kataja.globals
+NOT_FOR_NODES = g.GLOSS_SETTINGS | g.PAINT_AND_UI_SETTINGS | g.LAYOUT_SETTINGS
+NOT_FOR_LAYOUT = g.GLOSS_SETTINGS | g.PAINT_AND_UI_SETTINGS
 
 
 class Forest(SavedObject):
@@ -92,6 +99,8 @@ class Forest(SavedObject):
         self.vis_data = {}
         self.width_map = {}
         self.traces_to_draw = {}
+        self.topology_index = TopologyIndex(self)
+        self.halo_nodes = set()  # nodes that show a halo, kept up to date by Node.toggle_halo
         self.comments = []
         self.heading_text = heading_text
         self.ongoing_animations = set()
@@ -102,6 +111,8 @@ class Forest(SavedObject):
         # Update request flags
         self._do_edge_visibility_check = False
         self._do_recalculate_relative_positions = False
+        self._draw_everything = True
+        self._culled_edges = set()
 
     def init_factories(self):
         """ Some initialisations are postponed to when the forest is selected for
@@ -161,11 +172,13 @@ class Forest(SavedObject):
         :return: None
         """
         self.in_display = True
+        self.mark_all_dirty()
         ctrl.disable_undo()
         self.connect_main()
         if not self.is_parsed:
             self.init_factories()
-            self.syntax.create_derivation(forest=self, lexicon=ctrl.document.lexicon)
+            with timed('parse'):
+                self.syntax.create_derivation(forest=self, lexicon=ctrl.document.lexicon)
             self.derivation_tree.update_dimensions()
             self.after_model_update('nodes', 0)
             self.is_parsed = True
@@ -218,10 +231,12 @@ class Forest(SavedObject):
         self.groups = {}
         self.arrows = {}
         self.others = {}
+        self.halo_nodes = set()
         self.width_map = {}
         self.traces_to_draw = {}
         self.comments = []
         self.heading_text = ''
+        self.mark_all_dirty()
 
     def forest_edited(self):
         """ Called after forest editing/free drawing actions that have changed the node graph.
@@ -278,6 +293,7 @@ class Forest(SavedObject):
             self.visualization = vs.get(name, vs.get(self.settings.get('visualization'), None))
             self.vis_data = {'name': self.visualization.say_my_name()}
             self.visualization.prepare(self)
+        self.mark_all_dirty()
         ctrl.view_manager.update_viewport(ViewUpdateReason.MAJOR_REDRAW)
 
     def restore_visualization(self):
@@ -287,6 +303,7 @@ class Forest(SavedObject):
             if v:
                 self.visualization = v
                 v.prepare(self, reset=False)
+                self.mark_all_dirty()
                 ctrl.view_manager.update_viewport(ViewUpdateReason.MAJOR_REDRAW)
 
     def update_visualization(self):
@@ -485,8 +502,73 @@ class Forest(SavedObject):
                 ctrl.remove_from_selection(item)
         ctrl.multiselection_end()
 
+    def mark_all_dirty(self):
+        """ Make next draw() update every node and edge and redo the layout. Use this after
+        changes that don't go through saved fields, e.g. switching forests or visualizations.
+        """
+        self._draw_everything = True
+        self.topology_index.invalidate()
+
+    @staticmethod
+    def mark_dirty(item):
+        """ Make next draw() update this node or edge. Changes to saved fields are noticed
+        without this.
+        """
+        ctrl.changed_objects.add(item)
+
+    def collect_changes(self):
+        """ Sort objects and settings that have changed since last draw into what concerns this
+        forest.
+        :return: (changed nodes, changed edges, changed settings keys, if other parts of forest
+        have changed)
+        """
+        changed = ctrl.changed_objects
+        ctrl.changed_objects = set()
+        settings = prefs.pop_changed_settings()
+        nodes = set()
+        edges = set()
+        other_changes = False
+        if changed and not self.nodes_from_synobs:
+            self.rebuild_synobj_dict()
+        for item in changed:
+            uid = item.uid
+            if isinstance(item, Node):
+                if self.nodes.get(uid) is item:
+                    nodes.add(item)
+            elif isinstance(item, Edge):
+                if self.edges.get(uid) is item:
+                    edges.add(item)
+                    if item.start:
+                        nodes.add(item.start)
+                    if item.end:
+                        nodes.add(item.end)
+            elif uid in self.nodes_from_synobs:
+                nodes.add(self.nodes_from_synobs[uid])
+            else:
+                other_changes = True
+        return nodes, edges, settings, other_changes
+
+    def with_ancestors(self, nodes):
+        """ Nodes and all of their parents up to the tops of the trees. Labels, bounding rects and
+        triangles of parents depend on their children.
+        :param nodes: set of nodes
+        :return: set of nodes
+        """
+        result = set()
+        todo = list(nodes)
+        while todo:
+            node = todo.pop()
+            if node not in result:
+                result.add(node)
+                todo += node.get_parents()
+        return result
+
     def draw(self, start_animations=False):
-        """ Update all trees in the forest according to current visualization
+        """ Update all trees in the forest according to current visualization.
+
+        Only the stages whose inputs have changed since the last draw are run. Nodes and edges
+        that have changed are found through ctrl.changed_objects and changed settings through
+        prefs. Each stage is timed with utils.timed, use utils.add_timing_hook to see them.
         """
         if self.halt_drawing:
             print('halt drawing is on')
@@ -494,51 +576,92 @@ class Forest(SavedObject):
         if not self.in_display:
             print("Why are we drawing a forest which shouldn't be in scene")
             return
-        self.update_feature_ordering()
-        self.update_forest_gloss()
-        self.update_constituent_node_shapes()
-        if self.visualization:
-            self.visualization.prepare_draw()
-            self.free_movers = self.visualization.has_free_movers()
-            left_nodes = set()
-            for tree_top in self.trees:
-                self.visualization.draw_tree(tree_top)
-                self.visualization.normalise_to_origo(tree_top)
-                self.visualization.estimate_overlap_and_shift_tree(tree_top, left_nodes)
-            # keep everything centered to minimise movement between steps
-            # cp = ctrl.view_manager.center()
-            # print('current center point: ', cp)
-            # self.free_movers = self.visualization.normalise_all(-cp.x(), -cp.y())
-            ctrl.view_manager.predictive = not self.free_movers
-
-        self.chain_manager.after_draw_update()
-        self.recalculate_positions_relative_to_nodes()
-        ctrl.view_manager.update_viewport(ViewUpdateReason.MAJOR_REDRAW)
-        if start_animations or True:
-            ctrl.graph_scene.start_animations()
-        ctrl.graph_view.resetCachedContent()
-        ctrl.graph_view.repaint()
-
-    def move_nodes(self, heat) -> bool:
+        nodes, edges, settings, other_changes = self.collect_changes()
+        everything = self._draw_everything
+        self._draw_everything = False
+        all_nodes = everything or bool(settings - NOT_FOR_NODES)
+        if all_nodes:
+            nodes = None
+        elif nodes:
+            nodes = self.with_ancestors(nodes)
+        redo_layout = bool(all_nodes or nodes or edges or other_changes or
+                           settings - NOT_FOR_LAYOUT)
+
+        if nodes is None or nodes or edges:
+            with timed('draw.feature_ordering'):
+                self.update_feature_ordering(nodes)
+        if nodes is None or nodes or edges or settings & g.GLOSS_SETTINGS:
+            with timed('draw.gloss'):
+                self.update_forest_gloss()
+        if nodes is None or nodes:
+            with timed('draw.node_shapes'):
+                self.update_constituent_node_shapes(nodes)
+        if self.visualization and redo_layout:
+            with timed('draw.visualization'):
+                self.visualization.prepare_draw()
+                self.free_movers = self.visualization.has_free_movers()
+                left_nodes = set()
+                for tree_top in self.trees:
+                    with timed('visualization.draw_tree'):
+                        self.visualization.draw_tree(tree_top)
+                    self.visualization.normalise_to_origo(tree_top)
+                    self.visualization.estimate_overlap_and_shift_tree(tree_top, left_nodes)
+                # keep everything centered to minimise movement between steps
+                # cp = ctrl.view_manager.center()
+                # print('current center point: ', cp)
+                # self.free_movers = self.visualization.normalise_all(-cp.x(), -cp.y())
+                ctrl.view_manager.predictive = not self.free_movers
+
+        with timed('draw.chains'):
+            self.chain_manager.after_draw_update()
+        with timed('draw.relative_positions'):
+            self.recalculate_positions_relative_to_nodes()
+        # changes made by drawing itself, e.g. new target positions, are not news for next draw
+        ctrl.changed_objects = set()
+        with timed('draw.viewport'):
+            ctrl.view_manager.update_viewport(ViewUpdateReason.MAJOR_REDRAW)
+            if start_animations or True:
+                ctrl.graph_scene.start_animations()
+            ctrl.graph_view.resetCachedContent()
+            ctrl.graph_view.repaint()
+        profiler.set_counter('nodes', len(self.nodes))
+        profiler.set_counter('edges', len(self.edges))
+
+    def move_nodes(self, heat, physics_only=False, part=0, parts=1, update=True) -> tuple:
         """ Animate nodes one tick toward their next position, or compute the next
         position in dynamic visualisation. Update edges and other forest elements that
-         are drawn relative to node positions.
-        :return:
+        are drawn relative to node positions. See PhysicsScheduler for how the ticks are run.
+        :param heat: strength of physics forces for this step
+        :param physics_only: only take a physics step, don't advance animated movements
+        :param part: with parts > 1, physics step is taken only for every parts:th node,
+        starting from part. Going through parts 0...parts-1 makes one full step.
+        :param parts: number of parts in a full physics step
+        :param update: update edges etc. after moving. Leave off if there are more steps coming.
+        :return: (energy, tweening) -- mean squared movement of the nodes that moved and number
+        of nodes still in animated movement towards their target positions
         """
-        nodes_are_moving = False
+        energy = 0
+        moved = 0
+        tweening = 0
+        topology = self.topology_index
         for tree_top in self.trees:
             if not tree_top.isVisible():
                 continue
-            sorted_nodes = tree_top.get_sorted_nodes()
+            sorted_nodes = topology.sorted_nodes(tree_top)
             to_normalize = []
             x_sum = 0
             y_sum = 0
             allow_normalization = True
             other_nodes = [x for x in sorted_nodes if not x.locked_to_node]
 
-            for node in sorted_nodes:
+            for i, node in enumerate(sorted_nodes):
                 if not node.isVisible():
                     continue
+                if node.is_tweening():
+                    if physics_only:
+                        continue
+                elif parts > 1 and i % parts != part:
+                    continue
                 # Computed movement
                 diff_x, diff_y, normalize, ban_normalization = node.move(other_nodes, heat)
                 if allow_normalization and normalize and not ban_normalization:
@@ -552,9 +675,12 @@ class Forest(SavedObject):
                     allow_normalization = False
                 if abs(diff_x) + abs(diff_y) > 0.5:
                     node.is_moving = True
-                    nodes_are_moving = True
                 else:
                     node.is_moving = False
+                energy += diff_x * diff_x + diff_y * diff_y
+                moved += 1
+                if node.is_tweening():
+                    tweening += 1
 
             # normalize movement so that the trees won't glide away
             if allow_normalization and to_normalize:
@@ -563,9 +689,15 @@ class Forest(SavedObject):
                 for node in to_normalize:
                     node.current_position = (node.current_position[0] - avg_x,
                                              node.current_position[1] - avg_y)
-        self.recalculate_positions_relative_to_nodes(forced=True)
+        if update:
+            self.update_after_move()
+        return energy / moved if moved else 0, tweening
+
+    def update_after_move(self):
+        """ Update edges and other elements that are drawn relative to node positions """
+        visible_rect = ctrl.view_manager.visible_scene_rect()
+        self.recalculate_positions_relative_to_nodes(forced=True, visible_rect=visible_rect)
         self.edge_visibility_check()
-        return nodes_are_moving
 
     def redraw_edges(self, edge_type=None):
         if edge_type:
@@ -595,17 +727,72 @@ class Forest(SavedObject):
     def order_recalculation_of_positions_relative_to_nodes(self):
         self._do_recalculate_relative_positions = True
 
-    def recalculate_positions_relative_to_nodes(self, forced=False):
+    def recalculate_positions_relative_to_nodes(self, forced=False, visible_rect=None):
+        """ Update edges, groups and semantics to follow the nodes.
+        :param forced: update even if not ordered
+        :param visible_rect: if given, edges that are not in this scene rect are not updated but
+        left waiting for update_culled_edges. This is for animation steps, where in large forests
+        most of the edges may be outside of the view.
+        """
         if self._do_recalculate_relative_positions or forced:
             self._do_recalculate_relative_positions = False
-            for e in self.edges.values():
-                e.make_path()
+            if visible_rect is None:
+                for e in self.edges.values():
+                    e.make_path()
+                self._culled_edges = set()
+            else:
+                culled = self._culled_edges
+                for e in self.edges.values():
+                    if self.is_edge_in_rect(e, visible_rect):
+                        e.make_path()
+                        culled.discard(e)
+                    else:
+                        culled.add(e)
             # for area in f.touch_areas:
             # area.update_position()
             for group in self.groups.values():
                 group.update_shape()
             self.semantics_manager.update_position()
 
+    @staticmethod
+    def is_edge_in_rect(edge, rect) -> bool:
+        """ Can edge be seen in scene rect, either where it is drawn now or where its end nodes
+        have moved. Curves can bulge a bit outside the box between end points, so the check is
+        generous.
+        :param edge: Edge
+        :param rect: QRectF
+        :return: bool
+        """
+        start = edge.start
+        end = edge.end
+        if not (start and end):
+            return True
+        if edge.sceneBoundingRect().intersects(rect):
+            return True
+        sx, sy = start.current_scene_position
+        ex, ey = end.current_scene_position
+        margin = prefs.edge_width
+        return rect.intersects(QtCore.QRectF(min(sx, ex) - margin, min(sy, ey) - margin,
+                                             abs(ex - sx) + margin * 2,
+                                             abs(ey - sy) + margin * 2))
+
+    def update_culled_edges(self, visible_rect=None):
+        """ Update edges that were skipped in animation steps because they were out of view.
+        :param visible_rect: update only those that are now in this scene rect, if not given,
+        update all of them.
+        """
+        if not self._culled_edges:
+            return
+        if visible_rect is None:
+            edges = self._culled_edges
+            self._culled_edges = set()
+        else:
+            edges = {e for e in self._culled_edges if self.is_edge_in_rect(e, visible_rect)}
+            self._culled_edges -= edges
+        for edge in edges:
+            if edge.uid in self.edges:
+                edge.make_path()
+
     def edge_visibility_check(self):
         """ Perform check for each edge: hide them if their start/end is
         hidden, show them if necessary.
@@ -622,16 +809,19 @@ class Forest(SavedObject):
                     ctrl.ui.remove_ui_for(edge)
         self._do_edge_visibility_check = False
 
-    def update_constituent_node_shapes(self):
+    def update_constituent_node_shapes(self, nodes=None):
         """ Make sure that all nodes use right kind of label and that the locked-in children are 
         presented in right way.        
+        :param nodes: update only these nodes, default is to update all nodes
         :return: 
         """
+        if nodes is None:
+            nodes = self.nodes.values()
         shape = self.settings.get('cn_shape')
-        cnodes = [cn for cn in self.nodes.values() if cn.node_type == g.CONSTITUENT_NODE]
+        cnodes = [cn for cn in nodes if cn.node_type == g.CONSTITUENT_NODE]
         position = self.settings.get('feature_positioning')
         checking_mode = self.settings.get('feature_check_display')
-        fnodes = [f for f in self.nodes.values() if f.node_type == g.FEATURE_NODE]
+        fnodes = [f for f in nodes if f.node_type == g.FEATURE_NODE]
         for fnode in fnodes:
             fnode.update_label()
         for fnode in fnodes:
@@ -668,7 +858,12 @@ class Forest(SavedObject):
             self.heading_text = ''
         ctrl.ui.refresh_heading()
 
-    def update_feature_ordering(self):
+    def update_feature_ordering(self, nodes=None):
+        """ Sort feature edges of constituent nodes by the order of features in syntactic objects
+        and refresh cached edge indices.
+        :param nodes: update only these nodes and edges connected to them, default is to update
+        all
+        """
 
         def flat(listlike):
             res = []
@@ -707,7 +902,16 @@ class Forest(SavedObject):
 
             return [e for i, e in sorted(sortable_edges)]
 
-        for cn in self.nodes.values():
+        if nodes is None:
+            nodes = self.nodes.values()
+            edges = self.edges.values()
+        else:
+            edges = set()
+            for node in nodes:
+                edges.update(node.edges_up)
+                edges.update(node.edges_down)
+
+        for cn in nodes:
             if cn.node_type == g.CONSTITUENT_NODE:
                 if cn.syntactic_object:
                     cn.cached_sorted_feature_edges = sort_attached_features(cn)
@@ -715,7 +919,7 @@ class Forest(SavedObject):
                     cn.cached_sorted_feature_edges = [e for e in cn.edges_down
                                                       if e.edge_type == g.FEATURE_EDGE]
 
-        for edge in self.edges.values():
+        for edge in edges:
             edge.cached_edge_start_index = edge.edge_start_index(from_cache=False)
             edge.cached_edge_end_index = edge.edge_end_index(from_cache=False)
             if edge.path:
@@ -730,18 +934,18 @@ class Forest(SavedObject):
             return self.compute_highest_first_rotation(rotator)
 
     def compute_left_first_rotation(self):
-        def add_children(node, parent):
-            if node not in used:
-                used.add(node)
-                if hasattr(node, 'index') and parent:
-                    trace_dict[node.uid] = parent.uid
-                for child in node.get_all_children(visible=False):
-                    add_children(child, node)
-
         trace_dict = {}
         used = set()
+        topology = self.topology_index
         for tree_top in self:
-            add_children(tree_top, None)
+            parents = topology.parents(tree_top)
+            for node in topology.sorted_nodes(tree_top):
+                if node in used:
+                    continue
+                used.add(node)
+                parent = parents.get(node)
+                if parent and hasattr(node, 'index'):
+                    trace_dict[node.uid] = parent.uid
 
         self.traces_to_draw = trace_dict
         return 0
@@ -768,9 +972,11 @@ class Forest(SavedObject):
         trace_dict = {}
         sorted_parents = []
         required_keys = set()
+        topology = self.topology_index
         for tree_top in self:
             sortable_parents = []
-            ltree = tree_top.get_sorted_nodes()
+            ltree = topology.sorted_nodes(tree_top)
+            positions = topology.positions(tree_top)
             for n_index, node in enumerate(ltree):
                 if not hasattr(node, 'index'):
                     continue
@@ -780,8 +986,8 @@ class Forest(SavedObject):
                     required_keys.add(node_key)
                     my_parents = []
                     for parent in parents:
-                        if parent in ltree:
-                            i = ltree.index(parent)
+                        i = positions.get(parent)
+                        if i is not None:
                             my_parents.append((max((i, n_index - 1)), node_key, parent, True))
                     if my_parents:
                         my_parents.sort()
@@ -817,10 +1023,10 @@ class Forest(SavedObject):
             return True
         elif not parent:
             return node.uid not in self.traces_to_draw or not self.traces_to_draw[node.uid]
-        elif hasattr(node, 'index') and len(node.get_parents(visible=True)) > 1:
-            if node.uid in self.traces_to_draw:
-                if parent.uid != self.traces_to_draw[node.uid]:
-                    return False
+        # cheap dict lookup first, counting visible parents is needed only if it says no
+        elif parent.uid != self.traces_to_draw.get(node.uid, parent.uid) and \
+                hasattr(node, 'index') and len(node.get_parents(visible=True)) > 1:
+            return False
         return True
 
     def prepare_width_map(self):
@@ -856,6 +1062,32 @@ class Forest(SavedObject):
         for other in self.others.values():
             other.update_colors()
 
+    def update_colors(self, color_keys):
+        """ Repaint nodes, edges and groups that are drawn with any of the given palette colors.
+        :param color_keys: set of palette keys whose colors have changed
+        """
+        selection_changed = 'accent3' in color_keys  # selected items are drawn with selection()
+        for node in self.nodes.values():
+            if node.get_color_key() in color_keys or (node.selected and selection_changed):
+                node.update()
+                if node.label_object:
+                    node.label_object.update()
+        for edge in self.edges.values():
+            key = edge.color_key
+            if not key:
+                # edge without own color uses the color of its origin or end, or if neither has
+                # one, content1, see contextual_color
+                host = edge.origin if edge.origin and hasattr(edge.origin, 'color') else edge.end
+                if hasattr(host, 'get_color_key'):
+                    key = host.get_color_key()
+                key = key or 'content1'
+            if key in color_keys or (edge.selected and selection_changed):
+                edge.update()
+        for group in self.groups.values():
+            if group.get_color_key() in color_keys:
+                group.update_colors()
+                group.update()
+
     # ############## #
     #                #
     #  Save support  #
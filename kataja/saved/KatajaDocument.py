@@ -25,8 +25,10 @@ import os
 
 from kataja.SavedField import SavedField
 from kataja.SavedObject import SavedObject
+from kataja.parser.TreebankReader import TreebankReader, LazyForestList
 from kataja.settings.DocumentSettings import DocumentSettings
 from kataja.singletons import ctrl, classes, prefs
+from kataja.utils import timed
 
 
 def definitions_as_text(defs):
@@ -129,6 +131,8 @@ class KatajaDocument(SavedObject):
             self.forest.retire_from_display()
         self.current_index = self.forests.index(forest)
         ctrl.undo_pile = set()
+        # new forest is drawn from scratch, don't keep objects of the previous one alive
+        ctrl.changed_objects = set()
         self.forest = forest
         ctrl.disable_undo()
         if forest.is_parsed:
@@ -185,6 +189,10 @@ class KatajaDocument(SavedObject):
         examples
         """
 
+        if filename and TreebankReader.is_treebank(filename):
+            forests = self.create_treebank_forests(filename)
+            if forests:
+                return forests
         if filename:
             treelist = KatajaDocument.load_treelist_from_text_file(filename)
         elif clear:
@@ -262,6 +270,28 @@ class KatajaDocument(SavedObject):
             forests.append(forest)
         return forests
 
+    @staticmethod
+    def create_treebank_forests(filename):
+        """ Index trees in a bracketed treebank file (Penn Treebank .mrg or one tree per line)
+        without parsing them. Forests are created from the trees only when they are accessed,
+        so opening a large treebank costs one pass over the file.
+        :param filename: path to treebank file
+        :return: LazyForestList, or None if no trees were found
+        """
+        reader = TreebankReader(filename)
+        with timed('treebank.scan'):
+            count = reader.scan()
+        if not count:
+            return None
+
+        def build_forest(tree):
+            syn = classes.SyntaxAPI()
+            syn.input_tree = tree
+            syn.lexicon = ''
+            return classes.Forest(heading_text='', comments=[], syntax=syn)
+
+        return LazyForestList(reader, build_forest)
+
     def create_save_data(self):
         """
         Make a large dictionary of all objects with all of the complex stuff
@@ -383,6 +383,18 @@ class Movable(QtWidgets.QGraphicsObject, SavedObject, FadeInOut):
         self._move_counter = 0
         self.is_moving = False
 
+    def is_tweening(self) -> bool:
+        """ Is the object in an animated movement towards its target position """
+        return bool(self._move_counter)
+
+    def finish_moving(self):
+        """ Jump to the end of moving animation, to target position.
+        :return: None
+        """
+        if self._move_counter:
+            self.current_position = self.target_position
+            self.stop_moving()
+
     def _current_position_changed(self, value):
         self.setPos(value[0], value[1])
 
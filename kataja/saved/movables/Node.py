@@ -31,6 +31,7 @@ import kataja.globals as g
 import kataja.ui_widgets.buttons.OverlayButton as Buttons
 from kataja.SavedField import SavedField
 from kataja.SimpleLabel import SimpleLabel
+from kataja.TopologyIndex import TopologyIndex
 from kataja.Triangle import Triangle
 from kataja.parser.INodes import as_html
 from kataja.saved.Draggable import Draggable
@@ -122,6 +123,8 @@ class Node(Draggable, Movable):
         self.edges_up = []
         self.edges_down = []
         self.triangle_stack = []  # you can always unfold only the outermost triangle, so stack
+        self.folded_into = None  # host of the triangle this node is folded into, see Triangle
+        self.triangle_item = None  # Triangle drawn under this node when it is a triangle host
         self.color_key = None
         self.invert_colors = False
 
@@ -131,7 +134,6 @@ class Node(Draggable, Movable):
         self.setFiltersChildEvents(False)
         self.setAcceptHoverEvents(True)
         self.setAcceptDrops(True)
-        self.setCacheMode(QtWidgets.QGraphicsItem.CacheMode.DeviceCoordinateCache)
         self.setFlag(QtWidgets.QGraphicsObject.GraphicsItemFlag.ItemSendsGeometryChanges)
         # self.setFlag(QtWidgets.QGraphicsObject.ItemIsMovable)
         self.setFlag(QtWidgets.QGraphicsObject.GraphicsItemFlag.ItemIsSelectable)
@@ -443,19 +445,7 @@ class Node(Draggable, Movable):
         """ Do left-first iteration through all nodes and return a list where
         only first instance of each node is present.
         """
-        done = set()
-        result = []
-
-        def _iterate(node):
-            if node not in done:
-                result.append(node)
-                done.add(node)
-                for edge in node.edges_down:
-                    if edge.end:
-                        _iterate(edge.end)
-
-        _iterate(self)
-        return result[1:]
+        return self.get_sorted_nodes()[1:]
 
     def can_have_as_child(self, other=None):
         """ Check, usually when dragging objects, if parent -- child relationship is possible in
@@ -476,42 +466,22 @@ class Node(Draggable, Movable):
         return False
 
     def get_sorted_nodes(self):
-        """ Recursively get children nodes, their children etc. sorted.
+        """ Get this node, its children, their children etc. sorted. Comes from forest's
+        topology index, so repeated calls are cheap until the edges change.
         :return:
         """
-        sorted_nodes = []
-        used = set()
-
-        def add_children(node):
-            if node not in used:
-                used.add(node)
-                sorted_nodes.append(node)
-                for child in node.get_all_children(visible=False):
-                    add_children(child)
-
-        add_children(self)
-        return sorted_nodes
+        if self.forest:
+            return list(self.forest.topology_index.sorted_nodes(self))
+        return TopologyIndex(None).sorted_nodes(self)
 
     def get_highest(self):
-        """ Recursively get highest grandparents/parents that can be found. Because
+        """ Get highest grandparents/parents that can be found. Because
         multidomination, there can be more than one result, so this returns a list.
         :return:
         """
-        tops = []
-        used = set()
-
-        def go_up(node):
-            if node not in used:
-                used.add(node)
-                parents = node.get_all_parents(visible=False)
-                if parents:
-                    for parent in parents:
-                        go_up(parent)
-                else:
-                    tops.append(node)
-
-        go_up(self)
-        return tops
+        if self.forest:
+            return list(self.forest.topology_index.highest(self))
+        return TopologyIndex(None).highest(self)
 
     # ## Font
     # #####################################################################
@@ -634,6 +604,9 @@ class Node(Draggable, Movable):
         :param option:
         :param widget:
         nodes it is the label of the node that needs complex painting """
+        if ctrl.view_manager.low_detail:
+            self.paint_low_detail(painter)
+            return
         xr = 5
         yr = 5
         pen = QtGui.QPen(self.contextual_color())
@@ -659,6 +632,16 @@ class Node(Draggable, Movable):
             painter.setBrush(brush)
             painter.drawRoundedRect(self.inner_rect, xr, yr)
 
+    def paint_low_detail(self, painter):
+        """ When zoomed out so far that labels cannot be read, node is drawn as a translucent
+        box of its size. Labels skip painting altogether.
+        :param painter:
+        """
+        c = QtGui.QColor(self.contextual_color())
+        if not (self.selected or self.hovering or ctrl.pressed is self):
+            c.setAlpha(96)
+        painter.fillRect(self.inner_rect, c)
+
     def has_visible_label(self):
         """
         :return: bool
@@ -745,6 +728,12 @@ class Node(Draggable, Movable):
 
         if old_br != self.inner_rect:
             self.prepareGeometryChange()
+            if self.triangle_stack and (not old_br or
+                                        old_br.width() != self.inner_rect.width()):
+                # triangles that this node is folded into have to measure their width again
+                for host in self.triangle_stack:
+                    if host is not self and host.triangle_item:
+                        host.triangle_item.measured = False
             if ctrl.ui.selection_group and self in ctrl.ui.selection_group.selection:
                 ctrl.ui.selection_group.please_update()
         return self.inner_rect
@@ -815,7 +804,11 @@ class Node(Draggable, Movable):
 
     # #### Locking node to another node (e.g. features to constituent and in triangles)
 
-    def release_from_locked_position(self):
+    def release_from_locked_position(self, update_parent=True):
+        """ Stop being locked to another node and return to be a free node in scene.
+        :param update_parent: update bounding rect of the node that this was locked to. When
+        releasing many nodes at once, it is cheaper to update it once afterwards.
+        """
         was_locked = self.locked_to_node
         if was_locked:
             self.locked_to_node = None
@@ -830,10 +823,16 @@ class Node(Draggable, Movable):
             self.current_position = lp.x(), lp.y()
             self.stop_moving()
             self.update_bounding_rect()
-            if isinstance(was_locked, Node):
+            if update_parent and isinstance(was_locked, Node):
                 was_locked.update_bounding_rect()
 
-    def lock_to_node(self, parent, move_to=None):
+    def lock_to_node(self, parent, move_to=None, update_parent=True):
+        """ Make this node a child item of another node, so that it moves with it.
+        :param parent: Node
+        :param move_to: position relative to parent
+        :param update_parent: update bounding rect of the parent. When locking many nodes at once,
+        it is cheaper to update it once afterwards.
+        """
         previously = self.locked_to_node
         if previously is not parent:
             self.locked_to_node = parent
@@ -845,13 +844,15 @@ class Node(Draggable, Movable):
             self.update_bounding_rect()
             if move_to:
                 self.move_to(*move_to)
-            parent.update_bounding_rect()
-            if isinstance(previously, Node):
-                previously.update_bounding_rect()
+            if update_parent:
+                parent.update_bounding_rect()
+                if isinstance(previously, Node):
+                    previously.update_bounding_rect()
         elif move_to:
             assert (self.parentItem() == self.locked_to_node)
             self.move_to(*move_to)
-            parent.update_bounding_rect()
+            if update_parent:
+                parent.update_bounding_rect()
 
     def get_edges_down_with_children(self, start=None, edges=None):
         """ Sometimes you need to count in also edges of locked in nodes (they are childItems). 
@@ -892,6 +893,15 @@ class Node(Draggable, Movable):
     def reindex_edges(self):
         pass
 
+    def poke(self, attribute):
+        """ Changes in edges change the shape of the graph, so forest's topology index has to be
+        rebuilt.
+        :param attribute: string, name of the attribute
+        """
+        if (attribute == 'edges_up' or attribute == 'edges_down') and self.forest:
+            self.forest.topology_index.invalidate()
+        super().poke(attribute)
+
     def hidden_in_triangle(self):
         """ Check if this node should be included in triangle's visible row of nodes or if it 
         should be hidden. 
@@ -1167,6 +1177,11 @@ class Node(Draggable, Movable):
                 if scene:
                     scene.removeItem(self.halo_item)
                 self.halo_item = None
+        if self.forest:
+            if self.halo:
+                self.forest.halo_nodes.add(self)
+            else:
+                self.forest.halo_nodes.discard(self)
         self.update()
 
     def update_halo(self, color):
@@ -1182,9 +1197,13 @@ class Node(Draggable, Movable):
     #                #
     # ############## #
 
+    def _edges_changed(self, value):
+        if self.forest:
+            self.forest.topology_index.invalidate()
+
     # Saved properties
     syntactic_object = SavedField("syntactic_object")
     label = SavedField("label")
-    edges_up = SavedField("edges_up")
-    edges_down = SavedField("edges_down")
+    edges_up = SavedField("edges_up", if_changed=_edges_changed)
+    edges_down = SavedField("edges_down", if_changed=_edges_changed)
     triangle_stack = SavedField("triangle_stack")
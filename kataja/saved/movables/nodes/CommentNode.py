@@ -169,6 +169,9 @@ class CommentNode(Node):
         :param option:
         :param widget:
         nodes it is the label of the node that needs complex painting """
+        if ctrl.view_manager.low_detail:
+            self.paint_low_detail(painter)
+            return
         p = QtGui.QPen(self.contextual_color())
         p.setWidth(1)
         if self.drag_data:
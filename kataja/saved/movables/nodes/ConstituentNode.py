@@ -699,6 +699,9 @@ class ConstituentNode(Node):
         :param option:
         :param widget:
          """
+        if ctrl.view_manager.low_detail:
+            self.paint_low_detail(painter)
+            return
         shape = self.label_object.cn_shape
         if shape == g.CARD:
             xr = 4
@@ -444,6 +444,9 @@ class FeatureNode(Node):
         :param option:
         :param widget:
         """
+        if ctrl.view_manager.low_detail:
+            self.paint_low_detail(painter)
+            return
         if self.fshape:
             self.draw_feature_shape(painter, self.inner_rect, self.left_shape, self.right_shape,
                                     self.contextual_color())
@@ -21,20 +21,29 @@
 #
 # ############################################################################
 
-from collections import ChainMap
-
 import kataja
+from kataja.Shapes import SHAPE_PRESETS
+from kataja.singletons import prefs
 
 
 class EdgeSettings:
     def __init__(self, edge: 'kataja.saved.Edge'):
         self.edge = edge
-        self.flat_dict = {}
+        self._flat_dict = None
+        self._flat_key = None
 
-    def flatten(self):
-        self.flat_dict = ChainMap(self.data,
-                                  *self.edge.forest.settings.flat_edge_dict[self.edge.edge_type].maps,
-                                  *self.edge.forest.settings.flat_shape_dict[self.edge.shape_name].maps)
+    @property
+    def flat_dict(self):
+        """ All settings for the edge's shape resolved into one dict, to be given for shape's
+        path computation. Rebuilt only if settings have changed since the last time or if the
+        edge has changed its shape. """
+        shape_name = self.edge.shape_name
+        flat_key = (shape_name, prefs.settings_generation)
+        if flat_key != self._flat_key:
+            self._flat_dict = {key: self.get_shape(key) for key in
+                               SHAPE_PRESETS[shape_name].defaults}
+            self._flat_key = flat_key
+        return self._flat_dict
 
     @property
     def data(self):
@@ -44,17 +53,21 @@ class EdgeSettings:
         v = self.data.get(key, None)
         if v is None:
             return self.edge.forest.settings.get_for_edge_type(key, self.edge.edge_type)
+        return v
 
     def get_shape(self, key):
         v = self.data.get(key, None)
         if v is None:
             return self.edge.forest.settings.get_for_edge_shape(key, self.edge.shape_name)
+        return v
 
     def set(self, key, value):
         self.edge.poke('_settings')
         self.data[key] = value
+        prefs.bump_settings_generation()
 
     def delete(self, key):
         if key in self.data:
             self.edge.poke('_settings')
             del self.data[key]
+            prefs.bump_settings_generation()
@@ -20,45 +20,54 @@
 # along with Kataja.  If not, see <http://www.gnu.org/licenses/>.
 #
 # ############################################################################
-from collections import ChainMap
+from kataja.singletons import ctrl, prefs
 
-from kataja.Shapes import SHAPE_PRESETS
-from kataja.edge_styles import master_styles
-from kataja.singletons import ctrl
+NOT_FOUND = object()
 
 
 class ForestSettings:
+    """ Settings for forest, values that are not set here are looked up from document settings
+    and finally from preferences.
+
+    Resolved values are cached per subtype container ('node_types', 'edge_types',
+    'edge_shapes' or plain keys), subtype and key. Cache is valid as long as
+    prefs.settings_generation stays the same: every set and delete in any level of settings
+    bumps the generation, so painting and layout can usually do a dict lookup instead of
+    walking through all of the levels.
+    """
 
     def __init__(self, forest):
         self.host = forest
         self.next = ctrl.document.settings if ctrl.document else None
-        self.flat_edge_dict = {}
-        self.flat_shape_dict = {}
-
-    def flatten(self):
-        for edge_type in master_styles['fancy'].keys():
-            d = self.data.get('edge_types', {}).get(edge_type, {})
-            next_map = self.next.flat_edge_dict[edge_type]
-            if isinstance(next_map, ChainMap):
-                self.flat_edge_dict[edge_type] = next_map.new_child(d)
-            else:
-                self.flat_edge_dict[edge_type] = ChainMap(d, next_map)
-        for shape_name in SHAPE_PRESETS.keys():
-            d = self.data.get('edge_shapes', {}).get(shape_name, {})
-            next_map = self.next.flat_shape_dict[shape_name]
-            if isinstance(next_map, ChainMap):
-                self.flat_shape_dict[shape_name] = next_map.new_child(d)
-            else:
-                self.flat_shape_dict[shape_name] = ChainMap(d, next_map)
+        self._resolved = {}
+        self._generation = -1
 
     @property
     def data(self):
         return self.host.get_settings()
 
+    def _cache_for(self, subtype_container, subtype):
+        """ Return the dict where resolved values for this subtype are cached. Flush all caches
+        if settings have changed since they were filled. """
+        if self._generation != prefs.settings_generation:
+            self._resolved = {}
+            self._generation = prefs.settings_generation
+        container = self._resolved.get(subtype_container)
+        if container is None:
+            container = self._resolved[subtype_container] = {}
+        cache = container.get(subtype)
+        if cache is None:
+            cache = container[subtype] = {}
+        return cache
+
     def get(self, key):
-        v = self.data.get(key, None)
-        if v is None:
-            return self.next.get(key)
+        cache = self._cache_for(None, None)
+        v = cache.get(key, NOT_FOUND)
+        if v is NOT_FOUND:
+            v = self.data.get(key, None)
+            if v is None:
+                v = self.next.get(key)
+            cache[key] = v
         return v
 
     def _get_in(self, key, subtype, subtype_container):
@@ -71,26 +80,39 @@ class ForestSettings:
                     return v
 
     def get_for_node_type(self, key, node_type):
-        v = self._get_in(key, node_type, 'node_types')
-        if v is not None:
-            return v
-        return self.next.get_for_node_type(key, node_type)
+        cache = self._cache_for('node_types', node_type)
+        v = cache.get(key, NOT_FOUND)
+        if v is NOT_FOUND:
+            v = self._get_in(key, node_type, 'node_types')
+            if v is None:
+                v = self.next.get_for_node_type(key, node_type)
+            cache[key] = v
+        return v
 
     def get_for_edge_type(self, key, edge_type):
-        v = self._get_in(key, edge_type, 'edge_types')
-        if v is not None:
-            return v
-        return self.next.get_for_edge_type(key, edge_type)
+        cache = self._cache_for('edge_types', edge_type)
+        v = cache.get(key, NOT_FOUND)
+        if v is NOT_FOUND:
+            v = self._get_in(key, edge_type, 'edge_types')
+            if v is None:
+                v = self.next.get_for_edge_type(key, edge_type)
+            cache[key] = v
+        return v
 
     def get_for_edge_shape(self, key, edge_shape):
-        v = self._get_in(key, edge_shape, 'edge_shapes')
-        if v is not None:
-            return v
-        return self.next.get_for_edge_shape(key, edge_shape)
+        cache = self._cache_for('edge_shapes', edge_shape)
+        v = cache.get(key, NOT_FOUND)
+        if v is NOT_FOUND:
+            v = self._get_in(key, edge_shape, 'edge_shapes')
+            if v is None:
+                v = self.next.get_for_edge_shape(key, edge_shape)
+            cache[key] = v
+        return v
 
     def set(self, key, value):
         self.host.poke('_settings')
         self.data[key] = value
+        prefs.bump_settings_generation(key)
 
     def _set_in(self, key, value, subtype, subtype_container):
         self.host.poke('_settings')
@@ -102,6 +124,7 @@ class ForestSettings:
                 sc[subtype] = {key: value}
             else:
                 sc[subtype][key] = value
+        prefs.bump_settings_generation(key)
 
     def set_for_node_type(self, key, value, node_type):
         self._set_in(key, value, node_type, 'node_types')
@@ -116,6 +139,7 @@ class ForestSettings:
         if key in self.data:
             self.host.poke('_settings')
             del self.data[key]
+            prefs.bump_settings_generation(key)
 
     def _del_in(self, key, subtype, subtype_container):
         self.host.poke('_settings')
@@ -125,6 +149,7 @@ class ForestSettings:
                 del sc[subtype][key]
                 if not sc[subtype]:
                     del sc[subtype]
+                prefs.bump_settings_generation(key)
 
     def del_for_node_type(self, key, node_type):
         self._del_in(key, node_type, 'node_types')
@@ -21,6 +21,7 @@
 #
 # ############################################################################
 import kataja
+from kataja.singletons import prefs
 
 
 class NodeSettings:
@@ -36,12 +37,15 @@ class NodeSettings:
         v = self.data.get(key, None)
         if v is None:
             return self.node.forest.settings.get_for_node_type(key, self.node.node_type)
+        return v
 
     def set(self, key, value):
         self.node.poke('_settings')
         self.data[key] = value
+        prefs.bump_settings_generation()
 
     def delete(self, key):
         if key in self.data:
             self.node.poke('_settings')
             del self.data[key]
+            prefs.bump_settings_generation()
@@ -85,7 +85,7 @@ class Preferences(object):
     """
     # Prefs are not saved in save command, but changes here are undoable,
     # so this must support the save protocol.
-    not_saved = []
+    not_saved = ['settings_generation', 'changed_settings']
 
     def __init__(self, running_environment):
         self.save_key = 'preferences'
@@ -164,6 +164,16 @@ class Preferences(object):
             'order': 43
         }
 
+        self.low_detail_zoom = 0.4
+        self._low_detail_zoom_ui = {
+            'tab': 'General',
+            'label': 'Simplify drawing below zoom level',
+            'range': (0.0, 2.0),
+            'help': 'When zoomed out further than this, nodes are drawn as boxes and edges as '
+                    'simple lines. Set to 0 to always draw everything in full detail.',
+            'order': 44
+        }
+
         self.visualization = 'Balanced grid-based tree'
         self._visualization_ui = {
             'tab': 'Drawing',
@@ -470,6 +480,29 @@ class Preferences(object):
                     "backgrounds, but may look messy on print."
         }
 
+        self.undo_memory_budget = 64
+        self._undo_memory_budget_ui = {
+            'tab': 'Performance',
+            'range': (4, 1024),
+            'label': 'Undo memory (MB)',
+            'help': 'Oldest undo steps are forgotten when undo history takes more memory than this.'
+        }
+        self.compress_undo = True
+        self._compress_undo_ui = {
+            'tab': 'Performance',
+            'label': 'Compress old undo steps',
+            'help': 'Keep older undo steps in compressed form. Saves memory, but undoing them is '
+                    'slightly slower.'
+        }
+        self.profiling = True
+        self._profiling_ui = {
+            'tab': 'Performance',
+            'label': 'Record timings',
+            'on_change': 'update_profiling',
+            'help': 'Measure how long actions, parsing and drawing stages take. Results are shown '
+                    'in Profiler panel and can be exported as a trace file.'
+        }
+
         # self.blender_app_path =
         # '/Applications/blender.app/Contents/MacOS/blender'
         # self.blender_env_path = '/Users/purma/Dropbox/bioling_blender'
@@ -505,6 +538,36 @@ class Preferences(object):
         node_classes = classes.nodes
         for key, nodeclass in node_classes.items():
             self.nodes[key] = deepcopy(nodeclass.default_style['fancy'])
+        self.bump_settings_generation()
+
+    def __setattr__(self, key, value):
+        object.__setattr__(self, key, value)
+        if not (key.startswith('_') or key in Preferences.not_saved):
+            self.bump_settings_generation(key)
+
+    def bump_settings_generation(self, key=None):
+        """ Forest and document settings cache their resolved values as long as this number
+        stays the same. Any change in any level of settings (element, forest, document,
+        preferences) has to bump it.
+
+        Keys of changed forest, document and preferences settings are also collected to
+        changed_settings, so that Forest.draw can tell which of its stages need to be run.
+        Element settings don't need to give the key, the element itself is then marked as
+        changed.
+        :param key: name of the changed setting
+        """
+        self.__dict__['settings_generation'] = self.__dict__.get('settings_generation', 0) + 1
+        if key:
+            changed = self.__dict__.get('changed_settings')
+            if changed is None:
+                changed = self.__dict__['changed_settings'] = set()
+            changed.add(key)
+
+    def pop_changed_settings(self):
+        """ Return keys of settings changed since last call and start collecting again """
+        changed = self.__dict__.get('changed_settings') or set()
+        self.__dict__['changed_settings'] = set()
+        return changed
 
     def restore_default_preferences(self, qt_prefs, running_environment, classes, log):
         source_prefs = Preferences(running_environment)
@@ -634,14 +697,6 @@ class Preferences(object):
 
     # Support settings-interface ########################
 
-    @property
-    def flat_edge_dict(self):
-        return master_styles['fancy']
-
-    @property
-    def flat_shape_dict(self):
-        return SHAPE_PRESETS
-
     def get(self, key):
         return getattr(self, key)
 
@@ -660,9 +715,11 @@ class Preferences(object):
 
     def set_for_node_type(self, key, value, node_type):
         self.nodes[node_type][key] = value
+        self.bump_settings_generation(key)
 
     def set_for_edge_type(self, key, value, edge_type):
         self.edges[edge_type][key] = value
+        self.bump_settings_generation(key)
 
     def set_for_edge_shape(self, key, value, edge_shape):
         pass
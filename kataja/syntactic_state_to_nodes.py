@@ -23,15 +23,16 @@
 # ############################################################################
 
 
-import time
 import pprint
 
 import kataja.globals as g
 from kataja.singletons import ctrl
+from kataja.utils import timed
 
 group_colors = ['accent5tr', 'accent2tr', 'accent7tr', 'accent4tr', 'accent3tr', 'accent1tr', 'accent6tr', 'accent8tr']
 
 
+@timed('state_to_nodes')
 def syntactic_state_to_nodes(forest, syn_state):
     """ This is a big important function to ensure that Nodes on display are only those that
     are present in syntactic objects. Clean up the residue, create those nodes that are
@@ -40,7 +41,6 @@ def syntactic_state_to_nodes(forest, syn_state):
     :param syn_state: SyntaxState -instance
     :return:
     """
-    t = time.time()
     drawing = forest.drawing
 
     if forest.syntax.display_modes:
@@ -152,22 +152,7 @@ class SyntaxAPI(SavedObject):
         :param node:
         :return:
         """
-
-        def _pick_leaves(n):
-            if n not in passed:
-                passed.add(n)
-                leaves.append(n)
-                children = n.get_children()
-                if children:
-                    for c in children:
-                        _pick_leaves(c)
-
-        leaves = []
-        passed = set()
-        passed.add(node)
-        for child in node.get_children():
-            _pick_leaves(child)
-        return [l.syntactic_object for l in leaves]
+        return [n.syntactic_object for n in node.forest.topology_index.dominated_nodes(node)]
 
     def nodes_to_synobjs(self, forest, roots):
         """ Wrapper for function to update all syntactic objects to correspond with the current
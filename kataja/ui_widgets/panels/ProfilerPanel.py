@@ -0,0 +1,87 @@
+from PyQt6 import QtWidgets, QtCore
+
+from kataja.Profiler import profiler
+from kataja.singletons import qt_prefs
+from kataja.ui_widgets.KatajaCheckBox import KatajaCheckBox
+from kataja.ui_widgets.Panel import Panel
+from kataja.ui_widgets.PushButtonBase import PushButtonBase
+from kataja.ui_widgets.buttons.PanelButton import PanelButton
+
+REFRESH_INTERVAL = 1000  # ms
+COLUMNS = ['Span', 'Calls', 'Total ms', 'Mean ms', 'Max ms', 'Last ms']
+
+
+class NumericItem(QtWidgets.QTreeWidgetItem):
+    """ Tree item that sorts numeric columns by value instead of text """
+
+    def __lt__(self, other):
+        column = self.treeWidget().sortColumn() if self.treeWidget() else 0
+        a = self.data(column, QtCore.Qt.ItemDataRole.UserRole)
+        b = other.data(column, QtCore.Qt.ItemDataRole.UserRole)
+        if a is None or b is None:
+            return super().__lt__(other)
+        return a < b
+
+
+class ProfilerPanel(Panel):
+    """ Timings of actions, parsing and drawing stages and counters collected by Profiler """
+
+    def __init__(self, name, default_position='float', parent=None, folded=False):
+        Panel.__init__(self, name, default_position, parent, folded)
+        title_widget = self.titleBarWidget()
+        tlayout = title_widget.layout()
+        tlayout.addStretch(2)
+        KatajaCheckBox(parent=title_widget, action='toggle_profiling'
+                       ).to_layout(tlayout, with_label='record')
+        PushButtonBase(parent=title_widget, text='Export trace',
+                       action='export_profile_trace').to_layout(tlayout)
+        clear = PanelButton(parent=title_widget, action='clear_profile',
+                            pixmap=qt_prefs.trash_icon).to_layout(tlayout)
+        clear.setFlat(False)
+        clear.setMaximumHeight(20)
+        widget = self.widget()
+        self.preferred_size = QtCore.QSize(420, 240)
+        self.preferred_floating_size = QtCore.QSize(480, 360)
+        self.tree = QtWidgets.QTreeWidget(parent=widget)
+        self.tree.setColumnCount(len(COLUMNS))
+        self.tree.setHeaderLabels(COLUMNS)
+        self.tree.setRootIsDecorated(False)
+        self.tree.setSortingEnabled(True)
+        self.tree.sortByColumn(2, QtCore.Qt.SortOrder.DescendingOrder)
+        self.tree.setFocusPolicy(QtCore.Qt.FocusPolicy.NoFocus)
+        self.counters = QtWidgets.QLabel(parent=widget)
+        self.counters.setWordWrap(True)
+        self.vlayout.setContentsMargins(4, 4, 4, 4)
+        self.vlayout.addWidget(self.tree)
+        self.vlayout.addWidget(self.counters)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL)
+        self.timer.timeout.connect(self.update_panel)
+        self.finish_init()
+        self.timer.start()
+
+    def update_panel(self):
+        """ Refresh the table, only if panel is actually shown """
+        if self.folded or not self.isVisible():
+            return
+        self.tree.setSortingEnabled(False)
+        self.tree.clear()
+        for row in profiler.summary():
+            item = NumericItem(self.tree)
+            for column, value in enumerate(row):
+                if column == 0:
+                    item.setText(0, value)
+                    continue
+                if column == 1:
+                    item.setText(column, str(value))
+                else:
+                    item.setText(column, f'{value:.2f}')
+                item.setData(column, QtCore.Qt.ItemDataRole.UserRole, value)
+                item.setTextAlignment(column, QtCore.Qt.AlignmentFlag.AlignRight)
+        self.tree.setSortingEnabled(True)
+        self.counters.setText(', '.join(f'{key}: {value}' for key, value in
+                                        sorted(profiler.counters.items())))
+
+    def clear(self):
+        self.tree.clear()
+        self.counters.setText('')
@@ -28,6 +28,7 @@ import string
 import sys
 import time
 import traceback
+from contextlib import contextmanager
 from html import escape as str_escape
 from types import FrameType
 
@@ -89,6 +90,40 @@ def time_me(function):
     return wrap
 
 
+timing_hooks = []
+
+
+def add_timing_hook(hook):
+    """ Have hook(name, seconds) called every time a stage timed with timed() finishes, e.g.
+    add_timing_hook(lambda name, s: print(name, s * 1000)) to print drawing stages of forest.
+    """
+    if hook not in timing_hooks:
+        timing_hooks.append(hook)
+
+
+def remove_timing_hook(hook):
+    if hook in timing_hooks:
+        timing_hooks.remove(hook)
+
+
+@contextmanager
+def timed(name):
+    """ Measure the duration of the with-block and report it to timing hooks. Without hooks
+    this costs only a check for an empty list.
+    :param name: name of the stage, e.g. 'draw.node_shapes'
+    """
+    if not timing_hooks:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        for hook in timing_hooks:
+            hook(name, duration)
+
+
 def report(function):
     """ Print out the name of function and representation (__repr__) of its returned value.
     You know, for debugging!
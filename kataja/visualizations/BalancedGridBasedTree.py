@@ -25,6 +25,7 @@
 import math
 
 import kataja.globals as g
+from kataja.ContourLayout import ContourLayout
 from kataja.Grid import Grid
 from kataja.saved.Movable import Movable
 from kataja.singletons import prefs
@@ -38,6 +39,52 @@ class BalancedGridBasedTree(BalancedTree):
     name = 'Balanced grid-based tree'
     banned_cn_shapes = (g.BRACKETED, g.SCOPEBOX)
     use_rotation = False
+    use_contour_layout = True
+
+    @staticmethod
+    def grid_size(node, limit_height=False):
+        """ Node's extent in grid units
+        :return: left_adjust, top_adjust, width_in_columns, height_in_rows
+        """
+        edge_height = prefs.edge_height
+        edge_width = prefs.edge_width / 2
+        br = node.future_children_bounding_rect(limit_height=limit_height)
+        node_width = br.width()
+        node_height = br.height()
+        node_offset_y = br.y()
+        node_top_row = node.get_top_y()
+        relative_start_height = (node_offset_y + node_top_row) / (node_height or 1)
+        eh = edge_height or 1
+        height_in_rows = math.ceil(node_height / eh) or 1
+        start_height = max(int(relative_start_height * height_in_rows), 0)
+        width_in_columns = math.ceil(node_width / float(edge_width or 1)) + 1
+        left_adjust = int(width_in_columns / -2)
+        return left_adjust, -start_height, width_in_columns, height_in_rows
+
+    def draw_tree_with_contours(self, tree_top):
+        """ Same as grid-based draw_tree, but subtrees are fitted together by their contours,
+        which takes linear time. """
+
+        def _children(node):
+            if node.is_triangle_host():
+                return []
+            return node.get_children(visible=True)
+
+        def _accept(node, parent):
+            return self.forest.should_we_draw(node, parent) and not node.locked_to_node
+
+        layout = ContourLayout(self.grid_size, _children, accept=_accept)
+        positions = layout.layout(tree_top, done=self.done_nodes)
+        edge_height = prefs.edge_height
+        edge_width = prefs.edge_width / 2
+        offset_x = layout.width * edge_width / -2
+        offset_y = layout.height * edge_height / -2
+        height_reduction = (edge_height / 3.0) / (layout.height or 1)
+        for node, (x, y) in positions.items():
+            # rows get lower towards the bottom, as in grid-based drawing
+            height_now = offset_y + (y + 1) * edge_height - height_reduction * y * (y + 1) / 2
+            node.move_to(offset_x + x * edge_width, height_now, valign=g.TOP,
+                         align=g.CENTER_ALIGN)
 
     def draw_tree(self, tree_top):
         """ Divide and conquer algorithm using a grid. Result is much like latex qtree. 
@@ -55,23 +102,14 @@ class BalancedGridBasedTree(BalancedTree):
         .L.........                
         
         """
+        if self.use_contour_layout:
+            self.draw_tree_with_contours(tree_top)
+            return
         only_similar = True
         edge_height = prefs.edge_height
         edge_width = prefs.edge_width / 2
 
-        def _get_grid_size(mnode):
-            br = mnode.future_children_bounding_rect(limit_height=False)
-            node_width = br.width()
-            node_height = br.height()
-            node_offset_y = br.y()
-            node_top_row = mnode.get_top_y()
-            relative_start_height = (node_offset_y + node_top_row) / node_height
-            eh = edge_height or 1
-            height_in_rows = math.ceil(node_height / eh) or 1
-            start_height = max(int(relative_start_height * height_in_rows), 0)
-            width_in_columns = math.ceil(node_width / float(edge_width or 1)) + 1
-            left_adjust = int(width_in_columns / -2)
-            return left_adjust, -start_height, width_in_columns, height_in_rows
+        _get_grid_size = self.grid_size
 
         def _build_grid(node, parent, done: set):
             last_drawn_child = None
@@ -25,6 +25,7 @@
 import math
 
 import kataja.globals as g
+from kataja.ContourLayout import ContourLayout
 from kataja.Grid import Grid
 from kataja.Visualization import BaseVisualization
 from kataja.saved.Movable import Movable
@@ -60,6 +61,7 @@ class HeadDownTree(BaseVisualization):
     name = 'Head down trees'
     banned_cn_shapes = (g.BRACKETED,)
     use_rotation = False
+    use_contour_layout = True
 
     def __init__(self):
         BaseVisualization.__init__(self)
@@ -100,6 +102,86 @@ class HeadDownTree(BaseVisualization):
                 return True
         return True
 
+    @staticmethod
+    def grid_size(node):
+        """ Node's extent in grid units
+        :return: left_adjust, top_adjust, width_in_columns, height_in_rows
+        """
+        edge_height = prefs.edge_height
+        edge_width = prefs.edge_width / 2
+        mnode_br = node.future_children_bounding_rect(limit_height=True)
+        node_width = mnode_br.width()
+        node_height = mnode_br.height()
+        node_top_row = node.get_top_y()
+        node_offset_y = mnode_br.y()
+        if node_height == 0:
+            relative_start_height = 0
+        else:
+            relative_start_height = (node_offset_y + node_top_row) / node_height
+
+        if edge_height == 0:
+            height_in_rows = 1
+        else:
+            height_in_rows = math.ceil(node_height / float(edge_height))  # + 1
+        start_height = max(int(relative_start_height * height_in_rows), 0)
+
+        if edge_width == 0:
+            width_in_columns = 1
+        else:
+            width_in_columns = math.ceil(node_width / float(edge_width))
+        left_adjust = int(width_in_columns / -2)
+        return left_adjust, -start_height, width_in_columns, height_in_rows
+
+    @staticmethod
+    def place_above_head(node, children, cols):
+        """ Instead of putting merger node between the children, merger node goes above the
+        head node. If there is no head node, default to left node.
+        """
+        if len(children) == 1:
+            return cols[0]
+        heads = node.get_heads()
+        if not heads:
+            return 0
+        projecting_child = None
+        for child in children:
+            if not hasattr(child, 'heads'):
+                continue
+            if child in heads:
+                projecting_child = child
+        if not projecting_child:
+            projecting_child = children[0]
+        edge = node.get_edge_to(projecting_child)
+        if edge.direction() == g.LEFT:
+            node.magnet_mapper = left_bottom_is_bottom_center
+        elif edge.direction() == g.RIGHT:
+            node.magnet_mapper = right_bottom_is_bottom_center
+        return cols[children.index(projecting_child)]
+
+    def draw_tree_with_contours(self, tree_top):
+        """ Same as grid-based draw_tree, but subtrees are fitted together by their contours,
+        which takes linear time. """
+
+        def _children(node):
+            if node.is_triangle_host():
+                return []
+            return node.get_children(visible=True)
+
+        def _accept(node, parent):
+            return self.forest.should_we_draw(node, parent) and not node.locked_to_node
+
+        layout = ContourLayout(self.grid_size, _children, accept=_accept,
+                               place_parent=self.place_above_head)
+        positions = layout.layout(tree_top)
+        edge_height = prefs.edge_height
+        edge_width = prefs.edge_width / 2
+        offset_x = self.trees_width
+        height_reduction = (edge_height / 3.0) / (layout.height or 1)
+        for node, (x, y) in positions.items():
+            height_now = (y + 1) * edge_height - height_reduction * y * (y + 1) / 2
+            node.move_to(offset_x + x * edge_width, height_now, valign=g.TOP,
+                         align=g.CENTER_ALIGN)
+        self.trees_width += layout.width * edge_width
+
     # @time_me
     def draw_tree(self, tree_top):
         """ Divide and conquer algorithm using a grid. Result is much like latex qtree.
@@ -122,32 +204,13 @@ class HeadDownTree(BaseVisualization):
         .L.........
 
         """
+        if self.use_contour_layout:
+            self.draw_tree_with_contours(tree_top)
+            return
         edge_height = prefs.edge_height
         edge_width = prefs.edge_width / 2
 
-        def _get_grid_size(mnode):
-            mnode_br = mnode.future_children_bounding_rect(limit_height=True)
-            node_width = mnode_br.width()
-            node_height = mnode_br.height()
-            node_top_row = mnode.get_top_y()
-            node_offset_y = mnode_br.y()
-            if node_height == 0:
-                relative_start_height = 0
-            else:
-                relative_start_height = (node_offset_y + node_top_row) / node_height
-
-            if edge_height == 0:
-                height_in_rows = 1
-            else:
-                height_in_rows = math.ceil(node_height / float(edge_height))  # + 1
-            start_height = max(int(relative_start_height * height_in_rows), 0)
-
-            if edge_width == 0:
-                width_in_columns = 1
-            else:
-                width_in_columns = math.ceil(node_width / float(edge_width))
-            left_adjust = int(width_in_columns / -2)
-            return left_adjust, -start_height, width_in_columns, height_in_rows
+        _get_grid_size = self.grid_size
 
         def _build_grid(node, parent=None):
             if node.locked_to_node:
@@ -27,6 +27,7 @@ import math
 import random
 
 import kataja.globals as g
+from kataja.ContourLayout import StaggeredContourLayout
 from kataja.Grid import Grid
 from kataja.Visualization import BaseVisualization
 from kataja.singletons import prefs
@@ -39,6 +40,7 @@ class LeftFirstTree(BaseVisualization):
     name = 'Left first trees'
     banned_cn_shapes = (g.BRACKETED, g.SCOPEBOX)
     use_rotation = True
+    use_contour_layout = True
 
     def __init__(self):
         BaseVisualization.__init__(self)
@@ -147,9 +149,108 @@ class LeftFirstTree(BaseVisualization):
             elif len(children) == 2:
                 nx += x_step * 2
 
+    def draw_tree_with_contours(self, tree_top):
+        """ Same placement as _put_to_grid, but checking for room is done with the contours of
+        already placed subtrees instead of looking up cells and paths in a grid. Columns and rows
+        that have big nodes are widened like in grid-based draw_tree, walking through the nodes
+        instead of every cell of the grid. """
+        edge_height = prefs.edge_height
+        edge_width = prefs.edge_width
+        self._shuffle = self.forest.settings.get('linearization_mode') == g.RANDOM_NO_LINEARIZATION
+        if not (tree_top and tree_top.node_type == g.CONSTITUENT_NODE):
+            return
+
+        def _children(node):
+            if node.is_triangle_host():
+                return []
+            children = [x for x in node.get_children(visible=True) if not x.locked_to_node]
+            if self._shuffle and len(children) > 1:
+                random.shuffle(children)
+            return children
+
+        def _accept(node, parent):
+            return not node.locked_to_node and self.forest.should_we_draw(node, parent)
+
+        layout = StaggeredContourLayout(None, _children, accept=_accept)
+        positions = layout.layout(tree_top)
+        rows = {}
+        opens_left = set()
+        for node, (x_i, y_i) in positions.items():
+            rows.setdefault(y_i, []).append((x_i, node))
+            for child, (dx, dy) in layout.offsets.get(node, ()):
+                if dx < 0:
+                    opens_left.add(node)
+                    break
+        extra_widths = {}
+        extra_heights = {}
+
+        def _extra_before(col):
+            return sum(w for c, w in extra_widths.items() if c <= col)
+
+        for y_i in sorted(rows):
+            extra_height = 0
+            prev_width = 0
+            prev_height = 0
+            prev_x_i = None
+            for x_i, node in sorted(rows[y_i], key=lambda item: item[0]):
+                cbr = node.future_children_bounding_rect(limit_height=False)
+                height_spillover = cbr.bottom() - edge_height
+                if height_spillover > extra_height:
+                    if edge_height:
+                        extra_height = math.ceil(
+                            height_spillover / float(edge_height)) * edge_height
+                    else:
+                        extra_height = math.ceil(height_spillover)
+                width_spillover = ((cbr.width() + prev_width) / 2) - (edge_width * 2)
+                if width_spillover > extra_widths.get(x_i, 0):
+                    if edge_width:
+                        extra_widths[x_i] = math.ceil(
+                            width_spillover / float(edge_width)) * edge_width
+                    else:
+                        extra_widths[x_i] = math.ceil(width_spillover)
+                # fix cases where bottom half of tall node is overlapped by edges from smaller
+                # node beside it, see draw_tree
+                if prev_height > cbr.height() and prev_x_i == x_i - 2 and node in opens_left:
+                    x = x_i * edge_width + _extra_before(x_i)
+                    prev_x = prev_x_i * edge_width + _extra_before(prev_x_i)
+                    edge_box_left_x = x - cbr.width() / 3 - edge_width
+                    prev_box_right_x = prev_x + (prev_width / 2)
+                    width_overlap = prev_box_right_x - edge_box_left_x
+                    height_overlap = prev_height - cbr.height()
+                    if extra_widths.get(x_i, 0) < width_overlap:
+                        extra_widths[x_i] = width_overlap
+                    if extra_height < height_overlap:
+                        extra_height = height_overlap
+                prev_width = cbr.width()
+                prev_height = cbr.height()
+                prev_x_i = x_i
+            extra_heights[y_i] = extra_height
+        # cumulative extra widths and heights, so that each node can be placed directly
+        x_shifts = {}
+        total = 0
+        for x_i in sorted(extra_widths):
+            total += extra_widths[x_i]
+            x_shifts[x_i] = total
+        shift_cols = sorted(x_shifts)
+        y = 0
+        prev_y_i = 0
+        for y_i in sorted(rows):
+            y += (y_i - prev_y_i) * edge_height
+            prev_y_i = y_i
+            i = 0
+            for x_i, node in sorted(rows[y_i], key=lambda item: item[0]):
+                while i < len(shift_cols) and shift_cols[i] <= x_i:
+                    i += 1
+                x_shift = x_shifts[shift_cols[i - 1]] if i else 0
+                node.move_to(x_i * edge_width + x_shift, y, valign=g.TOP, align=g.CENTER_ALIGN)
+            y += extra_heights[y_i]
+
     def draw_tree(self, tree_top):
         """ Draws the trees to a table or a grid, much like latex qtree and
         then scales the grid to the scene. """
+        if self.use_contour_layout:
+            self.draw_tree_with_contours(tree_top)
+            return
         edge_height = prefs.edge_height
         edge_width = prefs.edge_width
         merged_grid = Grid()
@@ -1,8 +1,10 @@
+import copy
+
 import kataja.globals as g
 import plugins.FreeDrawing.OverlayButtons as OB
 import plugins.FreeDrawing.TouchAreas as TA
 from kataja.SavedField import SavedField
-from kataja.parser.INodes import as_html, extract_triangle, join_lines
+from kataja.parser.INodes import as_html, join_lines
 from plugins.FreeDrawing.ConstituentNodeEditEmbed import ConstituentNodeEditEmbed
 from kataja.saved.movables.nodes.ConstituentNode import ConstituentNode
 from kataja.singletons import classes, ctrl
@@ -67,28 +69,30 @@ class EditableConstituentNode(ConstituentNode):
     def load_values_from_parsernode(self, parsernode):
         """ Update constituentnode with values from parsernode """
 
-        def remove_dot_label(inode, row_n):
-            for i, part in enumerate(list(inode.parts)):
-                if isinstance(part, str):
-                    if part.startswith('.'):
-                        inode.parts[i] = part[1:]
-                    return True
-                else:
-                    return remove_dot_label(part, row_n)
-
-        extract_triangle(self.label, remove_from_original=True)
+        def without_dot_label(inode):
+            """ Copy of the first row with the leading '.' removed. Parsed rows are shared, so
+            they are not modified.
+            :return: (INode or str, bool -- if the first string was found)
+            """
+            if isinstance(inode, str):
+                return (inode[1:] if inode.startswith('.') else inode), True
+            if not inode.parts:
+                return inode, False
+            first = inode.parts[0]
+            new_first, found = without_dot_label(first)
+            if new_first is first:
+                return inode, found
+            new_node = copy.copy(inode)
+            new_node.parts = [new_first] + inode.parts[1:]
+            return new_node, found
 
         if parsernode.index:
             self.index = parsernode.index
-        rows = parsernode.label_rows
+        rows = list(parsernode.label_rows)
 
         # Remove dotlabel
-        for i, row in enumerate(list(rows)):
-            if isinstance(row, str):
-                if row.startswith('.'):
-                    rows[i] = row[1:]
-                break
-            stop = remove_dot_label(row, i)
+        for i, row in enumerate(rows):
+            rows[i], stop = without_dot_label(row)
             if stop:
                 break
         self.label = join_lines(rows)
@@ -8,6 +8,7 @@ class EditableForest(Forest):
     def __init__(self, heading_text='', comments=None, syntax=None):
         Forest.__init__(self, heading_text=heading_text, comments=comments, syntax=syntax)
         self.should_add_to_scene = False
+        self.synced_synobjs = {}  # node uid -> (signature, synobj), see nodes_to_synobjs
 
     def init_factories(self):
         super().init_factories()
@@ -16,6 +17,7 @@ class EditableForest(Forest):
     def clear(self):
         super().clear()
         self.drawing = FreeDrawing(self)
+        self.synced_synobjs = {}
 
     def forest_edited(self):
         super().forest_edited()
@@ -38,13 +38,26 @@ def figure_out_syntactic_label(cn):
         return ''
 
 
+def label_signature(node):
+    """ Parts of node that affect the label given to its syntactic object, in comparable form.
+    :param node:
+    :return: tuple
+    """
+    return as_text(node.label, omit_index=True), bool(node.triangle_stack)
+
+
 # @time_me
 def nodes_to_synobjs(forest, syntax, roots: list):
     """ Rebuild syntactic objects based on information in nodes. Understand that this means that
     syntactic objects cannot have data directly set to them -- it will be overwritten or ignored
     by this operation.
 
-    This is called after every tree-changing operation in free drawing -mode
+    This is called after every tree-changing operation in free drawing -mode, so the work is
+    limited to nodes that have changed: if forest has a 'synced_synobjs' -dict (node uid ->
+    (signature, synobj)), a node whose label, features, children and heads are the same as in
+    previous call and whose children didn't need reconverting keeps its syntactic object as it
+    is. Only the changed nodes and the path from them to the root are reconverted. Forests
+    without the dict are rebuilt fully.
 
     :param forest:
     :param syntax:
@@ -59,9 +72,19 @@ def nodes_to_synobjs(forest, syntax, roots: list):
     if roots is None:
         roots = []
 
+    synced = getattr(forest, 'synced_synobjs', None)
+    if synced is None:
+        synced = {}
     visited_nodes = set()
     converted_nodes = set()
+    changed_nodes = set()
     checked_features = set()
+    index_heads = None
+
+    def is_synced(node, signature):
+        """ Node's syntactic object can be kept if node is as it was in previous call """
+        old = synced.get(node.uid)
+        return old is not None and old[0] == signature and old[1] is node.syntactic_object
 
     def define_label(node):
         if node.label:
@@ -84,6 +107,11 @@ def nodes_to_synobjs(forest, syntax, roots: list):
         for fnode in feature_nodes:
             if fnode in converted_nodes:
                 features.append(fnode.syntactic_object)
+                continue
+            checked = fnode.get_children()
+            signature = (fnode.name, fnode.value, fnode.family)
+            if is_synced(fnode, signature):
+                fobj = fnode.syntactic_object
             else:
                 if fnode.syntactic_object:
                     fobj = fnode.syntactic_object
@@ -93,11 +121,14 @@ def nodes_to_synobjs(forest, syntax, roots: list):
                 else:
                     fobj = syntax.create_feature(name=fnode.name, value=fnode.value,
                                                  family=fnode.family)
-                features.append(fobj)
-                converted_nodes.add(fnode)
                 fnode.set_syntactic_object(fobj)
-                for checked in fnode.get_children():
-                    checked_features.add((fnode, checked))
+                synced[fnode.uid] = signature, fobj
+                changed_nodes.add(fnode)
+            features.append(fobj)
+            visited_nodes.add(fnode)
+            converted_nodes.add(fnode)
+            for checked_node in checked:
+                checked_features.add((fnode, checked_node))
         return features
 
     def convert_node(node):
@@ -107,20 +138,37 @@ def nodes_to_synobjs(forest, syntax, roots: list):
         if node.node_type == g.CONSTITUENT_NODE:
             convert_constituent_node(node)
 
+    def find_index_head(index):
+        nonlocal index_heads
+        if index_heads is None:
+            index_heads = {}
+            for n in forest.nodes.values():
+                if n.node_type == g.CONSTITUENT_NODE and n.index and not n.is_trace:
+                    index_heads[n.index] = n
+        return index_heads.get(index)
+
     def convert_constituent_node(node):
         if node.index and node.is_trace:
-            head, traces = forest.get_nodes_by_index(node.index)
+            head = find_index_head(node.index)
             if head:
                 if head not in converted_nodes:
                     convert_node(head)
-                node.syntactic_object = head.syntactic_object
+                if node.syntactic_object is not head.syntactic_object:
+                    node.syntactic_object = head.syntactic_object
+                    changed_nodes.add(node)
                 converted_nodes.add(node)
                 return
         children = node.get_children()
         features = convert_features(node)
+        for child in children:
+            convert_node(child)
+        signature = (label_signature(node), tuple(x.uid for x in children),
+                     tuple(x.uid for x in node.heads), tuple(x.uid for x in features),
+                     tuple(label_signature(x) for x in node.heads))
+        if is_synced(node, signature) and not any(x in changed_nodes for x in children):
+            converted_nodes.add(node)
+            return
         if len(children) == 2:
-            for child in children:
-                convert_node(child)
             n1, n2 = children
             synobj = syntax.merge(n1.syntactic_object, n2.syntactic_object,
                                   c=node.syntactic_object)
@@ -133,7 +181,6 @@ def nodes_to_synobjs(forest, syntax, roots: list):
                 node.is_syntactically_valid = True
         elif len(children) == 1:
             n1 = children[0]
-            convert_node(n1)
             synobj = node.syntactic_object
             if not synobj:
                 synobj = syntax.create_constituent(label='')
@@ -152,8 +199,6 @@ def nodes_to_synobjs(forest, syntax, roots: list):
             node.is_syntactically_valid = True
             synobj.features = features
         else:
-            for child in children:
-                convert_node(child)
             label = define_label(node)
             synobj = node.syntactic_object
             if not synobj:
@@ -162,12 +207,22 @@ def nodes_to_synobjs(forest, syntax, roots: list):
             node.set_syntactic_object(synobj)
             node.is_syntactically_valid = False
             synobj.features = features
+        # label may have been filled in from heads, store signature as it is after conversion
+        signature = (label_signature(node),) + signature[1:]
+        synced[node.uid] = signature, synobj
+        changed_nodes.add(node)
         converted_nodes.add(node)
 
     for root in roots:
         convert_node(root)
-        for checker, checked in checked_features:
+    for checker, checked in checked_features:
+        if checker.syntactic_object.checks is not checked.syntactic_object:
             checker.syntactic_object.checks = checked.syntactic_object
 
+    # forget nodes that are not in the trees anymore
+    visited_uids = {node.uid for node in visited_nodes}
+    for uid in [uid for uid in synced if uid not in visited_uids]:
+        del synced[uid]
+
     #print('visited %s nodes, converted %s nodes to synobjs' % (
-    #    len(visited_nodes), len(converted_nodes)))
+    #    len(visited_nodes), len(changed_nodes)))
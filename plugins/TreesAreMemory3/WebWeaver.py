@@ -1,4 +1,5 @@
 import json
+import os
 from pathlib import Path
 from collections import Counter
 try:
@@ -97,12 +98,14 @@ class Web:
         self.routes = []
         self.heads = []
         self.label_count = Counter()
+        self.changed = True  # has something been added since last save_as_json
 
     def reset(self):
         print('reset web')
         if self.operations:
             self.all_operations.append(self.operations)
             self.all_routes.append(self.routes)
+            self.changed = True
         self.operations = {}
         self.routes = []
 
@@ -119,6 +122,7 @@ class Web:
                 ftype = POS_FEATURE
             fn = WNode(f_id, ftype)
             self.nodes[f_id] = fn
+            self.changed = True
             return fn
 
     def _get_or_add_node(self, label, type):
@@ -127,6 +131,7 @@ class Web:
         else:
             node = WNode(label, type)
             self.nodes[label] = node
+            self.changed = True
             return node
 
     def _get_or_add_const_node(self, const):
@@ -140,6 +145,7 @@ class Web:
                 self._get_or_add_edge(node, fnode)
                 node.features.append(fnode.id)
             self.nodes[const.label] = node
+            self.changed = True
             return node
 
     def _get_or_add_edge(self, node1, node2):
@@ -148,6 +154,7 @@ class Web:
             return self.edges[n_edge_id]
         n_edge = WEdge.from_nodes(node1, node2)
         self.edges[n_edge_id] = n_edge
+        self.changed = True
         return n_edge
 
     def _create_if_necessary(self, const):
@@ -178,6 +185,7 @@ class Web:
                     head_num = self.nodes[head_num_id]
                     arg_num = self.nodes[arg_num_id]
                     self.edges[edge_id] = WEdge(head_num, arg_num, NUMERATION_EDGE)
+                    self.changed = True
 
     def _nodefy(self, route_item):
         operation = route_item.operation
@@ -189,6 +197,7 @@ class Web:
 
         w_op = WOperation.from_operation(operation)
         self.operations[operation.uid] = w_op
+        self.changed = True
         w_op.head_ids = self._create_if_necessary(operation.head)
         w_op.arg_ids = self._create_if_necessary(operation.arg)
         self._create_dominance_relation(w_op.head_ids, w_op.arg_ids)
@@ -204,6 +213,7 @@ class Web:
             self.heads = []
             wroute = [self._nodefy(route_item) for route_item in route]
             self.routes.append(wroute)
+            self.changed = True
 
     def export(self):
         return {
@@ -214,12 +224,22 @@ class Web:
         }
 
     def save_as_json(self, path):
+        """ Write web into file, if it has changed since last save. The file is written under a
+        temporary name and then moved in place, so that webviewer/server.py, which reads the file
+        when its modification time changes, never sees it half-written.
+        :param path:
+        """
+        if not self.changed:
+            return
         path = Path(path)
         path.parent.mkdir(parents=True, exist_ok=True)
-        file = open(path, 'w')
+        tmp_path = path.with_name(path.name + '.tmp')
+        file = open(tmp_path, 'w')
         e = self.export()
         json.dump(e, file, ensure_ascii=False, indent=2)
         file.close()
+        os.replace(tmp_path, path)
+        self.changed = False
         #tot_states = sum([len(states) for states in e["states"]])
         #tot_routes = sum([len(routes) for routes in e["routes"]])
         print(f'wrote into file {path} {len(e["nodes"])} nodes, {len(e["links"])} edges, {len(e["states"])} operations and {len(e["routes"])} routes')
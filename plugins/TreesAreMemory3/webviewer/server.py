@@ -1,11 +1,20 @@
-from flask import Flask  # , jsonify, request
+import sys
 from os.path import join, realpath, dirname
 
+from flask import Flask
+
+# network model is shared with the main web viewer of Kataja. Web viewers are standalone flask
+# scripts that are run from their own directories (python server.py), not parts of a package, so
+# the main web viewer's directory is put to path to find its network module.
+sys.path.insert(0, join(realpath(dirname(__file__)), '..', '..', '..', 'webviewer'))
+from network import Network, network_response  # noqa: E402
+
 
 class Server(Flask):
     def __init__(self, data_path='data/data.json'):
         Flask.__init__(self, __name__, static_folder='static', static_url_path='')
         self.full_data_path = join(realpath(dirname(__file__)), data_path)
+        self.network = Network(self.full_data_path)
         print(f'serving data from {self.full_data_path}')
 
 
@@ -19,9 +28,8 @@ def index():
 
 @app.route('/api/net')
 def get_network():
-    print('trying to get network')
-    return open(app.full_data_path).read()
-    #return app.send_static_file(app.full_data_path)
+    """ Whole network, or with ?since=revision only the changes after that revision """
+    return network_response(app.network)
 
 
 @app.route('/api/reset')
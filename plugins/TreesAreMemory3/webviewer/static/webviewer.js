@@ -55,11 +55,44 @@ const post = (endpoint, data) => {
 };
 
 
+// Network as received from server. Server is polled for changes since the revision we have,
+// and the graph is redrawn only when there are changes.
+const POLL_INTERVAL = 2000;
+const net = {revision: 0, nodes: {}, links: {}, values: {}};
+const deltaKeys = ['revision', 'since', 'nodes', 'links', 'removed_nodes', 'removed_links'];
+
+const applyChanges = (data) => {
+    if (data.revision === net.revision) {
+        return false;
+    }
+    if (!data.since) {
+        net.nodes = {};
+        net.links = {};
+    }
+    (data.removed_nodes || []).forEach(id => delete net.nodes[id]);
+    (data.removed_links || []).forEach(id => delete net.links[id]);
+    data.nodes.forEach(nd => net.nodes[nd.id] = nd);
+    data.links.forEach(e => net.links[e.id] = e);
+    for (const key in data) {
+        if (!deltaKeys.includes(key)) {
+            net.values[key] = data[key];
+        }
+    }
+    net.revision = data.revision;
+    return true;
+};
+
 const openNetwork = () => {
-    get('/api/net').then(redrawGraph);
+    get(`/api/net?since=${net.revision}`).then(data => {
+        if (applyChanges(data)) {
+            redrawGraph(Object.assign({}, net.values,
+                {nodes: Object.values(net.nodes), links: Object.values(net.links)}));
+        }
+    });
 }
 
 openNetwork()
+setInterval(openNetwork, POLL_INTERVAL)
 
 svg.append("rect")
     .attr("fill", "none")
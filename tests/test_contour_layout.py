@@ -0,0 +1,242 @@
+import random
+import unittest
+from unittest import mock
+
+from kataja.singletons import running_environment
+
+running_environment.switch_to_test_mode()
+
+import kataja.visualizations.BalancedGridBasedTree as balanced_grid_based_tree
+from kataja.ContourLayout import ContourLayout, Outline, StaggeredContourLayout
+
+
+class Node:
+    """ Stand-in for Node: children, size in grid units and the position where visualization
+    moves it. """
+    locked_to_node = None
+
+    def __init__(self, name, *children, width=3, top=0, height=1):
+        self.name = name
+        self.children = list(children)
+        self.size = (-(width // 2), top, width, height)
+        self.position = None
+
+    def __repr__(self):
+        return self.name
+
+    def get_children(self, visible=False):
+        return self.children
+
+    def is_triangle_host(self):
+        return False
+
+    def move_to(self, x, y, **kwargs):
+        self.position = (x, y)
+
+
+def size(node):
+    return node.size
+
+
+def children(node):
+    return node.children
+
+
+def all_nodes(top):
+    nodes = []
+    stack = [top]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack += node.children
+    return nodes
+
+
+def random_tree(rnd, count):
+    """ Tree with count nodes of varying sizes, each new node added under a random earlier one """
+    nodes = [Node('n0', width=rnd.randint(2, 9))]
+    for i in range(1, count):
+        node = Node(f'n{i}', width=rnd.randint(2, 9), height=rnd.randint(1, 3))
+        rnd.choice(nodes).children.append(node)
+        nodes.append(node)
+    return nodes[0]
+
+
+def chain(count):
+    top = node = Node('n0')
+    for i in range(1, count):
+        child = Node(f'n{i}')
+        node.children.append(child)
+        node = child
+    return top
+
+
+def comb(count):
+    """ Left-branching tree where each node has a subtree and a leaf as its children """
+    top = node = Node('n0')
+    for i in range(1, count, 2):
+        child = Node(f'n{i}')
+        node.children += [child, Node(f'leaf{i}')]
+        node = child
+    return top
+
+
+def contour_steps(top):
+    """ How many times outline rows are read or written when top is laid out. This is the work
+    done in merging and separating contours. """
+    steps = [0]
+
+    def counted(method):
+        def wrapper(*args):
+            steps[0] += 1
+            return method(*args)
+        return wrapper
+
+    with mock.patch.object(Outline, 'get', counted(Outline.get)), \
+            mock.patch.object(Outline, 'put', counted(Outline.put)):
+        ContourLayout(size, children).layout(top)
+    return steps[0]
+
+
+class TestContourLayout(unittest.TestCase):
+    def test_rows_dont_overlap(self):
+        rnd = random.Random(4)
+        for i in range(30):
+            top = random_tree(rnd, rnd.randint(2, 60))
+            layout = ContourLayout(size, children)
+            positions = layout.layout(top)
+            self.assertEqual(len(positions), len(all_nodes(top)))
+            rows = {}
+            for node, (col, row) in positions.items():
+                left, top_row, width, height = node.size
+                for r in range(row + top_row, row + top_row + height):
+                    rows.setdefault(r, []).append((col + left, col + left + width, node))
+            for r, spans in rows.items():
+                self.assertGreaterEqual(r, 0)
+                self.assertLess(r, layout.height)
+                spans.sort(key=lambda span: span[0])
+                self.assertGreaterEqual(spans[0][0], 0)
+                self.assertLess(spans[-1][1], layout.width)
+                for (l1, r1, n1), (l2, r2, n2) in zip(spans, spans[1:]):
+                    self.assertLess(r1, l2, f'{n1} and {n2} overlap on row {r}')
+
+    def test_parent_is_centred_over_children(self):
+        rnd = random.Random(7)
+        top = random_tree(rnd, 80)
+        positions = ContourLayout(size, children).layout(top)
+        for node in all_nodes(top):
+            col, row = positions[node]
+            if node.children:
+                cols = [positions[child][0] for child in node.children]
+                self.assertEqual(col, sum(cols) // len(cols))
+                for child in node.children:
+                    self.assertGreater(positions[child][1], row)
+
+    def test_subtrees_are_packed(self):
+        #      s
+        #    /   \
+        #   a     b      a's subtree is wide only at the bottom, b fits close to a
+        #  / \
+        # c   d
+        c, d = Node('c'), Node('d')
+        a = Node('a', c, d)
+        b = Node('b')
+        s = Node('s', a, b)
+        positions = ContourLayout(size, children).layout(s)
+        self.assertEqual(positions[d][0] - positions[c][0], 4)
+        self.assertEqual(positions[b][0] - positions[a][0], 4)
+        self.assertEqual(positions[s][0], (positions[a][0] + positions[b][0]) // 2)
+
+    def test_done_nodes_and_accept(self):
+        shared = Node('shared')
+        a = Node('a', shared)
+        b = Node('b', shared)
+        hidden = Node('hidden')
+        s = Node('s', a, b, hidden)
+        done = set()
+        layout = ContourLayout(size, children, accept=lambda node, parent: node is not hidden)
+        positions = layout.layout(s, done=done)
+        self.assertEqual(set(positions), {s, a, b, shared})
+        self.assertEqual(done, {s, a, b, shared})
+        self.assertEqual(positions[shared][0], positions[a][0])
+        self.assertEqual(layout.layout(s, done=done), {})
+        self.assertEqual((layout.width, layout.height), (0, 0))
+
+    def test_deep_trees_are_linear(self):
+        # work per node stays the same when trees get deeper, a layout that walks whole
+        # contours at every level would do 16 times the work for 4 times the nodes
+        for build in (chain, comb):
+            small = contour_steps(build(4000))
+            large = contour_steps(build(16000))
+            self.assertLess(large, small * 4.1, build.__name__)
+        positions = ContourLayout(size, children).layout(chain(4000))
+        self.assertEqual(len(positions), 4000)
+        self.assertEqual({col for col, row in positions.values()}, {1})
+        self.assertEqual(max(row for col, row in positions.values()), 3999 * 2)
+
+
+class TestStaggeredContourLayout(unittest.TestCase):
+    def test_children_go_down_and_right(self):
+        c, d = Node('c'), Node('d')
+        s = Node('s', c, d)
+        layout = StaggeredContourLayout(size, children)
+        positions = layout.layout(s)
+        sx, sy = positions[s]
+        self.assertEqual((positions[c][0] - sx, positions[c][1] - sy), (-2, 2))
+        self.assertEqual((positions[d][0] - sx, positions[d][1] - sy), (2, 2))
+
+    def test_subtrees_are_moved_until_they_fit(self):
+        rnd = random.Random(2)
+        for i in range(20):
+            top = random_tree(rnd, rnd.randint(2, 30))
+            positions = StaggeredContourLayout(size, children, max_tries=100).layout(top)
+            self.assertEqual(len(set(positions.values())), len(positions))
+
+
+class TestBalancedGridBasedTree(unittest.TestCase):
+    """ Contour layout gives the same result as grid-based draw_tree """
+
+    class Forest:
+        def should_we_draw(self, node, parent):
+            return True
+
+    def draw(self, top, use_contour_layout):
+        vis = balanced_grid_based_tree.BalancedGridBasedTree.__new__(
+            balanced_grid_based_tree.BalancedGridBasedTree)
+        vis.forest = self.Forest()
+        vis.done_nodes = set()
+        vis.use_contour_layout = use_contour_layout
+        vis.grid_size = size
+        # grid-based drawing moves only Movables
+        with mock.patch.object(balanced_grid_based_tree, 'Movable', Node):
+            vis.draw_tree(top)
+        return {node: node.position for node in all_nodes(top)}
+
+    def assert_same_drawing(self, top):
+        grid = self.draw(top, False)
+        contour = self.draw(top, True)
+        for node, (x, y) in grid.items():
+            self.assertAlmostEqual(contour[node][0], x, msg=node)
+            self.assertAlmostEqual(contour[node][1], y, msg=node)
+
+    def tree(self, spec):
+        """ Node for (label, child, child...) or label, widths as in grid_size for short labels """
+        if isinstance(spec, tuple):
+            label, *child_specs = spec
+            return Node(label, *[self.tree(child) for child in child_specs], width=len(label) + 1)
+        return Node(spec, width=len(spec) + 1)
+
+    def test_small_trees(self):
+        self.assert_same_drawing(self.tree(('S', 'a', 'b')))
+        self.assert_same_drawing(self.tree(('S', ('NP', 'the', 'man'),
+                                            ('VP', 'hit', ('NP', 'the', 'ball')))))
+        self.assert_same_drawing(self.tree(('S', ('X', 'a'), 'b', 'c')))
+        self.assert_same_drawing(self.tree(('TP', ('DP', 'D', 'N'),
+                                            ('T1', 'T', ('VP', 'V', ('DP', 'D', 'N'))))))
+
+    def test_left_branching_tree(self):
+        self.assert_same_drawing(self.tree(('S', ('A', ('B', ('C', 'x', 'y'), 'z'), 'w'), 'v')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from kataja.singletons import running_environment
+
+running_environment.switch_to_test_mode()
+
+from kataja.Shapes import SHAPE_PRESETS
+from kataja.globals import GLOSS_SETTINGS, PAINT_AND_UI_SETTINGS, LAYOUT_SETTINGS, NODE_SETTINGS
+from kataja.saved.movables.nodes.CommentNode import CommentNode
+from kataja.saved.movables.nodes.ConstituentNode import ConstituentNode
+from kataja.saved.movables.nodes.FeatureNode import FeatureNode
+from kataja.saved.movables.nodes.GlossNode import GlossNode
+from kataja.settings.Preferences import Preferences
+
+
+def default_setting_keys():
+    """ Keys that can be sent to prefs.bump_settings_generation: preferences and the settings
+    of node types, edge types and edge shapes. """
+    prefs = Preferences(running_environment)
+    keys = {key for key in vars(prefs) if not key.startswith('_') and
+            key not in Preferences.not_saved}
+    for edge_style in prefs.edges.values():
+        keys |= set(edge_style)
+    for shape in SHAPE_PRESETS.values():
+        keys |= set(shape.defaults)
+    for node_class in (ConstituentNode, FeatureNode, GlossNode, CommentNode):
+        for style in node_class.default_style.values():
+            keys |= set(style)
+    return keys
+
+
+class TestDrawSettings(unittest.TestCase):
+    groups = {'GLOSS_SETTINGS': GLOSS_SETTINGS, 'PAINT_AND_UI_SETTINGS': PAINT_AND_UI_SETTINGS,
+              'LAYOUT_SETTINGS': LAYOUT_SETTINGS, 'NODE_SETTINGS': NODE_SETTINGS}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.keys = default_setting_keys()
+
+    def test_every_setting_is_classified(self):
+        classified = set().union(*self.groups.values())
+        self.assertEqual(self.keys - classified, set(),
+                         'add new settings to one of the sets in kataja/globals.py')
+
+    def test_classified_settings_exist(self):
+        for name, group in self.groups.items():
+            self.assertEqual(group - self.keys, set(), f'unknown settings in {name}')
+
+    def test_sets_are_disjoint(self):
+        names = list(self.groups)
+        for i, name in enumerate(names):
+            for other in names[i + 1:]:
+                self.assertEqual(self.groups[name] & self.groups[other], set(),
+                                 f'{name} and {other} overlap')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+from kataja.OrderedSet import OrderedSet
+
+
+class TestOrderedSet(unittest.TestCase):
+    def test_keeps_insertion_order(self):
+        s = OrderedSet(['c', 'a', 'b', 'a'])
+        self.assertEqual(list(s), ['c', 'a', 'b'])
+        s.add('c')
+        self.assertEqual(list(s), ['c', 'a', 'b'])
+        s.add('d')
+        self.assertEqual(list(reversed(s)), ['d', 'b', 'a', 'c'])
+        self.assertEqual(len(s), 4)
+        self.assertIn('a', s)
+        self.assertNotIn('x', s)
+
+    def test_index_empty(self):
+        s = OrderedSet()
+        for i in (0, -1, 1, -2):
+            with self.assertRaises(IndexError):
+                s[i]
+        self.assertEqual(s[:], [])
+
+    def test_index_one_item(self):
+        s = OrderedSet(['a'])
+        self.assertEqual(s[0], 'a')
+        self.assertEqual(s[-1], 'a')
+        for i in (1, -2):
+            with self.assertRaises(IndexError):
+                s[i]
+
+    def test_index_many_items(self):
+        s = OrderedSet(['a', 'b', 'c', 'd'])
+        self.assertEqual(s[0], 'a')
+        self.assertEqual(s[-1], 'd')
+        self.assertEqual(s[1], 'b')
+        self.assertEqual(s[3], 'd')
+        self.assertEqual(s[-2], 'c')
+        self.assertEqual(s[-4], 'a')
+        self.assertEqual(s[1:3], ['b', 'c'])
+        with self.assertRaises(IndexError):
+            s[4]
+        with self.assertRaises(IndexError):
+            s[-5]
+
+    def test_mutation_during_iteration(self):
+        s = OrderedSet(['a', 'b', 'c'])
+        seen = []
+        for item in s:
+            seen.append(item)
+            s.discard(item)
+            s.add(item + '2')
+        self.assertEqual(seen, ['a', 'b', 'c'])
+        self.assertEqual(list(s), ['a2', 'b2', 'c2'])
+        for item in reversed(s):
+            s.clear()
+        self.assertEqual(len(s), 0)
+
+    def test_equality(self):
+        s = OrderedSet(['a', 'b'])
+        self.assertEqual(s, ['a', 'b'])
+        self.assertNotEqual(s, ['b', 'a'])
+        self.assertEqual(s, ('a', 'b'))
+        self.assertEqual(s, OrderedSet(['a', 'b']))
+        self.assertNotEqual(s, OrderedSet(['b', 'a']))
+        self.assertEqual(s, {'b', 'a'})
+        self.assertNotEqual(s, {'a'})
+        self.assertEqual(OrderedSet(), [])
+
+    def test_discard_and_remove(self):
+        s = OrderedSet(['a', 'b', 'c'])
+        s.discard('b')
+        self.assertEqual(list(s), ['a', 'c'])
+        s.discard('x')
+        self.assertEqual(list(s), ['a', 'c'])
+        s.remove('a')
+        self.assertEqual(list(s), ['c'])
+        with self.assertRaises(KeyError):
+            s.remove('a')
+        s.add('a')
+        self.assertEqual(s[-1], 'a')
+
+    def test_copy_is_independent(self):
+        s = OrderedSet(['a', 'b'])
+        c = s.copy()
+        c.add('c')
+        self.assertEqual(list(s), ['a', 'b'])
+        self.assertEqual(list(c), ['a', 'b', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
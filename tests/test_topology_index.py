@@ -0,0 +1,193 @@
+import sys
+import unittest
+
+from PyQt6 import QtWidgets
+
+from kataja.singletons import running_environment
+
+running_environment.switch_to_test_mode()
+
+from kataja.TopologyIndex import TopologyIndex
+
+
+class Node:
+    """ Stand-in for Node: only the methods that TopologyIndex uses. Children that are of other
+    type are in other_children and reachable only through get_all_children. """
+
+    def __init__(self, name):
+        self.name = name
+        self.children = []
+        self.other_children = []
+        self.parents = []
+        self.other_parents = []
+
+    def __repr__(self):
+        return self.name
+
+    def add(self, *children):
+        for child in children:
+            self.children.append(child)
+            child.parents.append(self)
+        return self
+
+    def add_other(self, *children):
+        for child in children:
+            self.other_children.append(child)
+            child.other_parents.append(self)
+        return self
+
+    def get_children(self, visible=False):
+        return list(self.children)
+
+    def get_all_children(self, visible=False):
+        return self.children + self.other_children
+
+    def get_parents(self):
+        return list(self.parents)
+
+    def get_all_parents(self, visible=False):
+        return self.parents + self.other_parents
+
+
+def nodes(names):
+    return [Node(name) for name in names.split()]
+
+
+class TestTopologyIndex(unittest.TestCase):
+    def setUp(self):
+        #        a
+        #      /   \
+        #     b     c
+        #    / \   / \
+        #   d   e f   g     + feature h under d, e is also a child of c
+        self.a, self.b, self.c, self.d, self.e, self.f, self.g, self.h = nodes('a b c d e f g h')
+        self.a.add(self.b, self.c)
+        self.b.add(self.d, self.e)
+        self.c.add(self.e, self.f, self.g)
+        self.d.add_other(self.h)
+        self.index = TopologyIndex(None)
+
+    def test_sorted_nodes(self):
+        a, b, c, d, e, f, g, h = self.a, self.b, self.c, self.d, self.e, self.f, self.g, self.h
+        self.assertEqual(self.index.sorted_nodes(a), [a, b, d, h, e, c, f, g])
+        self.assertEqual(self.index.sorted_nodes(c), [c, e, f, g])
+        self.assertEqual(self.index.parents(a), {b: a, d: b, h: d, e: b, c: a, f: c, g: c})
+        self.assertEqual(self.index.positions(a)[c], 5)
+
+    def test_multidominated_node_listed_once(self):
+        top = Node('top')
+        below = top
+        # every level doubles the number of paths to the bottom
+        for i in range(40):
+            left, right, join = nodes(f'l{i} r{i} j{i}')
+            below.add(left, right)
+            left.add(join)
+            right.add(join)
+            below = join
+        sorted_nodes = self.index.sorted_nodes(top)
+        self.assertEqual(len(sorted_nodes), 121)
+        self.assertEqual(len(set(sorted_nodes)), 121)
+        self.assertEqual(sorted_nodes.count(self.e), 0)
+        self.assertEqual(self.index.sorted_nodes(self.a).count(self.e), 1)
+        self.assertEqual(self.index.dominated_nodes(self.a).count(self.e), 1)
+        self.assertEqual(self.index.max_depth(below), 80)
+
+    def test_highest(self):
+        a, d, e, h = self.a, self.d, self.e, self.h
+        self.assertEqual(self.index.highest(e), [a])
+        self.assertEqual(self.index.highest(h), [a])
+        self.assertEqual(self.index.highest(a), [a])
+        other_top = Node('x').add(e)
+        self.index.invalidate()
+        self.assertCountEqual(self.index.highest(e), [a, other_top])
+        self.assertEqual(self.index.highest(d), [a])
+
+    def test_dominated_nodes(self):
+        a, b, c, d, e, f, g = self.a, self.b, self.c, self.d, self.e, self.f, self.g
+        self.assertEqual(self.index.dominated_nodes(a), [b, d, e, c, f, g])
+        self.assertEqual(self.index.dominated_nodes(b), [d, e])
+        self.assertEqual(self.index.dominated_nodes(d), [])
+
+    def test_max_depth(self):
+        a, b, c, d, e, h = self.a, self.b, self.c, self.d, self.e, self.h
+        self.assertEqual(self.index.max_depth(a), 0)
+        self.assertEqual(self.index.max_depth(b), 1)
+        self.assertEqual(self.index.max_depth(d), 2)
+        # feature nodes are not counted, they have a top of their own
+        self.assertEqual(self.index.max_depth(h), 0)
+        # longest path counts: e is below both b and a, and below x, y and z
+        x, y, z = nodes('x y z')
+        x.add(y)
+        y.add(z)
+        z.add(e)
+        self.index.invalidate()
+        self.assertEqual(self.index.max_depth(e), 3)
+
+    def test_cycle_terminates(self):
+        x, y, z = nodes('x y z')
+        x.add(y)
+        y.add(z)
+        z.add(x)
+        self.assertEqual(self.index.sorted_nodes(x), [x, y, z])
+        self.assertEqual(self.index.dominated_nodes(y), [z, x])
+        self.assertEqual(self.index.highest(x), [])
+        self.assertEqual(self.index.max_depth(x), 2)
+        self.assertEqual(self.index.max_depth(y), 0)
+
+    def test_results_are_cached_until_invalidated(self):
+        a, b, c = self.a, self.b, self.c
+        first = self.index.sorted_nodes(a)
+        self.assertIs(self.index.sorted_nodes(a), first)
+        new = Node('new')
+        c.add(new)
+        self.assertNotIn(new, self.index.sorted_nodes(a))
+        self.index.invalidate()
+        self.assertEqual(self.index.sorted_nodes(a)[-1], new)
+        self.assertEqual(self.index.max_depth(new), 2)
+
+
+class TestNodeInvalidatesIndex(unittest.TestCase):
+    """ Nodes in a real forest invalidate forest's index when their edges change """
+
+    @classmethod
+    def setUpClass(cls):
+        from kataja.KatajaMain import KatajaMain
+        cls._app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+        # paste action's enabler expects the clipboard to have some content
+        cls._app.clipboard().setText('')
+        cls._main = KatajaMain(cls._app, no_prefs=True)
+        cls._app.processEvents()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._main.close()
+
+    def setUp(self):
+        self.forest = self._main.forest
+        self.index = self.forest.topology_index
+        self.top = self.forest.trees[0]
+
+    def assert_poke_invalidates(self, attribute):
+        sorted_nodes = self.index.sorted_nodes(self.top)
+        self.assertIn(self.top, sorted_nodes)
+        self.assertTrue(self.index._sorted_nodes)
+        node = sorted_nodes[-1]
+        node.poke(attribute)
+        self.assertEqual(self.index._sorted_nodes, {})
+        self.assertEqual(self.index.sorted_nodes(self.top), sorted_nodes)
+        self.assertIsNot(self.index.sorted_nodes(self.top), sorted_nodes)
+
+    def test_poke_edges_up(self):
+        self.assert_poke_invalidates('edges_up')
+
+    def test_poke_edges_down(self):
+        self.assert_poke_invalidates('edges_down')
+
+    def test_other_pokes_keep_index(self):
+        sorted_nodes = self.index.sorted_nodes(self.top)
+        self.top.poke('triangle_stack')
+        self.assertIs(self.index.sorted_nodes(self.top), sorted_nodes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import copy
+import os
+import tempfile
+import unittest
+
+from kataja.parser.TreebankReader import TreebankReader, LazyForestList
+
+TREEBANK = """# comment line
+( (S (NP (DT The) (NN cat))
+     (VP (VBD sat))) )
+( (S (NP (PRP It)) (VP (VBD rained))) )
+
+(NP (NNS dogs))
+"""
+
+
+class Forest:
+    """ Stand-in for Forest: built forests are compared by identity, like real forests """
+
+    def __init__(self, tree):
+        self.tree = tree
+
+
+class TestLazyForestList(unittest.TestCase):
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.mrg')
+        with os.fdopen(fd, 'w') as f:
+            f.write(TREEBANK)
+        self.reader = TreebankReader(self.filename)
+        self.reader.scan()
+        self.built = []
+        self.forests = LazyForestList(self.reader, self.build_forest)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def build_forest(self, tree):
+        forest = Forest(tree)
+        self.built.append(forest)
+        return forest
+
+    def test_scan(self):
+        self.assertEqual(len(self.reader), 3)
+        self.assertEqual(self.reader.read(0),
+                         '( (S (NP (DT The) (NN cat)) (VP (VBD sat))) )')
+        self.assertEqual(self.reader.read(2), '(NP (NNS dogs))')
+        self.assertEqual(len(self.forests), 3)
+        self.assertEqual(self.built, [])
+
+    def test_index_builds_only_accessed(self):
+        forest = self.forests[1]
+        self.assertIsInstance(forest, Forest)
+        self.assertIs(self.forests[1], forest)
+        self.assertIs(self.forests[-2], forest)
+        self.assertEqual(self.built, [forest])
+        self.assertEqual(self.forests.built_forests(), [forest])
+
+    def test_pop(self):
+        last = self.forests.pop()
+        self.assertIsInstance(last, Forest)
+        self.assertEqual(last.tree, '(NP (NNS dogs))')
+        first = self.forests.pop(0)
+        self.assertIsInstance(first, Forest)
+        self.assertEqual(len(self.forests), 1)
+        self.assertIsInstance(self.forests[0], Forest)
+
+    def test_slices(self):
+        forests = self.forests[1:]
+        self.assertEqual(len(forests), 2)
+        self.assertTrue(all(isinstance(f, Forest) for f in forests))
+        self.assertEqual([f.tree for f in self.forests[::-1]],
+                         [self.reader.read(i) for i in (2, 1, 0)])
+        self.assertIs(self.forests[1:][0], forests[0])
+
+    def test_copy(self):
+        first = self.forests[0]
+        for copied in (self.forests.copy(), copy.copy(self.forests)):
+            self.assertIsInstance(copied, LazyForestList)
+            self.assertIs(copied[0], first)
+            self.assertIsInstance(copied[2], Forest)
+            self.assertEqual(len(copied), 3)
+        plain = list(self.forests)
+        self.assertTrue(all(isinstance(f, Forest) for f in plain))
+        self.assertEqual(sorted(self.forests, key=lambda f: f.tree)[0].tree,
+                         self.reader.read(0))
+
+    def test_index_and_remove(self):
+        second = self.forests[1]
+        self.assertEqual(self.forests.index(second), 1)
+        self.assertIn(second, self.forests)
+        self.forests.remove(second)
+        self.assertNotIn(second, self.forests)
+        self.assertEqual(len(self.forests), 2)
+        self.assertEqual(self.forests[1].tree, '(NP (NNS dogs))')
+
+    def test_insert_and_add(self):
+        new = Forest('new')
+        self.forests.insert(1, new)
+        self.assertIs(self.forests[1], new)
+        self.assertEqual(self.forests.index(new), 1)
+        combined = [Forest('before')] + self.forests + [Forest('after')]
+        self.assertIsInstance(combined, LazyForestList)
+        self.assertEqual([f.tree for f in combined][1], self.reader.read(0))
+        self.assertEqual(len(combined), 6)
+
+    def test_equality(self):
+        copied = self.forests.copy()
+        self.assertEqual(copied, self.forests)
+        self.assertEqual(self.built, [])
+        self.assertEqual(list(self.forests), self.forests)
+        self.assertNotEqual(self.forests[:2], self.forests)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+""" Network data of the web viewer, shared by webviewer/server.py and the web viewer of
+TreesAreMemory3 plugin. """
+import gzip
+import json
+import os
+import threading
+
+from flask import Response, request
+
+GZIP_MIN_SIZE = 1024  # bytes, smaller responses are sent uncompressed
+
+
+class Network:
+    """ Network from the data file, kept in memory. Nodes, links and other top level values
+    ('states', 'routes' etc.) remember the revision where they were added or last changed, and
+    removed nodes and links the revision where they were removed, so that a client can ask for
+    only what has changed since the revision it already has. The file is read again only when
+    its modification time changes, so a parser can keep rewriting it while clients poll.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.revision = 0
+        self.mtime = None
+        self.nodes = {}  # id -> (revision, node dict)
+        self.links = {}  # id -> (revision, link dict)
+        self.removed_nodes = {}  # id -> revision
+        self.removed_links = {}  # id -> revision
+        self.values = {}  # key -> (revision, value)
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        """ Read the data file if it has changed since last read """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self.mtime:
+            return
+        with self.lock:
+            if mtime == self.mtime:
+                return
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except ValueError:
+                # file is being written, try again with next request
+                return
+            self.mtime = mtime
+            self.update(data)
+
+    def update(self, data):
+        """ Compare data to network in memory and bump revision of what has changed
+        :param data: dict with 'nodes', 'links' and other values
+        """
+        revision = self.revision + 1
+        changed = self._update_items(self.nodes, self.removed_nodes, data.get('nodes', []),
+                                     revision)
+        changed |= self._update_items(self.links, self.removed_links, data.get('links', []),
+                                      revision)
+        for key, value in data.items():
+            if key == 'nodes' or key == 'links':
+                continue
+            old = self.values.get(key)
+            if old is None or old[1] != value:
+                self.values[key] = revision, value
+                changed = True
+        if changed:
+            self.revision = revision
+
+    @staticmethod
+    def _update_items(items, removed, new_items, revision):
+        changed = False
+        ids = set()
+        for item in new_items:
+            key = item['id']
+            ids.add(key)
+            old = items.get(key)
+            if old is None or old[1] != item:
+                items[key] = revision, item
+                removed.pop(key, None)
+                changed = True
+        for key in [key for key in items if key not in ids]:
+            del items[key]
+            removed[key] = revision
+            changed = True
+        return changed
+
+    def changes(self, since=0):
+        """ Nodes, links and values added or changed after given revision. With since=0 this is
+        the whole network, in same form as the data file. Call this while holding self.lock, so
+        that refresh from another request cannot change the network in the middle. Returned
+        items are never modified later, so the result can be serialized without the lock.
+        :param since: revision that client already has
+        :return: dict
+        """
+        data = {'revision': self.revision, 'since': since,
+                'nodes': [item for rev, item in self.nodes.values() if rev > since],
+                'links': [item for rev, item in self.links.values() if rev > since]}
+        for key, (rev, value) in self.values.items():
+            if rev > since:
+                data[key] = value
+        if since:
+            data['removed_nodes'] = [key for key, rev in self.removed_nodes.items() if rev > since]
+            data['removed_links'] = [key for key, rev in self.removed_links.items() if rev > since]
+        return data
+
+
+def network_response(network):
+    """ Response for /api/net: whole network, or with ?since=revision only the changes after
+    that revision. Clients that already have the current revision get 304 Not Modified.
+    :param network: Network
+    :return: Response
+    """
+    network.refresh()
+    since = request.args.get('since', 0, type=int)
+    with network.lock:
+        if since > network.revision:
+            # client has a revision from an earlier run of the server
+            since = 0
+        etag = f'{network.revision}-{since}'
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+        data = network.changes(since)
+    return json_response(data, etag)
+
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def json_response(data, etag):
+    """ Send data as json, gzipped if client accepts it """
+    body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    response = Response(mimetype='application/json')
+    if len(body) > GZIP_MIN_SIZE and 'gzip' in request.accept_encodings:
+        body = gzip.compress(body)
+        response.headers['Content-Encoding'] = 'gzip'
+    response.set_data(body)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(etag, weak=True)
+    return response
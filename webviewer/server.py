@@ -1,11 +1,15 @@
-from flask import Flask  # , jsonify, request
 from os.path import join, realpath, dirname
 
+from flask import Flask
+
+from network import Network, network_response
+
 
 class Server(Flask):
     def __init__(self, data_path='data/data.json'):
         Flask.__init__(self, __name__, static_folder='static', static_url_path='')
         self.full_data_path = join(realpath(dirname(__file__)), data_path)
+        self.network = Network(self.full_data_path)
         print(f'serving data from {self.full_data_path}')
 
 
@@ -19,9 +23,8 @@ def index():
 
 @app.route('/api/net')
 def get_network():
-    print('trying to get network')
-    return open(app.full_data_path).read()
-    #return app.send_static_file(app.full_data_path)
+    """ Whole network, or with ?since=revision only the changes after that revision """
+    return network_response(app.network)
 
 
 @app.route('/api/reset')